@@ -8,6 +8,9 @@ long_description = long_description.replace("beeb_logo.png", "beeb_logo_small.pn
 with open("requirements/default.txt", "r") as fh:
     reqs = fh.read().splitlines()
 
+with open("requirements/table.txt", "r") as fh:
+    table_reqs = fh.read().splitlines()  # For the columnar `BroadcastTable`
+
 def local_scheme(version):
     return ""
 
@@ -41,5 +44,6 @@ setup(
     },
     setup_requires=["setuptools_scm"],
     install_requires=reqs,
+    extras_require={"table": table_reqs},
     python_requires=">=3",
 )
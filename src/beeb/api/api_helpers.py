@@ -7,23 +7,22 @@ __all__ = [
     "get_episode_dict",
     "final_m4s_link_from_programme_pid",
     "final_m4s_link_from_episode_pid",
+    "manifest_from_programme_pid",
+    "manifest_from_episode_pid",
     "get_programme_pid_by_name",
     "get_programme_dict",
     "get_genre_programme_dict"
 ]
 
 
-def final_m4s_link_from_episode_pid(episode_pid):
-    """
-    Scrape the DASH manifest (MPD file) to determine the URL of the final M4S file
-    (MPEG stream), using the episode's duration divided by the... sampling rate?
-    """
-    return MpdXml.from_episode_pid(episode_pid).last_m4s_link
+def manifest_from_episode_pid(episode_pid):
+    "Scrape the DASH manifest (MPD file) into an `MpdManifest`"
+    return MpdXml.from_episode_pid(episode_pid).manifest
 
 
-def final_m4s_link_from_programme_pid(programme_pid, ymd):
+def manifest_from_programme_pid(programme_pid, ymd):
     """
-    Return the final M4S stream link given the programme PID and (year, month, day)
+    Return the `MpdManifest` given the programme PID and (year, month, day)
     tuple (looking up all available episodes until one on this date is found).
     Note that the year in `ymd` must be the full year.
     """
@@ -33,7 +32,20 @@ def final_m4s_link_from_programme_pid(programme_pid, ymd):
     if len(ret_dict) > 1:
         raise ValueError(f"Got {len(ret_dict)} keys for {paginate_until_ymd=}")
     [episode_pid] = ret_dict.values()
-    return MpdXml.from_episode_pid(episode_pid).last_m4s_link
+    return manifest_from_episode_pid(episode_pid)
+
+
+def final_m4s_link_from_episode_pid(episode_pid):
+    """
+    Scrape the DASH manifest (MPD file) to determine the URL of the final M4S file
+    (MPEG stream), using the episode's duration divided by the segment duration.
+    """
+    return manifest_from_episode_pid(episode_pid).last_m4s_link
+
+
+def final_m4s_link_from_programme_pid(programme_pid, ymd):
+    "Return the final M4S stream link given the programme PID and date"
+    return manifest_from_programme_pid(programme_pid, ymd).last_m4s_link
 
 
 def get_episode_dict(programme_pid, page_num=1, paginate_until_ymd=None):
@@ -1,7 +1,7 @@
-from bs4 import BeautifulSoup as BS
 from math import ceil
 from ..share.time.isotime import total_seconds_in_isoduration
 from .serialisation import HtmlHandler
+from ..share.parse_utils import class_strainer, get_parse_mode, make_soup
 
 # TODO make this file into a HTML helper version supported by .serialisation
 
@@ -56,7 +56,8 @@ class Episode:
     @classmethod
     def from_soup_node(cls, soup_node):
         pid = soup_node.attrs["data-pid"]
-        episode_title = soup_node.select_one(".programme__titles").text
+        # Parsers differ in the whitespace they keep around the title, so strip it
+        episode_title = soup_node.select_one(".programme__titles").text.strip()
         try:
             epi_d, epi_m, epi_y = map(int, episode_title.split("/"))
             epi_ymd = (epi_y, epi_m, epi_d)
@@ -112,7 +113,7 @@ class EpisodesDict(dict):
                     self.prune(self.paginate_until_ymd)
                     break
                 if paginate == self.max_page_num:
-                    msg = f"{self.paginate_until_ymd} not found (reached {page_num})"
+                    msg = f"{self.paginate_until_ymd} not found (reached {paginate})"
                     raise ValueError(msg)
         elif self.paginate_until_ymd:
             self.prune(self.paginate_until_ymd)
@@ -137,6 +138,9 @@ class EpisodesDict(dict):
 
 
 class EpisodeListingsHtml(Paginator, HtmlHandler):
+    # Only build the episodes (`div.programme[data-pid]`) and the last page link
+    strainer = class_strainer("programme", "pagination__page--last")
+
     def __init__(
         self, series_pid, page_num=1, paginate_until_ymd=None, defer_pull=False
     ):
@@ -147,6 +151,11 @@ class EpisodeListingsHtml(Paginator, HtmlHandler):
             self.pull()
         self.episodes_dict = EpisodesDict.from_episode_listings(self)
 
+    @staticmethod
+    def reader_func(data):
+        full = get_parse_mode() == "full"
+        return make_soup(data, parse_only=None if full else EpisodeListingsHtml.strainer)
+
     @property
     def paginate_url_prefix(self):
         return f"{self.series.url}/episodes/player?page="
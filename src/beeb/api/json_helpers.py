@@ -19,7 +19,20 @@ class EpisodeMetadataPidJson(JsonHandler):
     programme_pid_kp = "programme parent programme pid".split()
     programme_title_kp = "programme parent programme title".split()
     cat_kp = "programme categories".split() # unkeyed list here
+    # If the parent is a series, the brand is nested beneath it
+    series_stem = "programme parent programme parent programme"
+    series_programme_pid_kp = f"{series_stem} pid".split()
+    series_programme_title_kp = f"{series_stem} title".split()
     filter_key_path = programme_pid_kp
+    # All that's needed to look up the programme (in either case) and genre
+    lean_key_paths = (
+        parent_type_kp,
+        programme_pid_kp,
+        programme_title_kp,
+        series_programme_pid_kp,
+        series_programme_title_kp,
+        cat_kp,
+    )
 
     @property
     def url(self):
@@ -35,26 +48,25 @@ class EpisodeMetadataPidJson(JsonHandler):
         attributes if so (else parent type is a single 'brand').
         """
         if self.parent_type == "series":
-            prog_stem = "programme parent programme parent programme"
-            self.programme_pid_kp = f"{prog_stem} pid".split()
-            self.programme_title_kp = f"{prog_stem} title".split()
+            self.programme_pid_kp = self.series_programme_pid_kp
+            self.programme_title_kp = self.series_programme_title_kp
 
     @classmethod
     def get_programme_pid(cls, episode_pid, prefab=None):
-        j = prefab if prefab else cls(episode_pid)
+        j = prefab if prefab else cls(episode_pid, lean=True)
         j.detect_parent_is_series()
         return j.filter(filter_key_path=j.programme_pid_kp)
 
     @classmethod
     def get_programme_pid_title(cls, episode_pid, prefab=None):
-        j = prefab if prefab else cls(episode_pid)
+        j = prefab if prefab else cls(episode_pid, lean=True)
         j.detect_parent_is_series()
         programme_pid_title_kp = (j.programme_pid_kp, j.programme_title_kp)
         return j.filter(filter_key_path=programme_pid_title_kp)
 
     @classmethod
     def get_programme_pid_title_genre(cls, episode_pid, prefab=None):
-        j = prefab if prefab else cls(episode_pid)
+        j = prefab if prefab else cls(episode_pid, lean=True)
         j.detect_parent_is_series() # modify keypath attributes if series
         programme_pid_title_kp = (j.programme_pid_kp, j.programme_title_kp)
         # Force preserve: don't clear the dict
@@ -68,6 +80,30 @@ class EpisodeMetadataPidJson(JsonHandler):
         )
         return programme_pid, programme_title, genre_title
 
+    @classmethod
+    def get_programme_resolution(cls, episode_pid, prefab=None):
+        """
+        The `(programme_pid, programme_title, genre_title, parent_type)` of the
+        episode, with the programme PID, title and parent type `None` for a one off
+        episode (with no parent programme), and the genre `None` if it has none.
+        """
+        j = prefab if prefab else cls(episode_pid, lean=True)
+        try:
+            categories = j.filter(j.cat_kp, force_preserve=True)
+        except KeyError:
+            categories = []
+        genre_title = next(
+            (c["title"] for c in categories if c.get("type") == "genre"), None
+        )
+        try:
+            parent_type = j.parent_type
+            j.detect_parent_is_series() # modify keypath attributes if series
+            programme_pid_title_kp = (j.programme_pid_kp, j.programme_title_kp)
+            programme_pid, programme_title = j.filter(filter_key_path=programme_pid_title_kp)
+        except KeyError:
+            return None, None, genre_title, None
+        return programme_pid, programme_title, genre_title, parent_type
+
 class MediasetJson(JsonHandler):
     "MPEG-DASH stream manifest JSON helper"
     pid_property_name = "verpid"
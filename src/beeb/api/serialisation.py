@@ -1,23 +1,45 @@
 from xml.etree import ElementTree as ET
-from json import loads
 from functools import reduce
 from ..share.http_utils import GET
-from bs4 import BeautifulSoup as BS
+from ..share.coalesce_utils import SingleFlight
+from ..share.parse_utils import extract_key_paths, loads_json, make_soup
+from ..share.trace_utils import span
 
 __all__ = ["XmlHandler", "JsonHandler", "HtmlHandler"]
 
 
+pull_flight = SingleFlight()
+
+
 class PullMixIn:
-    def pull(self):
-        resp = GET(self.url, raise_for_status=True)
-        data = self.reader_func(resp.content.decode())
+    """
+    Pull `self.url` and handle the parsed contents. The request goes through the
+    shared client registry (`beeb.share.http_utils.clients`) unless a client is
+    passed, or set as the `client` attribute on the class or instance.
+
+    Concurrent pulls of the same URL (e.g. the same episode listings page in
+    multiple threads) share one request and one parse: handlers must not mutate
+    the parsed data they are given (`JsonHandler` copies it into itself).
+    """
+
+    client = None
+
+    def pull(self, client=None):
+        client = client or self.client
+        key = (self.url, self.reader_func, client)
+        data = pull_flight.do(key, self.pull_and_read, client)
         self.handle(data)
 
+    def pull_and_read(self, client=None):
+        resp = GET(self.url, raise_for_status=True, client=client)
+        with span("parse", handler=type(self).__name__, url=self.url):
+            return self.reader_func(resp.content)
+
 
 class SerialisedHandler(PullMixIn, dict):
     """
     Serialisation helper providing a common interface for XML and JSON.
-    Subclasses must provide `reader_func` to parse the decoded contents
+    Subclasses must provide `reader_func` to parse the contents (as bytes)
     of GET request to `self.url`,
     """
 
@@ -63,47 +85,53 @@ class JsonHandler(SerialisedHandler):
     """
     JSON handler base class. Subclasses must set `pid_property_name`
     (to clearly distinguish the different PIDs) and a property `url`.
+
+    If `lean`, only the values at the `lean_key_paths` are kept from the decoded
+    JSON (the rest is never copied into the dict), so subclasses which only ever
+    filter a few key paths should list them all there.
     """
 
     clear_on_filter = True  # override in subclass to remove self-unloading behaviour
+    lean = False
+    lean_key_paths = ()
 
-    def __init__(self, pid, defer_pull=False, filter_key_path=None):
+    def __init__(self, pid, defer_pull=False, filter_key_path=None, lean=None):
         setattr(self, self.pid_property_name, pid)
         self.filter_key_path = filter_key_path
+        if lean is not None:
+            self.lean = lean
         if not defer_pull:
             self.pull()
 
     def handle(self, data):
+        if self.lean:
+            data = extract_key_paths(data, self.lean_key_paths)
         self.update(data)
         if self.filter_key_path:
             self.filtered = self.filter()
 
     @staticmethod
     def reader_func(data):
-        return loads(data)
+        return loads_json(data)
 
     @classmethod
-    def from_json(cls, json, pid, filter_key_path=None, load_string=False):
+    def from_json(cls, json, pid, filter_key_path=None, load_string=False, lean=None):
         if load_string:
-            json = loads(json)
-        j = cls(pid=pid, filter_key_path=filter_key_path, defer_pull=True)
+            json = loads_json(json)
+        j = cls(pid=pid, filter_key_path=filter_key_path, defer_pull=True, lean=lean)
         j.handle(json)
         return j
 
 class HtmlHandler(PullMixIn):
     """
-    Subclasses must provide `reader_func` to parse the decoded contents
-    of GET request to `self.url`,
+    Subclasses must provide `reader_func` to parse the contents (as bytes)
+    of GET request to `self.url`, by default with the configured HTML parser
+    (see `beeb.share.parse_utils.set_html_parser`).
     """
 
-    def pull(self):
-        resp = GET(self.url, raise_for_status=True)
-        data = self.reader_func(resp.content.decode())
-        self.handle(data)
-
     def handle(self, data):
         self.page = data  # store BeautifulSoup document
 
     @staticmethod
     def reader_func(data):
-        return BS(data, features="html5lib")
+        return make_soup(data)
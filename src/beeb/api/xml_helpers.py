@@ -1,48 +1,138 @@
+import re
 from .serialisation import XmlHandler
 from .json_helpers import MediasetJson
 from ..share.time.isotime import total_seconds_in_isoduration
+from collections import namedtuple
 from math import ceil
 
-__all__ = ["MpdXml"]
+__all__ = ["MpdXml", "MpdManifest", "Representation", "expand_template"]
 
 
-class MpdXsdNamespaceMixIn:
-    "Helper to parse MPD XML's XSD namespace."
+template_re = re.compile(r"\$(RepresentationID|Number|Bandwidth|Time|)(%0\d+d)?\$")
 
-    @property
-    def namespace_xpath(self):
-        """
-        Relies on the `xsd_namespace` property of `MpdXml`, made from the values
-        loaded into the dict from the `attrib` dict of `ElementTree.Element`.
-        """
-        return f"{{{self.xsd_namespace}}}"
 
-    @property
-    def period_xpath(self):
-        return f"{self.namespace_xpath}Period"
+def expand_template(template, rep_id, bandwidth=None, number=None):
+    """
+    Fill in a `SegmentTemplate` URL template's identifiers (`$Number$` etc. may have
+    a width format like `$Number%05d$`). Any left unknown (`None`) are kept as is.
+    """
 
-    @property
-    def bitrate_opt_xpath(self):
-        return f"{self.namespace_xpath}AdaptationSet"
+    values = {"RepresentationID": rep_id, "Number": number, "Bandwidth": bandwidth}
 
-    @property
-    def repr_xpath(self):
-        return f"{self.namespace_xpath}Representation"
+    def fill(m):
+        name, fmt = m.groups()
+        if name == "":
+            return "$"  # "$$" is an escaped dollar sign
+        value = values.get(name)
+        return m.group() if value is None else (fmt or "%s") % value
+
+    return template_re.sub(fill, template)
+
+
+class Representation(
+    namedtuple(
+        "Representation",
+        "rep_id bandwidth sample_rate timescale segment_frames start_number "
+        "initialization media",
+    )
+):
+    "One bitrate option of the stream, with its segment template attributes"
+
+    __slots__ = ()
+
+    def n_segments(self, duration_s):
+        return ceil(duration_s * self.timescale / self.segment_frames)
 
     @property
-    def seg_templ_xpath(self):
-        return f"{self.namespace_xpath}SegmentTemplate"
+    def init_filename(self):
+        return expand_template(self.initialization, self.rep_id, self.bandwidth)
+
+    def segment_filename(self, number):
+        return expand_template(self.media, self.rep_id, self.bandwidth, number)
+
+
+class MpdManifest(
+    namedtuple("MpdManifest", "url_prefix duration_s representations")
+):
+    """
+    The parsed MPEG-DASH manifest (assuming a single period): the URL to which the
+    segment filenames are relative (the manifest's directory plus the period's
+    `BaseURL`), the duration in seconds, and each `Representation`, ascending by
+    bandwidth. Segment lists are for the highest bitrate unless another is given.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_element(cls, root, url):
+        ns = root.tag[: root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+        period = root.find(f"{ns}Period")
+        base_url = period.find(f"{ns}BaseURL")
+        url_prefix = url[: url.rfind("/") + 1]
+        if base_url is not None:
+            url_prefix += base_url.text
+        duration_s = total_seconds_in_isoduration(root.get("mediaPresentationDuration"))
+        reps = []
+        for aset in period.findall(f"{ns}AdaptationSet"):
+            aset_templ = aset.find(f"{ns}SegmentTemplate")
+            for r in aset.findall(f"{ns}Representation"):
+                templ = r.find(f"{ns}SegmentTemplate")
+                templ = templ if templ is not None else aset_templ
+                sample_rate = int(r.get("audioSamplingRate", aset.get("audioSamplingRate")))
+                reps.append(
+                    Representation(
+                        rep_id=r.get("id"),
+                        bandwidth=int(r.get("bandwidth")),
+                        sample_rate=sample_rate,
+                        timescale=int(templ.get("timescale", sample_rate)),
+                        segment_frames=int(templ.get("duration")),
+                        start_number=int(templ.get("startNumber", 1)),
+                        initialization=templ.get("initialization"),
+                        media=templ.get("media"),
+                    )
+                )
+        reps.sort(key=lambda r: r.bandwidth)
+        return cls(url_prefix, duration_s, tuple(reps))
+
+    @property
+    def best(self):
+        "The highest bitrate representation"
+        return self.representations[-1]
+
+    def n_segments(self, rep=None):
+        return (rep or self.best).n_segments(self.duration_s)
+
+    def segment_numbers(self, rep=None):
+        rep = rep or self.best
+        return range(rep.start_number, rep.start_number + self.n_segments(rep))
+
+    def init_url(self, rep=None):
+        return self.url_prefix + (rep or self.best).init_filename
+
+    def segment_urls(self, rep=None):
+        "The URL of every media segment, in order (after the initialisation URL)"
+        rep = rep or self.best
+        return [self.url_prefix + rep.segment_filename(n) for n in self.segment_numbers(rep)]
 
     @property
-    def base_url_xpath(self):
-        return f"{self.namespace_xpath}BaseURL"
+    def last_m4s_link(self):
+        rep = self.best
+        return self.url_prefix + rep.segment_filename(self.segment_numbers(rep)[-1])
 
 
-class MpdXml(MpdXsdNamespaceMixIn, XmlHandler):
-    "Episode stream MPD manifest XML helper"
+class MpdXml(XmlHandler):
+    """
+    Episode stream MPD manifest XML helper. The XML is parsed once (when handled)
+    into the immutable `manifest`, which the stream properties are read from.
+    """
+
     duration_key = "mediaPresentationDuration"
     clear_on_filter = False
 
+    def handle(self, data):
+        super().handle(data)
+        self.manifest = MpdManifest.from_element(self.root, self.url)
+
     @classmethod
     def from_episode_pid(cls, episode_pid, defer_pull=False, filter_key_path=None):
         mediaset_json = MediasetJson.from_episode_pid(
@@ -56,63 +146,29 @@ class MpdXml(MpdXsdNamespaceMixIn, XmlHandler):
 
     @property
     def sec_duration(self):
-        return total_seconds_in_isoduration(self.duration_string)
-
-    @property
-    def xsd_namespace(self):
-        try:
-            ns = next(v for v in self.values()).split(" ")[0]
-        except Exception as e:
-            raise ValueError("Failed to extract XSD namespace: {e}")
-        return ns
-
-    @property
-    def max_bitrate_opt(self):
-        """
-        Choose the highest bitrate option (there are 2 AdaptationSet options).
-        Assume a single period duration (so use `find` not `findall`). Take
-        the maximum value: the last in the sorted list.
-        """
-        return self.bitrates_sorted_by_bandwidth()[-1]
-
-    def bitrates_sorted_by_bandwidth(self):
-        return sorted(
-            self.root.find(self.period_xpath).findall(self.bitrate_opt_xpath),
-            key=lambda t: int(t.find(self.repr_xpath).get("bandwidth")),
-        )
+        return self.manifest.duration_s
 
     @property
     def segment_frames(self):
-        return int(self.max_bitrate_opt.find(self.seg_templ_xpath).get("duration"))
+        return self.manifest.best.segment_frames
 
     @property
     def sample_rate(self):
-        return int(self.max_bitrate_opt.get("audioSamplingRate"))
+        return self.manifest.best.sample_rate
 
     @property
     def n_m4s_parts(self):
-        return ceil(self.sec_duration * self.sample_rate / self.segment_frames)
-
-    @property
-    def mpd_base_url(self):
-        return self.root.find(self.period_xpath).find(self.base_url_xpath).text
+        return self.manifest.n_segments()
 
     @property
     def repr_id(self):
-        return self.max_bitrate_opt.find(self.repr_xpath).get("id")
+        return self.manifest.best.rep_id
 
     @property
     def media_url_suffix(self):
-        return self.max_bitrate_opt.find(self.seg_templ_xpath).get("media")
-
-    @property
-    def m4s_link_prefix(self):
-        return self.url[: self.url.rfind("/") + 1]
+        return self.manifest.best.media
 
     @property
     def last_m4s_link(self):
         "Return the final M4S stream link"
-        media_suffix_parts = self.media_url_suffix.split("$")
-        media_suffix_parts[1::2] = self.repr_id, str(self.n_m4s_parts)
-        last_m4s_suffix = "".join(media_suffix_parts)
-        return self.m4s_link_prefix + self.mpd_base_url + last_m4s_suffix
+        return self.manifest.last_m4s_link
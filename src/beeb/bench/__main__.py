@@ -0,0 +1,63 @@
+from argparse import ArgumentParser
+from .benchmark import run_benchmark, format_results, time_parsers
+from ..share.compact_utils import set_compact
+from ..share.trace_utils import get_tracer
+
+parser = ArgumentParser(
+    prog="python -m beeb.bench",
+    description="Benchmark beeb against an offline stand-in for the BBC servers",
+)
+parser.add_argument("--station", default="r4")
+parser.add_argument("--guide-stations", default="r1,r2,r3,r4")
+parser.add_argument("--n-days", type=int, default=7)
+parser.add_argument("--programme", default="Today")
+parser.add_argument("--stages", default="listings,catalogue,guide,stream")
+parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503s")
+parser.add_argument("--bandwidth", type=float, default=None, help="bytes/s")
+parser.add_argument("--duration", type=int, default=120, help="episode seconds")
+parser.add_argument("--segment-size", type=int, default=32768, help="bytes")
+parser.add_argument("--json", action="store_true", help="print results as JSON")
+parser.add_argument(
+    "--compact", action="store_true", help="drop parsed payloads, intern strings"
+)
+parser.add_argument("--trace", help="write a Chrome trace of the run to this path")
+parser.add_argument(
+    "--parsers", action="store_true", help="compare HTML parsers and modes, then exit"
+)
+args = parser.parse_args()
+
+if args.parsers:
+    timings = time_parsers()
+    slowest = max(timings.values())
+    for name, per_page in timings.items():
+        speedup = slowest / per_page
+        print(f"{name:<20} {per_page * 1e3:8.2f}ms per page ({speedup:.1f}x)")
+    parser.exit()
+
+if args.trace:
+    get_tracer().enable()
+
+if args.compact:
+    set_compact()
+
+results = run_benchmark(
+    station=args.station,
+    guide_stations=args.guide_stations.split(","),
+    n_days=args.n_days,
+    programme=args.programme,
+    stages=args.stages.split(","),
+    latency=args.latency,
+    error_rate=args.error_rate,
+    bandwidth=args.bandwidth,
+    duration_s=args.duration,
+    segment_size=args.segment_size,
+)
+print(format_results(results, as_json=args.json))
+if args.trace:
+    tracer = get_tracer()
+    tracer.to_chrome_trace(args.trace)
+    if not args.json:
+        print(f"Counters: {tracer.counters}")
+        for name, stats in tracer.summary().items():
+            print(f"  {name:<26} {stats['count']:>6} x {stats['mean_s'] * 1e3:8.2f}ms")
@@ -0,0 +1,141 @@
+import json
+import time
+from tempfile import TemporaryDirectory
+from . import fixtures
+from .server import StandInServer, use_stand_in
+from ..nav import ChannelListings, ProgrammeCatalogue, ProgrammeGuide
+from ..nav.sched.schedule import parse_schedule_page
+from ..share.parse_utils import available_parsers, etree
+from ..stream import Stream
+
+__all__ = ["StageResult", "run_benchmark", "format_results", "time_parsers"]
+
+
+class StageResult:
+    "Wall time and server-side traffic for one benchmark stage"
+
+    def __init__(self, name, wall, requests, n_bytes, errors):
+        self.name = name
+        self.wall = wall
+        self.requests = requests
+        self.n_bytes = n_bytes
+        self.errors = errors
+
+    @property
+    def requests_per_s(self):
+        return self.requests / self.wall if self.wall else 0.0
+
+    @property
+    def mb_per_s(self):
+        return self.n_bytes / 1e6 / self.wall if self.wall else 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "wall_s": round(self.wall, 4),
+            "requests": self.requests,
+            "bytes": self.n_bytes,
+            "errors": self.errors,
+            "requests_per_s": round(self.requests_per_s, 2),
+            "mb_per_s": round(self.mb_per_s, 3),
+        }
+
+    def __repr__(self):
+        return (
+            f"{self.name}: {self.wall:.2f}s, {self.requests} requests "
+            f"({self.requests_per_s:.1f}/s), {self.mb_per_s:.2f} MB/s"
+        )
+
+
+def time_stage(server, name, func):
+    server.reset_stats()
+    t0 = time.perf_counter()
+    func()
+    wall = time.perf_counter() - t0
+    totals = server.totals()
+    return StageResult(name, wall, totals["requests"], totals["bytes"], totals["errors"])
+
+
+def run_benchmark(
+    station="r4",
+    guide_stations=("r1", "r2", "r3", "r4"),
+    n_days=7,
+    programme="Today",
+    stages=("listings", "catalogue", "guide", "stream"),
+    latency=0.0,
+    error_rate=0.0,
+    bandwidth=None,
+    duration_s=120,
+    segment_size=32768,
+):
+    """
+    Drive beeb's pipelines against a local `StandInServer` (no network needed) and
+    return a list of `StageResult` (wall time, requests/s and MB/s per stage).
+    """
+    server = StandInServer(
+        latency=latency,
+        error_rate=error_rate,
+        bandwidth=bandwidth,
+        duration_s=duration_s,
+        segment_size=segment_size,
+    )
+    stage_funcs = {
+        "listings": lambda: ChannelListings.from_channel_name(station, n_days=n_days),
+        "catalogue": lambda: ProgrammeCatalogue(station, with_genre=True, n_days=n_days),
+        "guide": lambda: ProgrammeGuide.generate_by_names(
+            list(guide_stations), lazy=False, n_days=n_days, store=False
+        ),
+    }
+    results = []
+    with server, use_stand_in(server), TemporaryDirectory() as tmp_dir:
+        stage_funcs["stream"] = lambda: Stream.from_name(
+            station,
+            programme,
+            ymd_ago=(0, 0, -1),
+            transcode_to_wav=False,
+            custom_storage_path=tmp_dir,
+        )
+        for name in stages:
+            results.append(time_stage(server, name, stage_funcs[name]))
+    return results
+
+
+def format_results(results, as_json=False):
+    if as_json:
+        return json.dumps([r.to_dict() for r in results], indent=2)
+    header = f"{'stage':<10} {'wall (s)':>9} {'requests':>9} {'req/s':>9} {'MB':>8} {'MB/s':>8} {'errors':>7}"
+    rows = [
+        f"{r.name:<10} {r.wall:>9.3f} {r.requests:>9} {r.requests_per_s:>9.1f} "
+        f"{r.n_bytes / 1e6:>8.2f} {r.mb_per_s:>8.2f} {r.errors:>7}"
+        for r in results
+    ]
+    return "\n".join([header, *rows])
+
+
+def time_parsers(parsers=None, n_pages=10, repeat=3):
+    """
+    Time parsing `n_pages` synthetic schedule pages into broadcast records with
+    each HTML parser (default: all installed) in each parse mode, in one process
+    so that it's the parsing alone being measured. Return the best of `repeat`
+    runs, in seconds per page, keyed by "{parser}/{mode}" (or just "fields", as
+    that mode always uses lxml).
+    """
+    parsers = parsers if parsers else available_parsers()
+    pages = [
+        (fixtures.schedule_html("p00fmm0k", (2021, 3, d)).encode(), (2021, 3, d))
+        for d in range(1, n_pages + 1)
+    ]
+    configs = {f"{p}/{m}": (p, m) for p in parsers for m in ["full", "strained"]}
+    configs.pop("html5lib/strained", None)  # html5lib can't strain: same as full
+    if etree is not None:
+        configs["fields"] = (None, "fields")
+    timings = {}
+    for name, (parser, mode) in configs.items():
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for raw, ymd in pages:
+                parse_schedule_page(raw, ymd, parser=parser, mode=mode)
+            best = min(best, time.perf_counter() - t0)
+        timings[name] = best / n_pages
+    return timings
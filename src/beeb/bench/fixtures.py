@@ -0,0 +1,317 @@
+"""
+Deterministic synthetic fixtures mimicking every BBC resource beeb fetches. All of
+them are derived from the URL alone (no state is kept between requests), with PIDs
+encoded so that schedules, episode metadata and episode listings agree.
+"""
+import json
+from datetime import date, datetime, timedelta, timezone
+from hashlib import blake2b
+
+__all__ = [
+    "TITLES",
+    "GENRES",
+    "schedule_html",
+    "episode_json",
+    "playlist_json",
+    "mediaset_json",
+    "mpd_xml",
+    "episodes_player_html",
+    "segment_bytes",
+]
+
+# A mix of daily, repeated and one-off titles, as on a speech station
+TITLES = [
+    "Today", "Shipping Forecast", "News Summary", "Midnight News", "News Briefing",
+    "World at One", "PM", "Six O'Clock News", "The World Tonight", "Woman's Hour",
+    "The Archers", "In Our Time", "Desert Island Discs", "Front Row", "Farming Today",
+    "Book of the Week", "Money Box", "Inside Health", "Moral Maze", "The Food Programme",
+    "Gardeners' Question Time", "From Our Own Correspondent", "Thinking Allowed",
+    "More or Less", "Feedback", "Costing the Earth", "Start the Week", "Loose Ends",
+]
+GENRES = ["News", "Drama", "Factual", "Music", "Comedy", "Learning", "Sport"]
+DAILY_TITLES = 8  # The first titles air (several times) every day, the rest rotate
+N_SLOTS = 40  # Broadcasts per day
+ONE_OFF_EVERY = 7  # Every seventh title is a one-off (no parent programme)
+SERIES_EVERY = 3  # Every third title is a series nested beneath a brand
+
+PID_CHARS = "0123456789bcdfghjklmnpqrstvwxyz"  # BBC PIDs avoid vowels
+
+
+def _hash_int(*parts):
+    h = blake2b("/".join(map(str, parts)).encode(), digest_size=8)
+    return int.from_bytes(h.digest(), "big")
+
+
+def _pid(prefix, n, width=7):
+    chars = []
+    for _ in range(width):
+        n, r = divmod(n, len(PID_CHARS))
+        chars.append(PID_CHARS[r])
+    return prefix + "".join(chars)
+
+
+def episode_pid(title_idx, ymd):
+    "Episode PIDs start with 'm', followed by the title index and a date hash"
+    return f"m{title_idx:02d}" + _pid("", _hash_int(*ymd), width=5)
+
+
+def title_idx_from_pid(pid):
+    if pid.startswith("m") and pid[1:3].isdigit():
+        return int(pid[1:3]) % len(TITLES)
+    return _hash_int(pid) % len(TITLES)
+
+
+def programme_pid(title_idx):
+    return _pid("b", _hash_int("programme", title_idx))
+
+
+def series_pid(title_idx):
+    return _pid("p", _hash_int("series", title_idx))
+
+
+def schedule_titles(channel_id, ymd):
+    "The title index in each slot of the schedule for a channel on a given date"
+    rotating = range(DAILY_TITLES, len(TITLES))
+    slots = []
+    for slot in range(N_SLOTS):
+        if slot % 3 == 0:
+            slots.append((slot // 3) % DAILY_TITLES)
+        else:
+            slots.append(rotating[_hash_int(channel_id, *ymd, slot) % len(rotating)])
+    return slots
+
+
+def _broadcast_div(start, title_idx, ymd, synopsis_words=40):
+    title = TITLES[title_idx]
+    pid = episode_pid(title_idx, ymd)
+    subtitle = start.strftime("%d/%m/%Y")
+    words = " ".join(
+        f"word{_hash_int(pid, i) % 997}" for i in range(synopsis_words)
+    )
+    return f"""
+<li class="grid">
+<div class="broadcast broadcast--grid" data-pid="{pid}" typeof="BroadcastEvent">
+  <div class="broadcast__info grid 1/4@bpb1 1/4@bpb2 1/6@bpw">
+    <h3 class="broadcast__time gamma" property="startDate" content="{start.isoformat()}">
+      {start.strftime("%H:%M")}
+    </h3>
+    <meta property="endDate" content="{(start + timedelta(minutes=36)).isoformat()}">
+  </div>
+  <div class="programme programme--radio programme--episode block-link" data-pid="{pid}"
+    typeof="RadioEpisode" resource="/programmes/{pid}">
+    <div class="programme__img"><div class="programme__img-box">
+      <img src="https://ichef.bbci.co.uk/images/ic/80x45/p0{pid[1:]}.jpg" alt="">
+    </div></div>
+    <div class="programme__body">
+      <h4 class="programme__titles">
+        <a href="/programmes/{pid}" class="br-blocklink__link block-link__target">
+          <span class="programme__title gamma"><span>{title}</span></span>
+          <span class="programme__subtitle centi"><span>{subtitle}</span></span>
+        </a>
+      </h4>
+      <p class="programme__synopsis text--subtle centi">
+        <span property="description">{title}: {words}</span>
+      </p>
+    </div>
+  </div>
+</div>
+</li>"""
+
+
+def schedule_html(channel_id, ymd):
+    """
+    A day's schedule page, including (as on bbc.co.uk) the first broadcasts of the
+    following day, which beeb is expected to discard.
+    """
+    day = datetime(*ymd, tzinfo=timezone.utc)
+    slots = schedule_titles(channel_id, ymd)
+    starts = [day + timedelta(minutes=36 * i) for i in range(N_SLOTS)]
+    next_day = day + timedelta(days=1)
+    next_ymd = (next_day.year, next_day.month, next_day.day)
+    next_slots = schedule_titles(channel_id, next_ymd)[:3]
+    next_starts = [next_day + timedelta(minutes=36 * i) for i in range(3)]
+    items = [
+        *(_broadcast_div(s, t, ymd) for s, t in zip(starts, slots)),
+        *(_broadcast_div(s, t, next_ymd) for s, t in zip(next_starts, next_slots)),
+    ]
+    chrome = "\n".join(
+        f'<li class="nav__item"><a href="/sounds/category/{g}">{g}</a></li>'
+        for g in GENRES * 10
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en-GB" class="b-pw-1280 no-touch">
+<head><meta charset="utf-8"><title>Schedule - {channel_id} - {day:%d %B %Y}</title>
+<link rel="stylesheet" href="https://static.files.bbci.co.uk/programmes.css"></head>
+<body>
+<div id="orb-header"><ul class="nav">{chrome}</ul></div>
+<div class="br-page-bg"><div class="programmes-page">
+<h1 class="schedule-title">Schedule for {day:%A %d %B %Y}</h1>
+<ol class="highlight-box-wrapper">{"".join(items)}
+</ol></div></div>
+<div id="orb-footer"><ul class="nav">{chrome}</ul></div>
+</body></html>"""
+
+
+def episode_json(pid):
+    "The `/programmes/{pid}.json` episode metadata, with the parent programme(s)"
+    title_idx = title_idx_from_pid(pid)
+    title = TITLES[title_idx]
+    genre = GENRES[title_idx % len(GENRES)]
+    episode = {
+        "type": "episode",
+        "pid": pid,
+        "title": f"{title} episode",
+        "short_synopsis": f"An episode of {title}",
+        "medium_synopsis": f"An episode of {title}. " * 4,
+        "long_synopsis": f"An episode of {title}. " * 20,
+        "position": None,
+        "media_type": "audio",
+        "categories": [
+            {"type": "genre", "id": genre[:4], "key": genre.lower(), "title": genre},
+            {"type": "format", "id": "PT010", "key": "talk", "title": "Talk"},
+        ],
+        "versions": [{"pid": playlist_vpid(pid), "duration": 3420, "types": ["Original"]}],
+        "ownership": {"service": {"type": "radio", "id": "bbc_radio_four"}},
+    }
+    brand = {"type": "brand", "pid": programme_pid(title_idx), "title": title}
+    if title_idx % ONE_OFF_EVERY != ONE_OFF_EVERY - 1:
+        if title_idx % SERIES_EVERY == 0:
+            series = {
+                "type": "series",
+                "pid": series_pid(title_idx),
+                "title": f"{title}: Series 1",
+                "parent": {"programme": brand},
+            }
+            episode["parent"] = {"programme": series}
+        else:
+            episode["parent"] = {"programme": brand}
+    return json.dumps({"programme": episode})
+
+
+def playlist_vpid(pid):
+    return _pid("p", _hash_int("version", pid))
+
+
+def playlist_json(pid):
+    "The `/programmes/{pid}/playlist.json` giving the version PID to stream"
+    vpid = playlist_vpid(pid)
+    return json.dumps(
+        {
+            "info": {"readme": "For the use of Radiant Player only"},
+            "defaultAvailableVersion": {
+                "pid": vpid,
+                "smpConfig": {"title": pid, "items": [{"vpid": vpid, "kind": "radioProgramme"}]},
+                "markers": [],
+            },
+            "allAvailableVersions": [{"pid": vpid}],
+            "holdingImage": f"//ichef.bbci.co.uk/images/ic/976x549/{pid}.jpg",
+        }
+    )
+
+
+def mpd_url(vpid, supplier):
+    return f"https://vod-dash-uk-{supplier}.akamaized.net/{vpid}/pc_hd_abr_v2.mpd"
+
+
+def mediaset_json(vpid):
+    "The mediaselector response listing the MPEG-DASH manifest URLs by supplier"
+    connections = [
+        {
+            "priority": str(priority),
+            "protocol": protocol,
+            "transferFormat": fmt,
+            "supplier": supplier,
+            "href": mpd_url(vpid, supplier),
+        }
+        for priority, supplier in enumerate(["live", "cf", "ll"], start=1)
+        for protocol in ["https", "http"]
+        for fmt in ["dash", "hls"]
+    ]
+    return json.dumps(
+        {
+            "media": [
+                {
+                    "bitrate": "320",
+                    "encoding": "aac",
+                    "kind": "audio",
+                    "type": "audio/mp4",
+                    "connection": connections,
+                }
+            ]
+        }
+    )
+
+
+def mpd_xml(vpid, duration_s=120, sample_rate=48000, segment_frames=184320):
+    """
+    The MPEG-DASH manifest: two audio `AdaptationSet` bitrate options, each with a
+    `SegmentTemplate` naming `.dash` initialisation and numbered `.m4s` segments.
+    """
+    minutes, seconds = divmod(duration_s, 60)
+    adaptation_sets = "".join(
+        f"""
+    <AdaptationSet group="1" contentType="audio" lang="en" minBandwidth="{bw}"
+      maxBandwidth="{bw}" segmentAlignment="true" audioSamplingRate="{sample_rate}"
+      mimeType="audio/mp4" codecs="mp4a.40.2" startWithSAP="1">
+      <AudioChannelConfiguration
+        schemeIdUri="urn:mpeg:dash:23003:3:audio_channel_configuration:2011" value="2"/>
+      <Role schemeIdUri="urn:mpeg:dash:role:2011" value="main"/>
+      <SegmentTemplate timescale="{sample_rate}" duration="{segment_frames}"
+        initialization="$RepresentationID$.dash" media="$RepresentationID$-$Number$.m4s"
+        startNumber="1"/>
+      <Representation id="{vpid}pc_hd_abr_v2_dash_master-audio={bw}" bandwidth="{bw}"/>
+    </AdaptationSet>"""
+        for bw in [96000, 320000]
+    )
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<MPD xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
+  xsi:schemaLocation="urn:mpeg:dash:schema:mpd:2011 DASH-MPD.xsd"
+  xmlns="urn:mpeg:dash:schema:mpd:2011"
+  type="static" mediaPresentationDuration="PT0H{minutes}M{seconds}S"
+  maxSegmentDuration="PT4S" minBufferTime="PT10S"
+  profiles="urn:mpeg:dash:profile:isoff-live:2011">
+  <Period id="1" duration="PT0H{minutes}M{seconds}S">
+    <BaseURL>dash/</BaseURL>{adaptation_sets}
+  </Period>
+</MPD>"""
+
+
+def episodes_player_html(prog_pid, page, n_days=30, per_page=10, today=None):
+    """
+    A page of a programme's available episodes (newest first) with one episode per
+    day for the last `n_days`, each titled by its date as `dd/mm/yyyy`.
+    """
+    today = today if today else date.today()
+    title_idx = title_idx_from_pid(prog_pid)
+    n_pages = -(-n_days // per_page)
+    days = range((page - 1) * per_page, min(page * per_page, n_days))
+    items = []
+    for d in days:
+        day = today - timedelta(days=d)
+        ymd = (day.year, day.month, day.day)
+        pid = episode_pid(title_idx, ymd)
+        items.append(
+            f"""
+<li class="grid"><div class="programme programme--radio programme--episode block-link
+  programme--grid" data-pid="{pid}" typeof="RadioEpisode" resource="/programmes/{pid}">
+  <div class="programme__body"><h2 class="programme__titles"><a href="/programmes/{pid}"
+    class="br-blocklink__link block-link__target"><span class="programme__title delta"
+    ><span>{day:%d/%m/%Y}</span></span></a></h2>
+  <p class="programme__synopsis text--subtle centi"><span>{TITLES[title_idx]}</span></p>
+  </div></div></li>"""
+        )
+    pages = "".join(
+        f'<li class="pagination__page{" pagination__page--last" if p == n_pages else ""}">'
+        f'<a href="?page={p}">{p}</a></li>'
+        for p in range(1, n_pages + 1)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en-GB"><head><meta charset="utf-8"><title>{prog_pid} episodes</title></head>
+<body><div class="programmes-page"><ol class="highlight-box-wrapper">{"".join(items)}
+</ol><ol class="pagination">{pages}</ol></div></body></html>"""
+
+
+def segment_bytes(name, size):
+    "Synthetic (incompressible-looking) MPEG-DASH segment payload of `size` bytes"
+    seed = blake2b(name.encode(), digest_size=64).digest()
+    return (seed * (size // len(seed) + 1))[:size]
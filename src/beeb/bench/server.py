@@ -0,0 +1,245 @@
+import random
+import re
+import threading
+import time
+import httpx
+from contextlib import contextmanager
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from . import fixtures
+from ..share.archive_utils import get_archive, set_archive
+from ..share.cache_utils import get_cache, set_cache
+from ..share.http_utils import clients
+from ..share.rate_utils import get_rate_limiter, set_rate_limiter
+
+__all__ = ["StandInServer", "StandInTransport", "AsyncStandInTransport", "use_stand_in"]
+
+# Routes are matched against "{host}{path}?{query}" of the original (BBC) URL
+ROUTES = [
+    ("schedule", r"^www\.bbc\.co\.uk/schedules/(\w+)/(\d{4})/(\d{2})/(\d{2})$"),
+    ("playlist", r"^www\.bbc\.co\.uk/programmes/(\w+)/playlist\.json$"),
+    ("episode", r"^www\.bbc\.co\.uk/programmes/(\w+)\.json$"),
+    ("episodes", r"^www\.bbc\.co\.uk/programmes/(\w+)/episodes/player\?page=(\d+)$"),
+    ("mediaset", r"^open\.live\.bbc\.co\.uk/mediaselector/\d+/select/.+/vpid/(\w+)$"),
+    ("mpd", r"^vod-dash-uk-\w+\.akamaized\.net/(\w+)/pc_hd_abr_v2\.mpd$"),
+    ("segment", r"^vod-dash-uk-\w+\.akamaized\.net/\w+/dash/([^/]+\.(?:dash|m4s))$"),
+]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as the real servers allow
+    disable_nagle_algorithm = True  # Else headers then body stall on delayed ACKs
+
+    def log_message(self, format, *args):
+        pass  # Silence the per-request stderr logging
+
+    def do_GET(self):
+        server = self.server.stand_in
+        target = self.path.lstrip("/")
+        route, match = server.route(target)
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        if route is None:
+            status, body, ctype = 404, b"Not Found", "text/plain"
+        elif random.random() < server.error_rate:
+            status, body, ctype = 503, b"Service Unavailable", "text/plain"
+        else:
+            status = 200
+            body, ctype = server.render(route, match)
+        server.count(route, len(body), error=status != 200)
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.write_throttled(body, server.bandwidth)
+
+    def write_throttled(self, body, bandwidth, chunk_size=16384):
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        for i in range(0, len(body), chunk_size):
+            chunk = body[i : i + chunk_size]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bandwidth)
+
+
+class StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # The default backlog of 5 overflows under load
+
+
+class StandInServer:
+    """
+    Offline stand-in for every BBC endpoint beeb fetches, serving the synthetic
+    fixtures in `beeb.bench.fixtures` over plain HTTP on localhost (in a background
+    thread). Requests reach it through `StandInTransport` (or its async version),
+    which rewrites the real URL `https://{host}{path}` to `/{host}{path}` here.
+
+    - `latency`: mean seconds to wait before each response (varied ±50%)
+    - `error_rate`: probability of answering 503 Service Unavailable
+    - `bandwidth`: bytes per second per response (`None` for unlimited)
+    - `duration_s` and `segment_size`: episode length and bytes per segment
+
+    Requests and bytes served are counted per route in `stats`.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        error_rate=0.0,
+        bandwidth=None,
+        duration_s=120,
+        segment_size=32768,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bandwidth = bandwidth
+        self.duration_s = duration_s
+        self.segment_size = segment_size
+        self.routes = [(name, re.compile(rx)) for name, rx in ROUTES]
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = StandInHTTPServer((host, port), StandInHandler)
+        self.httpd.stand_in = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, target):
+        for name, rx in self.routes:
+            m = rx.match(target)
+            if m:
+                return name, m
+        return None, None
+
+    def render(self, route, match):
+        g = match.groups()
+        if route == "schedule":
+            channel_id, *ymd = g
+            body = fixtures.schedule_html(channel_id, tuple(map(int, ymd)))
+        elif route == "playlist":
+            body = fixtures.playlist_json(g[0])
+        elif route == "episode":
+            body = fixtures.episode_json(g[0])
+        elif route == "episodes":
+            body = fixtures.episodes_player_html(g[0], int(g[1]))
+        elif route == "mediaset":
+            body = fixtures.mediaset_json(g[0])
+        elif route == "mpd":
+            body = fixtures.mpd_xml(g[0], duration_s=self.duration_s)
+        elif route == "segment":
+            return fixtures.segment_bytes(g[0], self.segment_size), "video/mp4"
+        ctype = "text/html" if route in ("schedule", "episodes") else "application/json"
+        if route == "mpd":
+            ctype = "application/dash+xml"
+        return body.encode(), ctype
+
+    def count(self, route, n_bytes, error=False):
+        with self._lock:
+            stats = self.stats.setdefault(route, {"requests": 0, "bytes": 0, "errors": 0})
+            stats["requests"] += 1
+            stats["bytes"] += n_bytes
+            stats["errors"] += error
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {}
+
+    def totals(self):
+        with self._lock:
+            return {
+                k: sum(s[k] for s in self.stats.values())
+                for k in ["requests", "bytes", "errors"]
+            }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __repr__(self):
+        return f"StandInServer at {self.base_url} ({self.latency=}, {self.error_rate=})"
+
+
+def rewrite_request(request, base_url):
+    "Point a request for `https://{host}{path}` at `{base_url}/{host}{path}`"
+    url = request.url
+    target = f"{base_url}/{url.host}{url.raw_path.decode('ascii')}"
+    headers = [(k, v) for k, v in request.headers.raw if k.lower() != b"host"]
+    return httpx.Request(request.method, target, headers=headers)
+
+
+class StandInTransport(httpx.HTTPTransport):
+    """
+    Sends every request to the stand-in server instead. The client still reports
+    the original URL on the response (`response.url`), so beeb is none the wiser.
+    """
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def handle_request(self, request):
+        return super().handle_request(rewrite_request(request, self.base_url))
+
+
+class AsyncStandInTransport(httpx.AsyncHTTPTransport):
+    "Async version of `StandInTransport`"
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    async def handle_async_request(self, request):
+        return await super().handle_async_request(rewrite_request(request, self.base_url))
+
+
+client_settings = [
+    "http2", "limits", "timeout", "transport_factory", "async_transport_factory"
+]
+
+
+@contextmanager
+def use_stand_in(server, rate_limit=False):
+    """
+    Route all of beeb's requests (sync and async) to the stand-in `server` within
+    the block, by default also lifting any per-host rate limits set (they're meant
+    for the real servers), and restoring the previous configuration afterwards.
+    The response cache and schedule archive are switched off within the block (set
+    them inside it to use them), so stand-in pages aren't stored as the real ones.
+    """
+    prev_config = {k: getattr(clients, k) for k in client_settings}
+    prev_rate_limiter, prev_cache, prev_archive = (
+        get_rate_limiter(), get_cache(), get_archive()
+    )
+    clients.configure(
+        transport_factory=partial(StandInTransport, server.base_url),
+        async_transport_factory=partial(AsyncStandInTransport, server.base_url),
+    )
+    if not rate_limit:
+        set_rate_limiter(None)
+    set_cache(None)
+    set_archive(None)
+    try:
+        yield server
+    finally:
+        clients.reset()  # Clears the transport factories (`configure` skips `None`)
+        clients.configure(**prev_config)
+        set_rate_limiter(prev_rate_limiter)
+        set_cache(prev_cache)
+        set_archive(prev_archive)
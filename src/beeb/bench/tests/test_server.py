@@ -0,0 +1,54 @@
+import httpx
+import pytest
+
+from beeb.bench import StandInServer, use_stand_in
+from beeb.nav import ChannelListings
+from beeb.share.http_utils import GET
+
+@pytest.fixture(scope="module")
+def server():
+    with StandInServer() as stand_in, use_stand_in(stand_in):
+        yield stand_in
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.bbc.co.uk/programmes/m00lht6g.json",
+        "https://www.bbc.co.uk/programmes/m00lht6g/playlist.json",
+        "https://www.bbc.co.uk/programmes/b006qj9z/episodes/player?page=2",
+    ],
+)
+def test_routes(server, url):
+    response = GET(url)
+    assert str(response.url) == url  # the rewrite is invisible to the caller
+
+def test_listings(server):
+    server.reset_stats()
+    listings = ChannelListings.from_channel_name("r4", n_days=2)
+    totals = server.totals()
+    assert totals["requests"] == 2 and totals["errors"] == 0
+    assert all(s.broadcasts for s in listings.schedules)
+
+def test_restores_config(tmp_path):
+    "The caller's client settings, cache and archive are back in place afterwards"
+    from beeb.share.archive_utils import ScheduleArchive, get_archive, set_archive
+    from beeb.share.cache_utils import ResponseCache, get_cache, set_cache
+    from beeb.share.http_utils import clients
+    prev_http2, prev_timeout = clients.http2, clients.timeout
+    timeout = httpx.Timeout(3.0)
+    clients.configure(http2=True, timeout=timeout)
+    transport_factory = clients.transport_factory
+    cache = set_cache(ResponseCache(dir=tmp_path))
+    archive = set_archive(ScheduleArchive(dir=tmp_path))
+    try:
+        with StandInServer() as stand_in, use_stand_in(stand_in):
+            assert get_cache() is None and get_archive() is None
+            ChannelListings.from_channel_name("r4", n_days=2)
+        assert clients.http2 and clients.timeout is timeout
+        assert clients.transport_factory is transport_factory
+        assert get_cache() is cache and get_archive() is archive
+        assert len(cache) == len(archive) == 0
+    finally:
+        clients.configure(http2=prev_http2, timeout=prev_timeout)
+        set_cache(None)
+        set_archive(None)
@@ -2,47 +2,209 @@ from ..sched.programme import Programme
 from ..sched.listings import ChannelListings
 from ..search import CatalogueSearchMixIn
 from ...api.json_helpers import EpisodeMetadataPidJson
+from ...share.compact_utils import get_compact, intern_strings
 from ...share.db_utils import CatalogueDB
-from ...share.http_utils import async_errors
+from ...share.time import parse_abs_from_rel_date
+from ...share.trace_utils import count, span
+from datetime import timedelta
 from sys import stderr
+import asyncio
 
 __all__ = ["ProgrammeCatalogue"]
 
 class ProgrammeCatalogue(CatalogueSearchMixIn, dict):
-    def __init__(self, station_name, with_genre=False, n_days=30, async_pull=True, store=False):
+    reloaded = False  # Set on catalogues regenerated from the database
+    resolve_from_db = True  # Look up episodes' programmes in the database first
+    one_per_title = False  # Fetch the metadata of just one episode for each title
+    complete_until = None  # The last date of listings fully folded in (if pulled)
+
+    def __init__(
+        self,
+        station_name,
+        with_genre=False,
+        n_days=30,
+        async_pull=True,
+        store=False,
+        pool=None,
+    ):
         """
         Given a channel name, build a dict of programme PIDs and programme titles.
         If `with_genre` is True, make the value a 2-tuple of (title, genre).
+        The schedules are parsed on `pool` (a `WorkerPool`) if given.
         """
         self.genred = with_genre
         self.station_name = station_name
         self.n_days = n_days
+        self.resolutions = {}  # Episode PID: programme resolution (see `CatalogueDB`)
+        self.new_resolutions = {}  # Those fetched (not looked up) so not yet stored
         # n_days = 0 will be parsed as None-like and default to 30, so skip manually
         if n_days > 0:
-            listings = ChannelListings.from_channel_name(station_name, n_days=n_days)
-            if async_pull:
-                self.async_pull_and_parse(listings)
-            else:
-                self.pull_and_parse(listings)
+            listings = ChannelListings.from_channel_name(
+                station_name, n_days=n_days, pool=pool
+            )
+            self.fold_in(listings, async_pull=async_pull)
             if store:
                 self.store_db()
 
+    def fold_in(self, listings, async_pull=True):
+        "Record the programmes in the listings, and the last date they're complete for"
+        if self.resolve_from_db:
+            self.load_resolutions(listings)
+        if async_pull:
+            self.async_pull_and_parse(listings)
+        else:
+            self.pull_and_parse(listings)
+        self.complete_until = listings.complete_until()
+
+    def refresh(self, n_days=30, async_pull=True, store=True, pool=None):
+        """
+        Fetch just the listings (and episode metadata) since the station's watermark
+        in the database, the last date already folded in, up to today (or the last
+        `n_days` if there's no watermark or it's older) and merge in any new
+        programmes. Return the number of programmes added. Today is always fetched,
+        as its listings may yet change (see `watermarks`).
+        """
+        date_range = self.refresh_range(n_days)
+        if date_range is None:
+            return 0  # No days to pull
+        from_date, to_date = date_range
+        n_before = len(self)
+        with span("catalogue.refresh", station=self.station_name, since=str(from_date)):
+            listings = ChannelListings.from_channel_name(
+                self.station_name, from_date=from_date, to_date=to_date, pool=pool
+            )
+            self.fold_in(listings, async_pull=async_pull)
+        self.reloaded = False  # Has been added to since it was loaded
+        if store:
+            self.store_db()
+        return len(self) - n_before
+
+    def refresh_range(self, n_days=30):
+        """
+        The `(from_date, to_date)` of the listings to pull to bring the catalogue up
+        to date (see `refresh`), which always includes today, or `None` if there are
+        no days to pull (when `n_days` is under 1).
+        """
+        self.ensure_db()
+        today = parse_abs_from_rel_date()
+        watermark = self.db.get_watermark(self.station_name)
+        from_date = today - timedelta(days=n_days - 1)
+        if watermark is not None:
+            last_day = min(watermark, today - timedelta(days=1))  # Refetch today
+            from_date = max(from_date, last_day + timedelta(days=1))
+        return (from_date, today) if from_date <= today else None
+
+    async def async_build(
+        self,
+        from_date=None,
+        to_date=None,
+        n_days=None,
+        pool=None,
+        session=None,
+        limiter=None,
+    ):
+        """
+        Coroutine to pull the listings for the date range and fold them in (as the
+        `async_pull` mode of `fold_in` does), sharing the running loop, the open
+        client `session` and the concurrency `limiter` with other catalogues' pulls
+        (see `ProgrammeGuide.generate_by_names`).
+        """
+        with span("catalogue.build", station=self.station_name):
+            listings = ChannelListings.from_channel_name(
+                self.station_name,
+                from_date=from_date,
+                to_date=to_date,
+                n_days=n_days,
+                pool=pool,
+                defer_fetch=True,
+            )
+            await listings.async_fetch_schedules(session=session, limiter=limiter)
+            if self.resolve_from_db:
+                self.load_resolutions(listings)
+            await self.async_fetch_and_parse(listings, session=session, limiter=limiter)
+            self.complete_until = listings.complete_until()
+        self.reloaded = False  # Has been added to (if it was loaded)
+
+    def load_resolutions(self, listings):
+        """
+        Record the programmes of the listings' episodes already resolved in the
+        database, so that only the metadata of new episodes needs fetching.
+        """
+        if not hasattr(self, "db"):
+            db = CatalogueDB(create=False)
+            if not db.exists():
+                return
+            self.db = db
+        episode_pids = {b.pid for b in listings.all_broadcasts}
+        found = self.db.get_episodes(episode_pids)
+        count("episode_cache_hits", len(found))
+        self.resolutions.update(found)
+        for episode_pid in found:
+            self.record_episode_data(episode_pid)
+
     def pull_and_parse(self, listings):
         self.parse_broadcast_records(listings.all_broadcasts, sync=True)
 
-    def async_pull_and_parse(self, listings, pbar=None, verbose=False, n_retries=3):
-        for i in range(n_retries):
-            try:
-                listings.fetch_episode_metadata(pbar=pbar, verbose=verbose)
-            except async_errors as e:
-                if verbose:
-                    print(f"Error occurred {e}, retrying", file=stderr)
-                if i == n_retries - 1:
-                    raise e # # Persisted after all retries, so throw it, don't proceed
-                # Otherwise retry, connection was terminated due to httpx bug (see #6)
-            else:
-                break # exit the for loop if it succeeds
-        self.parse_broadcast_records(listings.all_broadcasts, sync=False)
+    def async_pull_and_parse(
+        self,
+        listings,
+        pbar=None,
+        verbose=False,
+        n_retries=3,
+        pipelined=True,
+        one_per_title=None,
+    ):
+        """
+        Fetch the episode metadata for all broadcasts in the listings, retrying each
+        failed request up to `n_retries` times (with backoff). Broadcasts which still
+        fail are skipped, their URLs recorded in `failed_urls` (with the final error).
+
+        If `pipelined` (default), each episode's programme is recorded as soon as its
+        metadata arrives, rather than storing all of it on the broadcasts first.
+
+        Each distinct episode is fetched once. If `one_per_title` (default: the class
+        attribute, False) only one episode per title is, as the sync mode does, which
+        misses a programme if another shares its title.
+        """
+        asyncio.run(
+            self.async_fetch_and_parse(
+                listings, pbar, verbose, n_retries, pipelined, one_per_title
+            )
+        )
+
+    async def async_fetch_and_parse(
+        self,
+        listings,
+        pbar=None,
+        verbose=False,
+        n_retries=3,
+        pipelined=True,
+        one_per_title=None,
+        session=None,
+        limiter=None,
+    ):
+        "Coroutine of `async_pull_and_parse`, optionally sharing `session` and `limiter`"
+        one_per_title = self.one_per_title if one_per_title is None else one_per_title
+        if pipelined:
+            on_parsed = lambda data: self.record_episode_data(data.episode_pid, data)
+        else:
+            on_parsed = None
+        with span("catalogue.fetch_episodes", station=self.station_name):
+            self.failed_urls = await listings.async_fetch_episode_metadata(
+                pbar=pbar,
+                verbose=verbose,
+                n_retries=n_retries,
+                on_parsed=on_parsed,
+                skip_pids=self.resolutions,
+                one_per_title=one_per_title,
+                session=session,
+                limiter=limiter,
+            )
+        if verbose and self.failed_urls:
+            print(f"Failed to fetch {len(self.failed_urls)} episodes", file=stderr)
+        if not pipelined:
+            with span("catalogue.parse", station=self.station_name):
+                self.parse_broadcast_records(listings.all_broadcasts, sync=False)
 
     def parse_broadcast_records(self, broadcasts, sync):
         """
@@ -54,27 +216,35 @@ class ProgrammeCatalogue(CatalogueSearchMixIn, dict):
             if sync:
                 if b.title in self.episode_titles:
                     continue
-            try:
-                if self.genred:
-                    parse_json = EpisodeMetadataPidJson.get_programme_pid_title_genre
-                else:
-                    parse_json = EpisodeMetadataPidJson.get_programme_pid_title
-                if not sync and not hasattr(b, "frozen_data"):
-                    # The episode was skipped and no data stored on it, so skip here too
-                    continue
-                ep_pid = b.pid if sync else b.frozen_data.episode_pid
-                prefab = None if sync else b.frozen_data
-                # Obtain program PID from episode PID, also title and possibly genre
-                prog_pid, prog_title, *opt_genre = parse_json(ep_pid, prefab=prefab)
-                prog_genre = opt_genre[0] if self.genred else None
-                if prog_pid in self:
-                    continue # Already processed this programme
-                prog = Programme(prog_pid, prog_title, prog_genre, self.station_name)
-            except KeyError as e:
-                # One off programmes don't have a "parent" key (not a "series"/"brand")
-                continue
-            else:
-                self.record_programme(prog)
+                self.record_episode_data(b.pid)
+            elif hasattr(b, "frozen_data"):
+                self.record_episode_data(b.frozen_data.episode_pid, b.frozen_data)
+                if get_compact():
+                    del b.frozen_data  # Only needed until recorded
+            # else the episode was skipped and no data stored on it, so skip here too
+
+    def record_episode_data(self, episode_pid, prefab=None):
+        """
+        Record the programme of an episode, as resolved in the database if it was
+        looked up there, else from its metadata (pulled by episode PID, unless
+        already fetched and given as `prefab`, an `EpisodeMetadataPidJson`), keeping
+        that new resolution to store along with the catalogue.
+        """
+        resolution = None if prefab else self.resolutions.get(episode_pid)
+        if resolution is None:
+            get_resolution = EpisodeMetadataPidJson.get_programme_resolution
+            resolution = get_resolution(episode_pid, prefab=prefab)
+            if get_compact():
+                resolution = intern_strings(resolution)  # Shared by many episodes
+            self.new_resolutions[episode_pid] = resolution
+        prog_pid, prog_title, prog_genre, _ = resolution
+        if prog_pid is None:
+            # One off programmes don't have a "parent" key (not a "series"/"brand")
+            return
+        if prog_pid in self:
+            return # Already processed this programme
+        prog_genre = prog_genre if self.genred else None
+        self.record_programme(Programme(prog_pid, prog_title, prog_genre, self.station_name))
 
     def record_programme(self, programme):
         pd_val = (programme.title, programme.genre) if self.genred else programme.title
@@ -98,8 +268,11 @@ class ProgrammeCatalogue(CatalogueSearchMixIn, dict):
         return genre_dict
 
     @classmethod
-    def regenerate_from_db(cls, station_name, with_genre=True):
+    def regenerate_from_db(cls, station_name, with_genre=True, db=None):
+        "Reload from the database (`db` if given, to reuse its connection)"
         catalogue = cls(station_name, with_genre=True, n_days=0)
+        if db is not None:
+            catalogue.db = db
         catalogue.ensure_db(no_touch=True)
         db_entries = catalogue.retrieve_station_in_db()
         genres = [e[2] for e in db_entries] # peek at the genres
@@ -107,35 +280,55 @@ class ProgrammeCatalogue(CatalogueSearchMixIn, dict):
         for pid, title, genre, station in db_entries:
             prog = Programme(pid, title, genre, station)
             catalogue.record_programme(prog)
+        catalogue.reloaded = True
         if not with_genre:
             catalogue.ungenre() # Ensure removed post-hoc if not desired
         return catalogue
     
     @classmethod
     def lazy_generate(
-            cls, station_name, genred=True, n_days=30, async_pull=True, store=True
+            cls,
+            station_name,
+            genred=True,
+            n_days=30,
+            async_pull=True,
+            store=True,
+            pool=None,
+            refresh=False,
         ):
         """
         Try to reload from database, only pull fresh catalogue if not available.
+        If `refresh`, a reloaded catalogue is brought up to date (see `refresh`).
         """
+        catalogue = cls.reload_stored(station_name, genred=genred)
+        if catalogue is None:
+            catalogue = cls(
+                station_name,
+                with_genre=genred,
+                n_days=n_days,
+                async_pull=async_pull,
+                pool=pool,
+            )
+            if store:
+                catalogue.store_db()
+        elif refresh:
+            catalogue.refresh(n_days, async_pull=async_pull, store=store, pool=pool)
+        return catalogue
+
+    @classmethod
+    def reload_stored(cls, station_name, genred=True):
+        "Reload from the database if the station is in it, else return `None`"
         # Set up a temporary object that'll be overwritten after ensuring exists
         catalogue = cls(station_name, with_genre=genred, n_days=0)
         try:
             catalogue.ensure_db(no_touch=True)
         except FileNotFoundError:
-            db_exists = False
-        else:
-            db_exists = catalogue.db.exists()
-        if db_exists and catalogue.db.has_station(station_name):
-            catalogue = cls.regenerate_from_db(station_name)
-            if genred and not catalogue.genred:
-                print(f"(!) The reloaded catalogue is ungenred: {catalogue}")
-        else:
-            catalogue = cls(
-                station_name, with_genre=genred, n_days=n_days, async_pull=async_pull
-            )
-            if store:
-                catalogue.store_db()
+            return None
+        if not (catalogue.db.exists() and catalogue.db.has_station(station_name)):
+            return None
+        catalogue = cls.regenerate_from_db(station_name, db=catalogue.db)
+        if genred and not catalogue.genred:
+            print(f"(!) The reloaded catalogue is ungenred: {catalogue}")
         return catalogue
 
     def ensure_db(self, no_touch=False):
@@ -149,14 +342,35 @@ class ProgrammeCatalogue(CatalogueSearchMixIn, dict):
             self.db = CatalogueDB(create=not no_touch, no_touch=no_touch)
 
     def store_db(self):
+        "Write the whole catalogue to the database in one transaction"
         self.ensure_db()
+        with span("catalogue.store_db", station=self.station_name, n_entries=len(self)):
+            self.db.insert_entries(
+                self.db_entries(),
+                watermarks=self.watermarks(),
+                episodes=self.new_resolutions,
+            )
+
+    def watermarks(self):
+        """
+        The station's new watermark (to store), if the listings were pulled: at most
+        yesterday, as today's listings change late on (and the metadata of episodes
+        still to be broadcast may not be published yet), so is always refetched.
+        """
+        if not self.complete_until:
+            return {}
+        yesterday = parse_abs_from_rel_date() - timedelta(days=1)
+        return {self.station_name: min(self.complete_until, yesterday)}
+
+    def db_entries(self):
+        "The `(pid, title, genre, station)` database row of each programme"
         for pid, value in self.items():
             if self.genred:
                 title, genre = value
             else:
                 title = value
                 genre = None
-            self.insert_db_entry(pid, title, genre)
+            yield pid, title, genre, self.station_name
 
     def insert_db_entry(self, pid, title, genre):
         if self.genred and genre is None:
@@ -1,20 +1,36 @@
+import asyncio
 from .catalogue import ProgrammeCatalogue
 from ..search import CatalogueSearchMixIn
 from ..channel_ids import ChannelPicker
+from ..sched.async_utils import guide_limits, open_session
+from ...share.db_utils import CatalogueDB
+from ...share.trace_utils import span
 
 __all__ = ["ProgrammeGuide"]
 
 
 class ProgrammeGuide(CatalogueSearchMixIn, dict):
+    concurrent = True  # Pull all the stations' catalogues at once, on one loop
+
     def __init__(
-        self, station_names, with_genre=False, n_days=30, async_pull=True, store=False
+        self,
+        station_names,
+        with_genre=False,
+        n_days=30,
+        async_pull=True,
+        store=False,
+        pool=None,
     ):
+        """
+        Build a catalogue for each station. Pass a `WorkerPool` as `pool` to parse
+        all their schedules on it, e.g. `with WorkerPool() as pool:` around this.
+        """
         self.genred = with_genre
         self.n_days = n_days
         for n in sorted(station_names):
-            self.record_catalogue(n, async_pull=async_pull, store=store)
+            self.record_catalogue(n, async_pull=async_pull, store=store, pool=pool)
 
-    def record_catalogue(self, station_name, async_pull=True, store=False):
+    def record_catalogue(self, station_name, async_pull=True, store=False, pool=None):
         if station_name in self:
             raise KeyError(f"{station_name=} is already a recorded key")
         pc = ProgrammeCatalogue(
@@ -23,6 +39,7 @@ class ProgrammeGuide(CatalogueSearchMixIn, dict):
             n_days=self.n_days,
             async_pull=async_pull,
             store=store,
+            pool=pool,
         )
         self.update({station_name: pc})
 
@@ -35,11 +52,88 @@ class ProgrammeGuide(CatalogueSearchMixIn, dict):
         n_days=30,
         async_pull=True,
         store=True,
+        pool=None,
+        refresh=False,
     ):
         """
         Generate programme catalogues for a list of names, e.g.
-        `["r1", "r2"]` (matching those in `beeb.nav.channel_ids`)
+        `["r1", "r2"]` (matching those in `beeb.nav.channel_ids`). If `store`,
+        the newly pulled catalogues are all written to the database at the end,
+        in one transaction (if any station's pull fails, the others are still
+        stored before its error is raised). If `refresh` (and `lazy`), catalogues
+        reloaded from the database are brought up to date with the days since they
+        were stored.
+
+        If `concurrent` (the class attribute, default: True) and `async_pull`, every
+        station's fetches run together on a single event loop, through one shared
+        client and concurrency budget (a limiter from `guide_limits`), so the guide
+        takes about as long as its slowest station rather than the sum of them all.
         """
+        if not (cls.concurrent and async_pull):
+            return cls.generate_in_turn(
+                station_names, lazy, genred, n_days, async_pull, store, pool, refresh
+            )
+        guide = cls(station_names=[], n_days=0)
+        to_pull = {}  # Station name: the date range of the listings to pull
+        for station_name in station_names:
+            if station_name in guide:
+                raise KeyError(f"{station_name=} is already a recorded key")
+            pc = ProgrammeCatalogue.reload_stored(station_name, genred) if lazy else None
+            if pc is None:
+                pc = ProgrammeCatalogue(station_name, with_genre=genred, n_days=0)
+                pc.n_days = n_days
+                to_pull[station_name] = {"n_days": n_days}
+            elif refresh:
+                date_range = pc.refresh_range(n_days)
+                if date_range is not None:
+                    to_pull[station_name] = dict(zip(("from_date", "to_date"), date_range))
+            guide.update({station_name: pc})
+        failed = asyncio.run(guide.async_pull(to_pull, pool=pool)) if to_pull else {}
+        if store:
+            guide.store_db(reloaded=False, skip=failed)
+        if failed:
+            raise next(iter(failed.values()))
+        return guide
+
+    async def async_pull(self, date_ranges, pool=None, limiter=None):
+        """
+        Pull the listings (for each station's date range, given as keyword arguments
+        to `ProgrammeCatalogue.async_build`) into the catalogues, all at once on the
+        running loop, sharing one client and concurrency `limiter` (by default a new
+        one from `guide_limits`). Every station's pull runs to the end, and the
+        errors of those that failed are returned (as a dict keyed by station name).
+        """
+        with guide_limits.use(limiter) as limiter:
+            async with open_session(limiter=limiter) as session:
+                with span("guide.pull", n_stations=len(date_ranges)):
+                    results = await asyncio.gather(
+                        *(
+                            self[station_name].async_build(
+                                pool=pool, session=session, limiter=limiter, **kwargs
+                            )
+                            for station_name, kwargs in date_ranges.items()
+                        ),
+                        return_exceptions=True,
+                    )
+        return {
+            station_name: result
+            for station_name, result in zip(date_ranges, results)
+            if isinstance(result, Exception)
+        }
+
+    @classmethod
+    def generate_in_turn(
+        cls,
+        station_names,
+        lazy=True,
+        genred=True,
+        n_days=30,
+        async_pull=True,
+        store=True,
+        pool=None,
+        refresh=False,
+    ):
+        "Generate the catalogues of `generate_by_names` one station after another"
         guide = cls(station_names=[], n_days=0)
         for station_name in station_names:
             if station_name in guide:
@@ -50,7 +144,9 @@ class ProgrammeGuide(CatalogueSearchMixIn, dict):
                     genred=genred,
                     n_days=n_days,
                     async_pull=async_pull,
-                    store=store,
+                    store=False,
+                    pool=pool,
+                    refresh=refresh,
                 )
                 if lazy
                 else ProgrammeCatalogue(
@@ -58,29 +154,70 @@ class ProgrammeGuide(CatalogueSearchMixIn, dict):
                     with_genre=genred,
                     n_days=n_days,
                     async_pull=async_pull,
-                    store=store,
+                    store=False,
+                    pool=pool,
                 )
             )
             guide.update({station_name: pc})
+        if store:
+            guide.store_db(reloaded=False)
         return guide
 
+    def store_db(self, reloaded=True, db=None, skip=()):
+        """
+        Write every station's catalogue to the database in a single transaction
+        (skipping any reloaded from it unless `reloaded` is True, and any station
+        named in `skip`).
+        """
+        catalogues = [
+            pc
+            for station_name, pc in self.items()
+            if station_name not in skip and (reloaded or not pc.reloaded)
+        ]
+        if not catalogues:
+            return 0
+        db = db if db else CatalogueDB()
+        watermarks = {k: v for pc in catalogues for k, v in pc.watermarks().items()}
+        episodes = {k: v for pc in catalogues for k, v in pc.new_resolutions.items()}
+        with span("guide.store_db", n_stations=len(catalogues)):
+            return db.insert_entries(
+                (entry for pc in catalogues for entry in pc.db_entries()),
+                watermarks=watermarks,
+                episodes=episodes,
+            )
+
     @classmethod
     def generate_by_category(
-        cls, category, lazy=True, genred=True, n_days=30, async_pull=True, store=True
+        cls,
+        category,
+        lazy=True,
+        genred=True,
+        n_days=30,
+        async_pull=True,
+        store=True,
+        refresh=False,
     ):
         """
         Generate programme catalogues for a category of channels, e.g. 'national'
+        (pass `refresh=True` to bring the stored ones up to date, e.g. nightly)
         """
         station_names = ChannelPicker.keys_by_category(category, remove_variants=True)
         guide = cls.generate_by_names(
-            station_names, lazy, genred, n_days, async_pull, store
+            station_names, lazy, genred, n_days, async_pull, store, refresh=refresh
         )
         # May need to retry in case httpx throws ConnectTimeout error?
         return guide
 
     @classmethod
     def generate_by_titles(
-        cls, titles, lazy=True, genred=True, n_days=30, async_pull=True, store=True
+        cls,
+        titles,
+        lazy=True,
+        genred=True,
+        n_days=30,
+        async_pull=True,
+        store=True,
+        refresh=False,
     ):
         """
         Generate programme catalogues for a list of titles, e.g.
@@ -90,6 +227,6 @@ class ProgrammeGuide(CatalogueSearchMixIn, dict):
             titles = [titles]
         station_names = [ChannelPicker.by_title(t, return_value=False) for t in titles]
         guide = cls.generate_by_names(
-            station_names, lazy, genred, n_days, async_pull, store
+            station_names, lazy, genred, n_days, async_pull, store, refresh=refresh
         )
         return guide
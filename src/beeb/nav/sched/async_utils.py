@@ -1,68 +1,252 @@
 import asyncio
 import httpx
 from aiostream import stream
+from contextlib import nullcontext
 from functools import partial
 from pathlib import Path
+from .schedule import parse_schedule_page
 from ...api.json_helpers import EpisodeMetadataPidJson
+from ...share.http_utils import async_GET, clients
+from ...share.concurrency_utils import LimiterFactory, drain
+from ...share.retry_utils import RetryPolicy
+from ...share.parse_utils import get_html_parser, get_parse_mode
+from ...share.trace_utils import span
 
 __all__ = ["fetch", "process", "async_fetch_urlset", "fetch_urls"]
 
-async def fetch(session, url, raise_for_status=False):
-    response = await session.get(str(url))
-    if raise_for_status:
-        response.raise_for_status()
-    return response
+# Each call gets its own limiter, starting at the limit the last call settled on
+schedule_limits = LimiterFactory(initial=20, max_limit=64)
+episode_limits = LimiterFactory(initial=20, max_limit=64)
+# One budget for all the fetches of a guide built on a single loop (all stations)
+guide_limits = LimiterFactory(initial=32, max_limit=128)
+
+
+def open_session(session=None, use_http2=False, limiter=None):
+    """
+    Async context manager giving the `session` if one is passed (which is left open
+    for its owner to close), else a new client pooling up to the limiter's maximum.
+    """
+    if session is not None:
+        return nullcontext(session)
+    n = limiter.max_limit
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    return clients.make_async_client(http2=use_http2, limits=limits)
+
+
+async def fetch(session, url, raise_for_status=False, limiter=None):
+    # Consults the response cache (if set) before going to the network
+    return await async_GET(session, url, raise_for_status=raise_for_status, limiter=limiter)
+
+
+async def fetch_with_retry(session, url, limiter=None, retry=None):
+    "Retry `fetch` per URL, returning `None` once retries are exhausted"
+    retry = retry if retry else RetryPolicy()
+    return await retry.call(fetch, session, url, False, limiter, url=url)
 
 
 async def process_soup(data, schedules, pbar=None, verbose=False):
+    if data is None:
+        return  # Failed after retries (recorded by the RetryPolicy)
     # Map the response back to the ChannelSchedule it came from in the schedules list
     sched = next(s for s in schedules if data.url == s.sched_url)
-    # Save the soup for boiling later (using multiprocessing on entire listing)
-    sched.frozen_soup = data.content.decode()
+    # Save the raw page for boiling later (using multiprocessing on entire listing)
+    sched.frozen_soup = data.content
     if verbose:
         print({data.url: data})
     if pbar:
         pbar.update()
 
 
-async def process_json(data, jsons, pbar=None, verbose=False):
-    # Map the response back to the EpisodeMetadataPidJson it came from in the jsons list
-    episode = next(e for (u, e) in jsons.items() if data.url == u)
-    # Save the JSON for later (using multiprocessing on entire listing)
-    episode.frozen_data = EpisodeMetadataPidJson.from_json(
-        json=data.content.decode(), pid=episode.pid, load_string=True
-    )
+async def parse_soup(data, schedules, pool, pbar=None, verbose=False):
+    "Pipelined alternative to `process_soup`: parse on the pool as each page arrives"
+    if data is None:
+        return  # Failed after retries (recorded by the RetryPolicy)
+    sched = next(s for s in schedules if data.url == s.sched_url)
+    loop = asyncio.get_running_loop()
+    with span("listings.parse", url=str(data.url)):
+        sched.broadcast_records = await loop.run_in_executor(
+            pool.executor,
+            parse_schedule_page,
+            data.content,
+            sched.ymd,
+            get_html_parser(),
+            get_parse_mode(),
+        )
     if verbose:
         print({data.url: data})
     if pbar:
         pbar.update()
 
 
-async def async_fetch_urlset(urls, schedules, pbar=None, verbose=False, use_http2=True):
-    async with httpx.AsyncClient(http2=use_http2) as session:
-        ws = stream.repeat(session)
-        xs = stream.zip(ws, stream.iterate(urls))
-        ys = stream.starmap(xs, fetch, ordered=False, task_limit=20) # 30 is similar IDK
-        process = partial(process_soup, schedules=schedules, pbar=pbar, verbose=verbose)
-        zs = stream.map(ys, process)
-        return await zs
+async def process_json(data, jsons, pbar=None, verbose=False, on_parsed=None):
+    if data is None:
+        return  # Failed after retries (recorded by the RetryPolicy)
+    # Map the response back to the broadcasts (one or more) it was fetched for
+    episodes = jsons.pop(str(data.url), None)
+    if episodes is None:
+        return  # A coalesced duplicate request shares the response: parse it once
+    episode = episodes[0]  # Repeats of the episode carry no extra programme info
+    with span("parse.json", url=str(data.url)):
+        parsed = EpisodeMetadataPidJson.from_json(
+            json=data.content, pid=episode.pid, load_string=True, lean=True
+        )
+    if on_parsed:
+        on_parsed(parsed)  # Pipelined: handle it now rather than keep it
+    else:
+        # Save the JSON for later (using multiprocessing on entire listing)
+        episode.frozen_data = parsed
+    if verbose:
+        print({data.url: data})
+    if pbar:
+        pbar.update()
+
 
-def fetch_schedules(urls, schedules, pbar=None, verbose=False):
-    return asyncio.run(async_fetch_urlset(urls, schedules, pbar, verbose))
+async def async_fetch_urlset(
+    urls,
+    schedules,
+    pbar=None,
+    verbose=False,
+    use_http2=True,
+    limiter=None,
+    retry=None,
+    pool=None,
+    session=None,
+):
+    """
+    Fetch the schedule pages, retrying failed requests individually.
+    Return a dict of the URLs that finally failed (to the last error or response).
+
+    If a `WorkerPool` is passed as `pool`, each page is parsed on it as soon as it
+    arrives (setting the schedule's `broadcast_records`), overlapping the parsing
+    with the network, rather than kept as `frozen_soup` for boiling afterwards.
+    Both stages have a task limit, so only a bounded number of pages are held.
+
+    Pass an open client as `session` to share it (e.g. with other stations' fetches
+    on the same loop), else a client is opened for these fetches alone.
+    """
+    retry = retry if retry else RetryPolicy()
+    with schedule_limits.use(limiter) as limiter:
+        async with open_session(session, use_http2, limiter) as session:
+            ws = stream.repeat(session)
+            xs = stream.zip(ws, stream.iterate(urls))
+            retry_fetch = partial(fetch_with_retry, limiter=limiter, retry=retry)
+            ys = stream.starmap(
+                xs, retry_fetch, ordered=False, task_limit=limiter.max_limit
+            )
+            kwargs = dict(schedules=schedules, pbar=pbar, verbose=verbose)
+            if pool is None:
+                zs = stream.map(ys, partial(process_soup, **kwargs))
+            else:
+                process = partial(parse_soup, pool=pool, **kwargs)
+                zs = stream.map(ys, process, task_limit=pool.n_workers)
+            await drain(zs)
+        if verbose:
+            print(f"Schedule fetches: {limiter}, {retry}")
+    return retry.failures
+
+
+def fetch_schedules(urls, schedules, pbar=None, verbose=False, n_retries=3, pool=None):
+    retry = RetryPolicy(n_retries=n_retries)
+    return asyncio.run(
+        async_fetch_urlset(urls, schedules, pbar, verbose, retry=retry, pool=pool)
+    )
 
 
 # do not use http2, it's throwing exceptions see #6 for tracebacks and links
-async def async_fetch_episodes(listings, pbar=None, verbose=False, use_http2=False):
-    jsons = dict(zip(listings.broadcasts_urlset, listings.all_broadcasts))
-    limits = httpx.Limits(max_keepalive_connections=20)
-    async with httpx.AsyncClient(http2=use_http2, limits=limits) as session:
-        ws = stream.repeat(session)
-        xs = stream.zip(ws, stream.iterate(listings.broadcasts_urlset))
-        ys = stream.starmap(xs, fetch, ordered=False, task_limit=20) # 20 is optimal
-        process = partial(process_json, jsons=jsons, pbar=pbar, verbose=verbose)
-        zs = stream.map(ys, process)
-        return await zs
-
-
-def fetch_episode_metadata(listings, pbar=None, verbose=False):
-    return asyncio.run(async_fetch_episodes(listings, pbar, verbose))
+async def async_fetch_episodes(
+    listings,
+    pbar=None,
+    verbose=False,
+    use_http2=False,
+    limiter=None,
+    retry=None,
+    on_parsed=None,
+    skip_pids=(),
+    one_per_title=False,
+    session=None,
+):
+    """
+    Fetch the episode metadata JSON for each broadcast in the listings, retrying
+    failed requests individually. Return a dict of the URLs that finally failed.
+
+    Each response is parsed as it arrives. If `on_parsed` is given it is called
+    with the `EpisodeMetadataPidJson` (pipelined), else that is stored on the
+    first broadcast of the episode as `frozen_data` for processing afterwards.
+    Each distinct episode is fetched once, except those with PIDs in `skip_pids`
+    (e.g. already resolved), and if `one_per_title` only one episode per title is.
+    An open client can be shared as `session` (as for `async_fetch_urlset`).
+    """
+    # Several broadcasts (repeats) may share an episode metadata URL
+    jsons = listings.episode_fetch_plan(skip_pids, one_per_title)
+    urls = list(jsons)
+    retry = retry if retry else RetryPolicy()
+    with episode_limits.use(limiter) as limiter:
+        async with open_session(session, use_http2, limiter) as session:
+            ws = stream.repeat(session)
+            xs = stream.zip(ws, stream.iterate(urls))
+            retry_fetch = partial(fetch_with_retry, limiter=limiter, retry=retry)
+            ys = stream.starmap(
+                xs, retry_fetch, ordered=False, task_limit=limiter.max_limit
+            )
+            process = partial(
+                process_json,
+                jsons=jsons,
+                pbar=pbar,
+                verbose=verbose,
+                on_parsed=on_parsed,
+            )
+            zs = stream.map(ys, process)
+            await drain(zs)
+        if verbose:
+            print(f"Episode metadata fetches: {limiter}, {retry}")
+    return retry.failures
+
+
+async def async_fetch_episode_metadata(
+    listings,
+    pbar=None,
+    verbose=False,
+    n_retries=3,
+    on_parsed=None,
+    skip_pids=(),
+    one_per_title=False,
+    session=None,
+    limiter=None,
+):
+    "Coroutine of `fetch_episode_metadata`, to run on a loop shared with others"
+    retry = RetryPolicy(n_retries=n_retries)
+    failures = await async_fetch_episodes(
+        listings,
+        pbar,
+        verbose,
+        limiter=limiter,
+        retry=retry,
+        on_parsed=on_parsed,
+        skip_pids=skip_pids,
+        one_per_title=one_per_title,
+        session=session,
+    )
+    listings.failed_episode_urls = failures
+    return failures
+
+
+def fetch_episode_metadata(
+    listings,
+    pbar=None,
+    verbose=False,
+    n_retries=3,
+    on_parsed=None,
+    skip_pids=(),
+    one_per_title=False,
+):
+    return asyncio.run(
+        async_fetch_episode_metadata(
+            listings,
+            pbar,
+            verbose,
+            n_retries,
+            on_parsed=on_parsed,
+            skip_pids=skip_pids,
+            one_per_title=one_per_title,
+        )
+    )
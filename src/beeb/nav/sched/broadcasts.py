@@ -1,9 +1,57 @@
 from datetime import datetime
+from ...share.parse_utils import element_text, select_first
 
-__all__ = ["Broadcast"]
+__all__ = ["Broadcast", "record_from_soup", "record_from_element"]
+
+
+def record_from_soup(bsoup):
+    """
+    Parse a `div.broadcast` HTML tag in BeautifulSoup into a compact record: a
+    tuple of strings (ISO format time, PID, title, subtitle, synopsis), cheap to
+    send back from a worker process (see `Broadcast.from_record`).
+    """
+    pid = bsoup.select_one("*[data-pid]")
+    title = bsoup.select_one(".programme__titles .programme__title")
+    subtitle = bsoup.select_one(".programme__titles .programme__subtitle")
+    synopsis = bsoup.select_one(".programme__body .programme__synopsis span")
+    text_tags = title, subtitle, synopsis
+    dt = bsoup.select_one("h3.broadcast__time[content]")
+    if not all([pid, dt, title]):
+        # Allow the others (subtitle and synopsis) to be missing
+        raise ValueError(
+            f"Missing one or more of: " f"{pid=} {dt=} {title=} {subtitle=}"
+        )
+    title, subtitle, synopsis = [
+        x.text if x else "" for x in text_tags
+    ]  # ensure strings even if missing, title is ensured to exist
+    return dt.attrs["content"], pid.attrs["data-pid"], title, subtitle, synopsis
+
+
+def record_from_element(el):
+    """
+    Extract the same record as `record_from_soup` from a `div.broadcast` element
+    parsed by lxml (see `beeb.share.parse_utils.iter_elements_by_class`), with the
+    same selectors but without building a BeautifulSoup tree.
+    """
+    pid = select_first(el, attr="data-pid")
+    title = select_first(el, ["programme__titles"], class_name="programme__title")
+    subtitle = select_first(el, ["programme__titles"], class_name="programme__subtitle")
+    synopsis = select_first(el, ["programme__body", "programme__synopsis"], tag="span")
+    dt = select_first(el, tag="h3", class_name="broadcast__time", attr="content")
+    if pid is None or dt is None or title is None:
+        # Allow the others (subtitle and synopsis) to be missing
+        raise ValueError(
+            f"Missing one or more of: " f"{pid=} {dt=} {title=} {subtitle=}"
+        )
+    title, subtitle, synopsis = map(element_text, (title, subtitle, synopsis))
+    return dt.get("content"), pid.get("data-pid"), title, subtitle, synopsis
 
 
 class Broadcast:
+    # No instance dict: a guide holds many thousands (`frozen_data` is set by async
+    # fetches of episode metadata that aren't pipelined, see `async_fetch_episodes`)
+    __slots__ = ("time", "pid", "title", "subtitle", "synopsis", "frozen_data")
+
     def __init__(self, dt, pid, title, subtitle, synopsis):
         self.time = dt
         self.pid = pid
@@ -16,23 +64,18 @@ class Broadcast:
         """
         Parse a `div.broadcast` HTML tag in BeautifulSoup.
         """
-        pid = bsoup.select_one("*[data-pid]")
-        title = bsoup.select_one(".programme__titles .programme__title")
-        subtitle = bsoup.select_one(".programme__titles .programme__subtitle")
-        synopsis = bsoup.select_one(".programme__body .programme__synopsis span")
-        text_tags = title, subtitle, synopsis
-        dt = bsoup.select_one("h3.broadcast__time[content]")
-        if not all([pid, dt, title]):
-            # Allow the others (subtitle and synopsis) to be missing
-            raise ValueError(
-                f"Missing one or more of: " f"{pid=} {dt=} {title=} {subtitle=}"
-            )
-        title, subtitle, synopsis = [
-            x.text if x else "" for x in text_tags
-        ]  # ensure strings even if missing, title is ensured to exist
-        pid = pid.attrs["data-pid"]
-        dt = datetime.fromisoformat(dt.attrs["content"])
-        return cls(dt, pid, title, subtitle, synopsis)
+        return cls.from_record(record_from_soup(bsoup))
+
+    @classmethod
+    def from_record(cls, record):
+        "Build from a record tuple made by `record_from_soup`"
+        iso_time, pid, title, subtitle, synopsis = record
+        return cls(datetime.fromisoformat(iso_time), pid, title, subtitle, synopsis)
+
+    @property
+    def fields(self):
+        "The attributes set, as a dict (what `vars` would give with an instance dict)"
+        return {k: getattr(self, k) for k in self.__slots__ if hasattr(self, k)}
 
     @property
     def date_repr(self):
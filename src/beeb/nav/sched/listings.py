@@ -1,12 +1,19 @@
-from functools import partial
-from .async_utils import fetch_schedules, fetch_episode_metadata
+import asyncio
+from sys import stderr
+from .async_utils import async_fetch_urlset, fetch_episode_metadata
+from .async_utils import async_fetch_episode_metadata
 from .remote import RemoteMixIn
-from .schedule import ChannelSchedule
+from .schedule import ChannelSchedule, parse_schedule_page
 from ..search import ScheduleSearchMixIn
 from ..channel_ids import ChannelPicker
 from ...api.json_helpers import EpisodeMetadataPidJson
-from ...share import batch_multiprocess_with_return, async_errors
+from ...share.archive_utils import get_archive
+from ...share.compact_utils import get_compact
+from ...share.multiproc_utils import get_pool
+from ...share.parse_utils import get_html_parser, get_parse_mode
+from ...share.retry_utils import RetryPolicy
 from ...share.time import parse_abs_from_rel_date, parse_date_range
+from ...share.trace_utils import count, span
 
 __all__ = ["ChannelListings"]
 
@@ -17,13 +24,29 @@ class ChannelListings(ScheduleSearchMixIn, RemoteMixIn):
     """
     episode_reader_func = EpisodeMetadataPidJson.reader_func
     fetch_episode_metadata = fetch_episode_metadata # bind as method
+    async_fetch_episode_metadata = async_fetch_episode_metadata # bind as method
+    pipelined = True # parse each schedule page as it arrives (not all after)
 
-    def __init__(self, channel_id, from_date=None, to_date=None, n_days=None):
+    def __init__(
+        self,
+        channel_id,
+        from_date=None,
+        to_date=None,
+        n_days=None,
+        pool=None,
+        defer_fetch=False,
+    ):
+        """
+        Make the schedules for the date range and fetch them, unless `defer_fetch`
+        (to await `async_fetch_schedules` on a loop shared with other listings).
+        """
         self.channel_id = channel_id
+        self.pool = pool  # A `WorkerPool` to parse with (default: the shared pool)
         from_date, to_date, n_days = parse_date_range(from_date, to_date, n_days)
         self.from_date, self.to_date, self.n_days = from_date, to_date, n_days
         self.schedules = self.make_schedules()
-        self.fetch_schedules()
+        if not defer_fetch:
+            self.fetch_schedules()
 
     @property
     def urlset(self):
@@ -47,39 +70,111 @@ class ChannelListings(ScheduleSearchMixIn, RemoteMixIn):
             for i in range(self.n_days)
         ]
 
-    def fetch_schedules(self, verbose=False, n_retries=3):
-        # (Due to httpx client bug documented in issue 6 of beeb issue tracker)
-        for i in range(n_retries):
-            try:
-                fetch_schedules(self.urlset, self.schedules)
-            except async_errors as e:
-                if verbose:
-                    print(f"Error occurred {e}, retrying")
-                if i == n_retries - 1:
-                    raise e # # Persisted after all retries, so throw it, don't proceed
-                # Otherwise retry, connection was terminated due to httpx bug (see #6)
-            else:
-                break # exit the for loop if it succeeds
-        self.boil_all_schedules(verbose=verbose)
-
-    def boil_all_schedules(self, verbose=False):
-        recipe_list = [
-            partial(s.boil_broadcasts, return_broadcasts=True) for s in self.schedules
-        ]
-        # Batch the soup parsing on all cores then sort to regain chronological order
-        all_scheduled_broadcasts = sorted(
-            batch_multiprocess_with_return(
-                recipe_list, show_progress=verbose, tqdm_desc="Boiling schedules..."
-            ),
-            key=lambda b: b[0].time,
-        )
-        for s, b in zip(self.schedules, all_scheduled_broadcasts):
-            s.broadcasts = b
+    def fetch_schedules(self, verbose=False, n_retries=3, pipelined=None):
+        """
+        Fetch all schedules asynchronously, retrying each failed request up to
+        `n_retries` times (with backoff). Any schedule which still fails is left
+        empty, and its URL recorded in `failed_urls` (with the final error).
+
+        If `pipelined` (default: the class attribute, True), each page is parsed on
+        the worker pool as soon as it arrives, else all are boiled once fetched.
+
+        If the schedule archive is enabled (see `beeb.share.archive_utils`), days in
+        it are loaded from it rather than fetched, and past days fetched are added.
+        """
+        asyncio.run(self.async_fetch_schedules(verbose, n_retries, pipelined))
+
+    async def async_fetch_schedules(
+        self, verbose=False, n_retries=3, pipelined=None, session=None, limiter=None
+    ):
+        """
+        Coroutine of `fetch_schedules`, which can share an open client as `session`
+        (and a concurrency `limiter`) with other fetches running on the same loop.
+        """
+        pipelined = self.pipelined if pipelined is None else pipelined
+        self._table = None
+        to_fetch = self.load_archived()
+        pool = (self.pool if self.pool else get_pool()) if pipelined else None
+        with span("listings.fetch", channel_id=self.channel_id, n_days=len(to_fetch)):
+            self.failed_urls = await async_fetch_urlset(
+                [s.sched_url for s in to_fetch],
+                to_fetch,
+                verbose=verbose,
+                limiter=limiter,
+                retry=RetryPolicy(n_retries=n_retries),
+                pool=pool,
+                session=session,
+            )
+        if verbose and self.failed_urls:
+            print(f"Failed to fetch {len(self.failed_urls)} schedules", file=stderr)
+        if pipelined:
+            for s in to_fetch:
+                if not hasattr(s, "broadcast_records"):
+                    s.broadcast_records = ()  # Failed to fetch
+        else:
+            self.boil_all_schedules(verbose=verbose, schedules=to_fetch)
+        self.archive(to_fetch)
+
+    def load_archived(self):
+        "Load the archived schedules (if any), returning those left to fetch"
+        archive = get_archive()
+        if archive is None:
+            return self.schedules
+        archived = archive.get(self.channel_id, [s.date for s in self.schedules])
+        count("archive_hits", len(archived))
+        for s in self.schedules:
+            if s.date in archived:
+                s.broadcast_records = archived[s.date]
+        return [s for s in self.schedules if s.date not in archived]
+
+    def archive(self, schedules):
+        "Add the successfully fetched schedules to the archive (if enabled)"
+        archive = get_archive()
+        if archive is None:
+            return
+        fetched = [s for s in schedules if s.sched_url not in self.failed_urls]
+        archive.put(self.channel_id, {s.date: s.broadcast_records for s in fetched})
+
+    def boil_all_schedules(self, verbose=False, schedules=None):
+        "Parse the raw pages of the `schedules` fetched (by default, all of them)"
+        self._table = None
+        schedules = self.schedules if schedules is None else schedules
+        fetched = [s for s in schedules if hasattr(s, "frozen_soup")]
+        for s in schedules:
+            if not hasattr(s, "frozen_soup"):
+                s.broadcast_records = ()  # Failed to fetch
+        # Batch the soup parsing on all cores (results come back in schedule order).
+        # Only the raw pages go to the workers, and compact records come back, from
+        # which each schedule makes its `Broadcast` objects when first accessed
+        pool = self.pool if self.pool else get_pool()
+        with span("listings.boil", channel_id=self.channel_id, n_schedules=len(fetched)):
+            all_records = pool.map(
+                parse_schedule_page,
+                [s.frozen_soup for s in fetched],
+                [s.ymd for s in fetched],
+                [get_html_parser()] * len(fetched),
+                [get_parse_mode()] * len(fetched),
+                show_progress=verbose,
+                tqdm_desc="Boiling schedules...",
+            )
+            for s, records in zip(fetched, all_records):
+                s.broadcast_records = records
+                if get_compact():
+                    del s.frozen_soup  # Only needed until parsed
 
     @classmethod
-    def from_channel_name(cls, name, from_date=None, to_date=None, n_days=None):
+    def from_channel_name(
+        cls, name, from_date=None, to_date=None, n_days=None, pool=None, defer_fetch=False
+    ):
         ch = ChannelPicker.by_name(name, must_exist=True)
-        return cls(ch.channel_id, from_date=from_date, to_date=to_date, n_days=n_days)
+        return cls(
+            ch.channel_id,
+            from_date=from_date,
+            to_date=to_date,
+            n_days=n_days,
+            pool=pool,
+            defer_fetch=defer_fetch,
+        )
 
     @property
     def date_repr(self):
@@ -95,11 +190,63 @@ class ChannelListings(ScheduleSearchMixIn, RemoteMixIn):
             f"from {self.from_date} to {self.to_date} ({self.n_days} days)"
         )
 
+    @property
+    def table(self):
+        """
+        Columnar `BroadcastTable` of all the broadcasts, for vectorised filtering
+        (made from the parsed records on first access, without `Broadcast` objects)
+        """
+        if getattr(self, "_table", None) is None:
+            from .table import BroadcastTable  # Needs numpy (the `table` extra)
+            self._table = BroadcastTable.from_listings(self)
+        return self._table
+
     @property
     def all_broadcasts(self):
         "Presuming the schedules are already boiled (i.e. parsed), enumerate broadcasts"
         return [b for s in self.schedules for b in s.broadcasts]
 
+    def complete_until(self):
+        """
+        The last date up to which every schedule, and the metadata of every episode
+        broadcast in them (if fetched), was fetched. `None` if the first day failed.
+        """
+        failed_episodes = set(getattr(self, "failed_episode_urls", ()))
+        last_complete = None
+        for s in self.schedules:
+            if s.sched_url in self.failed_urls:
+                break
+            if failed_episodes and any(
+                EpisodeMetadataPidJson(r[1], defer_pull=True).url in failed_episodes
+                for r in s.broadcast_records
+            ):
+                break
+            last_complete = s.date
+        return last_complete
+
+    def episode_fetch_plan(self, skip_pids=(), one_per_title=False):
+        """
+        Plan the episode metadata fetches: a dict of each distinct URL to fetch to
+        the broadcasts (repeats) it's for. Episodes with PIDs in `skip_pids` are left
+        out, and if `one_per_title` then so is every broadcast whose title has
+        already been planned (or skipped), as all episodes with a title presumably
+        belong to the same programme.
+        """
+        plan = {}
+        seen_titles = set()
+        broadcasts = self.all_broadcasts
+        if one_per_title:
+            seen_titles.update(b.title for b in broadcasts if b.pid in skip_pids)
+        for url, broadcast in zip(self.broadcasts_urlset, broadcasts):
+            if broadcast.pid in skip_pids:
+                continue
+            if one_per_title:
+                if broadcast.title in seen_titles and url not in plan:
+                    continue
+                seen_titles.add(broadcast.title)
+            plan.setdefault(url, []).append(broadcast)
+        return plan
+
     @property
     def broadcasts_urlset(self):
         "Make a generator to produce the URLs for the broadcasts from all_broadcasts"
@@ -1,4 +1,6 @@
 class Programme:
+    __slots__ = ("pid", "title", "genre", "station")
+
     def __init__(self, pid, title, genre, station):
         self.pid = pid
         self.title = title
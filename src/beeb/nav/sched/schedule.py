@@ -1,12 +1,48 @@
-from bs4 import BeautifulSoup as BS
-from .broadcasts import Broadcast
+from datetime import datetime
+from .broadcasts import Broadcast, record_from_soup, record_from_element
 from .remote import RemoteMixIn
 from ..search import ScheduleSearchMixIn
 from ..channel_ids import ChannelPicker
+from ...share.archive_utils import get_archive
+from ...share.compact_utils import get_compact, intern_records
 from ...share.http_utils import GET
+from ...share.parse_utils import class_strainer, get_parse_mode, make_soup
+from ...share.parse_utils import iter_elements_by_class
 from ...share.time import parse_abs_from_rel_date, cal_path
 
-__all__ = ["ChannelSchedule"]
+__all__ = ["ChannelSchedule", "parse_schedule_page"]
+
+
+broadcast_strainer = class_strainer("broadcast")
+
+
+def on_date(records, ymd):
+    """
+    Filter out the next day's results, which BBC schedules repeat after midnight
+    (deduplicating the listings).
+    """
+    return tuple(r for r in records if datetime.fromisoformat(r[0]).timetuple()[:3] == ymd)
+
+
+def records_from_soup(soup, ymd):
+    "Parse the broadcasts in a schedule's soup into record tuples for the date `ymd`"
+    return on_date((record_from_soup(b) for b in soup.select(".broadcast")), ymd)
+
+
+def parse_schedule_page(raw, ymd, parser=None, mode=None):
+    """
+    Parse the raw HTML of a schedule page for the date `ymd` (a year, month, day
+    tuple) into a tuple of broadcast records. This is what the worker processes
+    run, so only the page and date are sent to them, and only the records back.
+    The HTML `parser` and parse `mode` are the defaults set in
+    `beeb.share.parse_utils` if not given.
+    """
+    mode = mode if mode else get_parse_mode()
+    if mode == "fields":
+        elements = iter_elements_by_class(raw, "broadcast")
+        return on_date(map(record_from_element, elements), ymd)
+    strainer = broadcast_strainer if mode == "strained" else None
+    return records_from_soup(make_soup(raw, parser=parser, parse_only=strainer), ymd)
 
 
 class ChannelSchedule(ScheduleSearchMixIn, RemoteMixIn):
@@ -69,27 +105,57 @@ class ChannelSchedule(ScheduleSearchMixIn, RemoteMixIn):
             # deferred for async procedure
             self.pull_and_parse()
 
-    def pull_and_parse(self):
-        r = GET(self.sched_url, raise_for_status=True)
-        self.boil_broadcasts(r.content.decode())
+    def pull_and_parse(self, client=None):
+        "Load from the schedule archive if enabled and archived, else fetch and parse"
+        archive = get_archive()
+        if archive is not None:
+            archived = archive.get(self.channel_id, [self.date])
+            if self.date in archived:
+                self.broadcast_records = archived[self.date]
+                return
+        r = GET(self.sched_url, raise_for_status=True, client=client)
+        self.boil_broadcasts(r.content)
+        if archive is not None:
+            archive.put(self.channel_id, {self.date: self.broadcast_records})
 
     def boil_broadcasts(self, soup=None, raw=True, return_broadcasts=False):
         "Populate `.broadcasts` attribute with a list parsed from `soup`"
         if raw:
-            # Prepare the soup from raw HTML
+            # Parse the raw HTML
             if not soup:
                 # Retrieve soup from frozen (async fetch put it there)
                 soup = self.frozen_soup
-            soup = BS(soup, features="html5lib")
-        broadcasts = [Broadcast.from_soup(b) for b in soup.select(".broadcast")]
-        # After parsing, filter out the next day's results (deduplicate listings)
-        broadcasts = [
-            b for b in broadcasts if (b.time.year, b.time.month, b.time.day) == self.ymd
-        ]
+                if get_compact():
+                    del self.frozen_soup  # Only needed until parsed
+            records = parse_schedule_page(soup, self.ymd)
+        else:
+            records = records_from_soup(soup, self.ymd)
         if return_broadcasts:
-            return broadcasts
+            return [Broadcast.from_record(r) for r in records]
         else:
-            self.broadcasts = broadcasts
+            self.broadcast_records = records
+
+    @property
+    def broadcast_records(self):
+        return self._broadcast_records
+
+    @broadcast_records.setter
+    def broadcast_records(self, records):
+        "Set the parsed records, from which `broadcasts` will be made on first use"
+        if get_compact():
+            records = intern_records(records)
+        self._broadcast_records = records
+        self._broadcasts = None
+
+    @property
+    def broadcasts(self):
+        if self._broadcasts is None:
+            self._broadcasts = [Broadcast.from_record(r) for r in self._broadcast_records]
+        return self._broadcasts
+
+    @broadcasts.setter
+    def broadcasts(self, broadcasts):
+        self._broadcasts = broadcasts
 
     def __repr__(self):
         return f"ChannelSchedule for {self.channel.title} on {self.date}"
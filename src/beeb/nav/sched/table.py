@@ -0,0 +1,282 @@
+import re
+from datetime import datetime, timedelta, timezone
+from .broadcasts import Broadcast
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("BroadcastTable needs numpy: `pip install beeb[table]`") from e
+
+__all__ = ["BroadcastTable", "StringColumn"]
+
+weekday_names = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+class StringColumn:
+    """
+    Dictionary-encoded (categorical) string column: an integer code per row into
+    a list of the distinct strings, so each repeated title (or subtitle, etc.) is
+    stored once, and filters run on the distinct strings then map to the rows.
+    """
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def from_strings(cls, strings):
+        index = {}
+        codes = [index.setdefault(s, len(index)) for s in strings]
+        return cls(np.array(codes, dtype=np.int32), list(index))
+
+    @classmethod
+    def concat(cls, columns):
+        "Merge columns into one, recoding them onto a shared list of strings"
+        index = {}
+        recoded = []
+        for col in columns:
+            remap = np.array(
+                [index.setdefault(v, len(index)) for v in col.values], dtype=np.int32
+            )
+            recoded.append(remap[col.codes] if len(col.values) else col.codes)
+        return cls(np.concatenate(recoded or [np.empty(0, np.int32)]), list(index))
+
+    def isin(self, strings):
+        "Row mask of the strings in the given collection"
+        wanted = set(strings)
+        codes = [i for i, v in enumerate(self.values) if v in wanted]
+        return np.isin(self.codes, codes)
+
+    def matching(self, rc):
+        "Row mask of the strings matched by the compiled regex `rc` (`re.match`)"
+        hits = np.fromiter(
+            (rc.match(v) is not None for v in self.values), bool, len(self.values)
+        )
+        return hits[self.codes]
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self.values[self.codes[key]]
+        return StringColumn(self.codes[key], self.values)
+
+    def __iter__(self):
+        return (self.values[c] for c in self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(len(v) for v in self.values)
+
+
+def to_datetime64(t):
+    "Convert a date or datetime (naive values are taken as UTC) to datetime64[s]"
+    if isinstance(t, datetime) and t.tzinfo is not None:
+        return np.datetime64(int(t.timestamp()), "s")
+    return np.datetime64(t, "s")
+
+
+class BroadcastTable:
+    """
+    Column-oriented store of broadcasts, alongside the `Broadcast` object API:
+    times as UTC `datetime64[s]` (plus each broadcast's UTC offset in minutes,
+    for local times and weekdays), PIDs as a fixed width string array, and the
+    channel ID, title, subtitle and synopsis as dictionary-encoded columns.
+
+    The filter methods (`between`, `on_weekdays`, `title_in`, `matching`) return
+    boolean row masks, which can be combined with `&`, `|` and `~` and used to
+    index the table (giving a new table), or use `filter` to apply several.
+    Indexing a single row gives a `Broadcast`.
+    """
+
+    string_fields = ("channel", "title", "subtitle", "synopsis")
+
+    def __init__(self, time, utc_offset, pid, channel, title, subtitle, synopsis):
+        self.time = time
+        self.utc_offset = utc_offset
+        self.pid = pid
+        self.channel = channel
+        self.title = title
+        self.subtitle = subtitle
+        self.synopsis = synopsis
+
+    @classmethod
+    def from_records(cls, records, channel_id=None):
+        """
+        Build from broadcast record tuples (ISO time, PID, title, subtitle, synopsis)
+        as parsed from schedule pages, without making any `Broadcast` objects.
+        """
+        records = list(records)
+        return cls.from_columns(
+            [datetime.fromisoformat(r[0]) for r in records],
+            [r[1] for r in records],
+            [r[2] for r in records],
+            [r[3] for r in records],
+            [r[4] for r in records],
+            channel=[channel_id] * len(records),
+        )
+
+    @classmethod
+    def from_broadcasts(cls, broadcasts, channel_id=None):
+        broadcasts = list(broadcasts)
+        return cls.from_columns(
+            [b.time for b in broadcasts],
+            [b.pid for b in broadcasts],
+            [b.title for b in broadcasts],
+            [b.subtitle for b in broadcasts],
+            [b.synopsis for b in broadcasts],
+            channel=[channel_id] * len(broadcasts),
+        )
+
+    @classmethod
+    def from_columns(cls, times, pids, titles, subtitles, synopses, channel):
+        utc_offset = np.array(
+            [t.utcoffset() // timedelta(minutes=1) if t.tzinfo else 0 for t in times],
+            dtype=np.int16,
+        )
+        time = np.array([to_datetime64(t) for t in times], dtype="datetime64[s]")
+        return cls(
+            time=time,
+            utc_offset=utc_offset,
+            pid=np.array(pids, dtype=str),
+            channel=StringColumn.from_strings(channel),
+            title=StringColumn.from_strings(titles),
+            subtitle=StringColumn.from_strings(subtitles),
+            synopsis=StringColumn.from_strings(synopses),
+        )
+
+    @classmethod
+    def from_listings(cls, listings):
+        "Build from the parsed records (or broadcasts) of each of a listings' schedules"
+        tables = []
+        for s in listings.schedules:
+            if hasattr(s, "broadcast_records"):
+                tables.append(cls.from_records(s.broadcast_records, s.channel_id))
+            else:
+                tables.append(cls.from_broadcasts(s.broadcasts, s.channel_id))
+        return cls.concat(tables)
+
+    @classmethod
+    def concat(cls, tables):
+        "Combine tables (e.g. of several stations' listings) into one"
+        tables = list(tables)
+        if not tables:
+            return cls.from_records([])
+        return cls(
+            time=np.concatenate([t.time for t in tables]),
+            utc_offset=np.concatenate([t.utc_offset for t in tables]),
+            pid=np.concatenate([t.pid for t in tables]),
+            **{
+                f: StringColumn.concat([getattr(t, f) for t in tables])
+                for f in cls.string_fields
+            },
+        )
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return Broadcast.from_record(self.record(key))
+        return type(self)(
+            time=self.time[key],
+            utc_offset=self.utc_offset[key],
+            pid=self.pid[key],
+            **{f: getattr(self, f)[key] for f in self.string_fields},
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def local_time(self):
+        "The broadcast times in their own (UK) time zone, as naive `datetime64[s]`"
+        return self.time + self.utc_offset.astype("timedelta64[m]")
+
+    @property
+    def weekday(self):
+        "Day of the week of each (local) broadcast time, with Monday as 0"
+        days = self.local_time.astype("datetime64[D]").astype(np.int64)
+        return (days + 3) % 7  # 1970-01-01 was a Thursday
+
+    def record(self, i):
+        "The record tuple of row `i`, as parsed (see `Broadcast.from_record`)"
+        tz = timezone(timedelta(minutes=int(self.utc_offset[i])))
+        utc = self.time[i].astype(datetime).replace(tzinfo=timezone.utc)
+        return (
+            utc.astimezone(tz).isoformat(),
+            str(self.pid[i]),
+            self.title[i],
+            self.subtitle[i],
+            self.synopsis[i],
+        )
+
+    def to_broadcasts(self):
+        return list(self)
+
+    @property
+    def pids(self):
+        return self.pid.tolist()
+
+    def between(self, start=None, end=None):
+        "Row mask of broadcasts from `start` (inclusive) until `end` (exclusive)"
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.time >= to_datetime64(start)
+        if end is not None:
+            mask &= self.time < to_datetime64(end)
+        return mask
+
+    def on_weekdays(self, *days):
+        "Row mask of broadcasts on the given days (0 to 6 from Monday, or 'Mon' etc.)"
+        day_nums = [
+            weekday_names.index(d[:3].title()) if isinstance(d, str) else d for d in days
+        ]
+        return np.isin(self.weekday, day_nums)
+
+    def title_in(self, titles):
+        "Row mask of broadcasts with one of the given titles"
+        if isinstance(titles, str):
+            titles = [titles]
+        return self.title.isin(titles)
+
+    def matching(self, pattern, fields=("title",), case_insensitive=False):
+        """
+        Row mask of broadcasts where any of the `fields` (default: just the title)
+        match the regex `pattern` (from the start, as `ScheduleSieve` does). Each
+        distinct string is only tested once however many broadcasts share it.
+        """
+        rc = re.compile(pattern, re.IGNORECASE if case_insensitive else 0)
+        mask = np.zeros(len(self), dtype=bool)
+        for field in fields:
+            mask |= getattr(self, field).matching(rc)
+        return mask
+
+    def filter(
+        self,
+        start=None,
+        end=None,
+        weekdays=None,
+        titles=None,
+        pattern=None,
+        fields=("title",),
+        case_insensitive=False,
+    ):
+        "Apply any of the filters at once, returning the matching rows as a new table"
+        mask = self.between(start, end)
+        if weekdays is not None:
+            mask &= self.on_weekdays(*weekdays)
+        if titles is not None:
+            mask &= self.title_in(titles)
+        if pattern is not None:
+            mask &= self.matching(pattern, fields, case_insensitive)
+        return self[mask]
+
+    @property
+    def nbytes(self):
+        arrays = self.time.nbytes + self.utc_offset.nbytes + self.pid.nbytes
+        return arrays + sum(getattr(self, f).nbytes for f in self.string_fields)
+
+    def __repr__(self):
+        return f"BroadcastTable ({len(self)} broadcasts, {self.nbytes / 1e3:.1f} kB)"
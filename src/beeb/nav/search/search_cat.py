@@ -1,5 +1,7 @@
 import re
 from .sieve import Sieve
+from ..sched.programme import Programme
+from ...share.db_utils import CatalogueDB
 
 __all__ = ["CatalogueSieve", "CatalogueSearchMixIn"]
 
@@ -88,3 +90,18 @@ class CatalogueSearchMixIn:
             title, pid_only, multi, regex, case_insensitive, all_fields, throw
         )
         return sieve.search(self) if from_cat else sieve.search_guide(self)
+
+    def search_programmes(
+        self, query, pid_only=False, limit=None, fields=None, raw=False, db=None
+    ):
+        """
+        Full-text search for this catalogue's station (or all the guide's stations)
+        in the catalogue database, so it covers what's been stored there. Return a
+        list of `Programme`s (or just their PIDs if `pid_only`), best match first.
+        See `CatalogueDB.search` for the query syntax, `fields` and `raw`.
+        """
+        from_cat = hasattr(self, "station_name")
+        stations = [self.station_name] if from_cat else list(self)
+        db = db if db else getattr(self, "db", None) or CatalogueDB(create=False)
+        rows = db.search(query, stations=stations, fields=fields, limit=limit, raw=raw)
+        return [row[0] if pid_only else Programme(*row) for row in rows]
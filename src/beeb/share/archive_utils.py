@@ -0,0 +1,118 @@
+import json
+import time
+from datetime import date, timedelta
+from .sqlite_utils import SQLiteStore, swap_store
+from ..data.store import _dir_path as store_path
+
+__all__ = ["ScheduleArchive", "get_archive", "set_archive"]
+
+
+def day_key(day):
+    "The ISO date string of a date (or the date part of a datetime)"
+    return day.isoformat()[:10]
+
+
+class ScheduleArchive(SQLiteStore):
+    """
+    Parsed schedule records by channel ID and date, stored once `min_age_days` old
+    (before then the BBC may still be changing that day's schedule).
+    """
+
+    filename = "schedule_archive.db"  # Default value
+    directory = store_path
+    min_age_days = 2
+
+    def __init__(self, dir=directory, filename=filename, min_age_days=min_age_days):
+        super().__init__(dir, filename)
+        self.min_age_days = min_age_days
+        self.create()
+
+    def create(self):
+        with self._lock, self.conn as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schedules
+                (channel_id text, date text, n_broadcasts integer, stored real,
+                primary key (channel_id, date))
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS broadcasts
+                (channel_id text, date text, seq integer, time text, pid text,
+                title text, subtitle text, synopsis text,
+                primary key (channel_id, date, seq)) WITHOUT ROWID
+                """
+            )
+
+    def is_archivable(self, day):
+        return day_key(day) <= day_key(date.today() - timedelta(days=self.min_age_days))
+
+    def get(self, channel_id, dates):
+        "A dict of each of the `dates` archived for the channel to its records"
+        keys = {day_key(d): d for d in dates}
+        query_sql = """
+        SELECT s.date, b.time, b.pid, b.title, b.subtitle, b.synopsis
+        FROM schedules s LEFT JOIN broadcasts b USING (channel_id, date)
+        WHERE s.channel_id = ? AND s.date IN (SELECT value FROM json_each(?))
+        ORDER BY s.date, b.seq
+        """
+        archived = {}
+        with self._lock:
+            rows = self.conn.execute(query_sql, (channel_id, json.dumps([*keys])))
+            for day, *record in rows:
+                records = archived.setdefault(keys[day], [])
+                if record[0] is not None:  # Else the day had no broadcasts
+                    records.append(tuple(record))
+        return {d: tuple(records) for d, records in archived.items()}
+
+    def put(self, channel_id, schedules):
+        """
+        Archive the channel's schedules, given as a dict of dates to their records,
+        in one transaction (skipping any too recent to archive). Return the number
+        of days archived.
+        """
+        days = {d: r for d, r in schedules.items() if self.is_archivable(d)}
+        if not days:
+            return 0
+        now = time.time()
+        with self._lock, self.conn as conn:
+            for day, records in days.items():
+                key = (channel_id, day_key(day))
+                conn.execute(
+                    "DELETE FROM broadcasts WHERE channel_id = ? AND date = ?", key
+                )
+                conn.executemany(
+                    "INSERT INTO broadcasts VALUES (?,?,?,?,?,?,?,?)",
+                    [(*key, seq, *record) for seq, record in enumerate(records)],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO schedules VALUES (?,?,?,?)",
+                    (*key, len(records), now),
+                )
+        return len(days)
+
+    def clear(self):
+        with self._lock, self.conn as conn:
+            conn.execute("DELETE FROM broadcasts")
+            conn.execute("DELETE FROM schedules")
+
+    def __len__(self):
+        "The number of days archived"
+        with self._lock:
+            (n,) = self.conn.execute("SELECT COUNT(*) FROM schedules").fetchone()
+        return n
+
+
+_archive = None  # Disabled unless set
+
+
+def get_archive():
+    return _archive
+
+
+def set_archive(archive=True):
+    "Set the schedule archive used by the listings (see `swap_store`)"
+    global _archive
+    _archive = swap_store(_archive, archive, ScheduleArchive)
+    return _archive
@@ -0,0 +1,219 @@
+import re
+import time
+import httpx
+from datetime import date, timedelta
+from .sqlite_utils import SQLiteStore, swap_store
+from ..data.store import _dir_path as store_path
+
+__all__ = ["ResponseCache", "CacheEntry", "get_cache", "set_cache"]
+
+MINUTE, HOUR, DAY = 60, 60 * 60, 24 * 60 * 60
+
+
+def schedule_ttl(match):
+    """
+    Schedule pages for dates in the past are (almost) fixed, but today's and
+    yesterday's pages still change as the listings are finalised.
+    """
+    y, m, d = map(int, match.groups())
+    if date(y, m, d) < date.today() - timedelta(days=1):
+        return 30 * DAY
+    return HOUR
+
+
+class CacheEntry:
+    def __init__(self, url, content, etag, last_modified, stored, ttl):
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored = stored
+        self.ttl = ttl
+
+    @property
+    def is_fresh(self):
+        return (time.time() - self.stored) < self.ttl
+
+    @property
+    def validators(self):
+        "Headers for a conditional request to revalidate a stale entry"
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self):
+        "Rebuild an `httpx.Response` so cache hits look the same as network responses"
+        request = httpx.Request("GET", self.url)
+        return httpx.Response(
+            200, content=self.content, request=request, headers={"X-Beeb-Cache": "hit"}
+        )
+
+    def __repr__(self):
+        return f"CacheEntry for {self.url} ({'fresh' if self.is_fresh else 'stale'})"
+
+
+class ResponseCache(SQLiteStore):
+    """
+    Cache of HTTP response bodies, each URL class kept for the TTL of its rule in
+    `ttl_rules` (or not at all), revalidated once stale and kept under `max_bytes`.
+    """
+
+    filename = "http_cache.db"  # Default value
+    directory = store_path
+    max_bytes = 256 * 1024 * 1024
+    ttl_rules = [
+        (r"^https://www\.bbc\.co\.uk/schedules/\w+/(\d{4})/(\d{2})/(\d{2})$", schedule_ttl),
+        (r"^https://www\.bbc\.co\.uk/schedules/\w+$", HOUR),
+        (r"^https://www\.bbc\.co\.uk/programmes/\w+\.json$", 7 * DAY),
+        (r"^https://www\.bbc\.co\.uk/programmes/\w+/playlist\.json$", DAY),
+        (r"^https://www\.bbc\.co\.uk/programmes/\w+/episodes/player\?page=\d+$", HOUR),
+    ]
+
+    def __init__(self, dir=directory, filename=filename, max_bytes=max_bytes, ttl_rules=None):
+        super().__init__(dir, filename)
+        self.max_bytes = max_bytes
+        if ttl_rules is not None:
+            self.ttl_rules = ttl_rules
+        self.compiled_rules = [(re.compile(r), ttl) for r, ttl in self.ttl_rules]
+        self.create()
+
+    def on_connect(self):
+        self._size = None  # Running total of the content sizes (summed when needed)
+
+    def create(self):
+        with self._lock, self.conn as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses
+                (url text primary key, content blob, etag text, last_modified text,
+                stored real, accessed real, size integer)
+                """
+            )
+
+    def ttl(self, url):
+        "The time-to-live for `url` in seconds, or `None` if it is not cacheable"
+        for rc, ttl in self.compiled_rules:
+            m = rc.match(str(url))
+            if m:
+                return ttl(m) if callable(ttl) else ttl
+        return None
+
+    def is_cacheable(self, url):
+        return self.ttl(url) is not None
+
+    def get(self, url):
+        url = str(url)
+        ttl = self.ttl(url)
+        if ttl is None:
+            return None
+        with self._lock, self.conn as conn:
+            row = conn.execute(
+                "SELECT content, etag, last_modified, stored FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE responses SET accessed = ? WHERE url = ?", (time.time(), url)
+            )
+        return CacheEntry(url, *row, ttl=ttl)
+
+    def put(self, url, response):
+        "Store a successful response (only if `url` is cacheable)"
+        url = str(url)
+        if not self.is_cacheable(url) or not response.is_success:
+            return
+        content = response.content
+        now = time.time()
+        with self._lock, self.conn as conn:
+            size = self.size  # Before the write, as that changes it by the difference
+            row = conn.execute("SELECT size FROM responses WHERE url = ?", (url,))
+            replaced = row.fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?,?)",
+                (
+                    url,
+                    content,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    now,
+                    now,
+                    len(content),
+                ),
+            )
+            self._size = size + len(content) - (replaced[0] if replaced else 0)
+        self.evict()
+
+    def refresh(self, url):
+        "Mark a revalidated entry as fresh (after a 304 Not Modified response)"
+        now = time.time()
+        with self._lock, self.conn as conn:
+            conn.execute(
+                "UPDATE responses SET stored = ?, accessed = ? WHERE url = ?",
+                (now, now, str(url)),
+            )
+
+    def update(self, entry, response):
+        """
+        Update the cache from a (possibly conditional) network `response` and return
+        the response to use: the cached entry's if the server said 304 Not Modified.
+        """
+        if entry is not None and response.status_code == 304:
+            self.refresh(entry.url)
+            return entry.to_response()
+        self.put(response.request.url, response)
+        return response
+
+    @property
+    def size(self):
+        "The total size of the cached content (summed from the table only at first)"
+        with self._lock:
+            conn = self.conn
+            if self._size is None:
+                (total,) = conn.execute("SELECT TOTAL(size) FROM responses").fetchone()
+                self._size = int(total)
+            return self._size
+
+    def evict(self):
+        "Delete least recently used entries until the total size is under `max_bytes`"
+        with self._lock:
+            excess = self.size - self.max_bytes
+            if excess <= 0:
+                return
+            with self.conn as conn:
+                rows = conn.execute("SELECT url, size FROM responses ORDER BY accessed")
+                doomed = []
+                for url, size in rows:
+                    if excess <= 0:
+                        break
+                    doomed.append((url,))
+                    excess -= size
+                    self._size -= size
+                conn.executemany("DELETE FROM responses WHERE url = ?", doomed)
+
+    def clear(self):
+        with self._lock, self.conn as conn:
+            conn.execute("DELETE FROM responses")
+            self._size = 0
+
+    def __len__(self):
+        with self._lock:
+            (n,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return n
+
+
+_cache = None  # Disabled unless set
+
+
+def get_cache():
+    return _cache
+
+
+def set_cache(cache=True):
+    "Set the response cache used by every fetch path (see `swap_store`)"
+    global _cache
+    _cache = swap_store(_cache, cache, ResponseCache)
+    return _cache
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+__all__ = ["SingleFlight", "AsyncSingleFlight"]
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls (from multiple threads) for the same key, so that
+    only the first caller runs the function and the rest wait for and share its
+    result (or exception). Once the call completes the key is forgotten, so this
+    deduplicates in-flight work only, it is not a cache.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = func(*args, **kwargs)
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"]
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce concurrent awaits for the same key on an event loop, so only one
+    coroutine is run and every waiter gets its result (or exception). Keys are
+    scoped to the running loop, so one instance can serve successive loops.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, coro_func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        future = self._calls.get(flight_key)
+        if future is not None:
+            # shield: one waiter being cancelled mustn't cancel the shared call
+            return await asyncio.shield(future)
+        future = self._calls[flight_key] = loop.create_future()
+        try:
+            result = await coro_func(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved, in case there were no waiters
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[flight_key]
+        return result
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
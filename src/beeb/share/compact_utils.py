@@ -0,0 +1,32 @@
+import sys
+
+__all__ = ["get_compact", "set_compact", "intern_strings", "intern_records"]
+
+_compact = False
+
+
+def get_compact():
+    return _compact
+
+
+def set_compact(compact=True):
+    """
+    Turn the compaction mode on (or off). When on, the raw payloads of listings
+    (each schedule page's HTML and each episode's metadata JSON) are dropped as
+    soon as they're parsed, and the strings repeated across broadcasts (titles,
+    subtitles, synopses, PIDs of repeats) are interned, so each is held just once
+    however many days or stations repeat it. Worth it for big guides.
+    """
+    global _compact
+    _compact = bool(compact)
+    return _compact
+
+
+def intern_strings(values):
+    "A tuple of the values, with any strings interned (so each is held only once)"
+    return tuple(sys.intern(v) if type(v) is str else v for v in values)
+
+
+def intern_records(records):
+    "Intern the strings of broadcast records, except their (mostly distinct) times"
+    return tuple((r[0], *intern_strings(r[1:])) for r in records)
@@ -0,0 +1,211 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+__all__ = ["AdaptiveLimiter", "LimiterFactory", "drain"]
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for async fetches which widens and narrows itself by AIMD
+    (additive increase, multiplicative decrease), as in TCP congestion control.
+
+    Each completed request is recorded with its latency and outcome: the limit
+    grows by about 1 per 'window' of `limit` successful requests, but is cut by
+    the `backoff` factor on an error (exception, HTTP 429 or 5xx) or when the
+    smoothed latency rises past `latency_tolerance` times the best latency seen.
+    At most one cut is made per window, so one burst of failures doesn't collapse
+    the limit to the floor.
+
+    A limiter belongs to the event loop it's used on (its waiters are that loop's
+    futures), so make one per call, or use a `LimiterFactory` to have each start
+    at the limit the last settled on. The aiostream `task_limit` of a pipeline
+    using it should be set to `max_limit`.
+    """
+
+    def __init__(
+        self,
+        initial=10,
+        min_limit=1,
+        max_limit=64,
+        backoff=0.5,
+        latency_tolerance=2.0,
+        smoothing=0.2,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._limit = float(initial)
+        self.in_flight = 0
+        self._waiters = deque()
+        self.min_latency = None
+        self.latency = None  # exponentially weighted moving average
+        self.n_success = 0
+        self.n_errors = 0
+        self.n_bytes = 0
+        self._last_cut = 0  # completion count at the last multiplicative decrease
+        self._started = None
+        self._limit_history = deque(maxlen=100)
+
+    @property
+    def limit(self):
+        return max(self.min_limit, min(self.max_limit, int(self._limit)))
+
+    @property
+    def n_completed(self):
+        return self.n_success + self.n_errors
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if self._started is None:
+            self._started = time.monotonic()
+        while self.in_flight >= self.limit:
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def record(self, latency, ok=True, n_bytes=0):
+        "Update the limit from a completed request's `latency` (seconds) and outcome."
+        if ok:
+            self.n_success += 1
+            self.n_bytes += n_bytes
+            if self.min_latency is None or latency < self.min_latency:
+                self.min_latency = latency
+            if self.latency is None:
+                self.latency = latency
+            else:
+                a = self.smoothing
+                self.latency = a * latency + (1 - a) * self.latency
+            congested = self.latency > self.latency_tolerance * self.min_latency
+        else:
+            self.n_errors += 1
+            congested = True
+        if congested:
+            if self.n_completed - self._last_cut >= self.limit:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_cut = self.n_completed
+                if ok:
+                    # Let the baseline drift up so a slower network is not penalised forever
+                    self.min_latency = (self.min_latency + self.latency) / 2
+        else:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        self._limit_history.append(self.limit)
+        self._wake()
+
+    @asynccontextmanager
+    async def track(self):
+        """
+        Acquire a slot for one request, and record its outcome on leaving the block.
+        Set `status` (HTTP status code) and `n_bytes` on the yielded `dict` to
+        have them considered: an exception raised in the block counts as an error.
+        """
+        await self.acquire()
+        outcome = {"status": None, "n_bytes": 0}
+        t0 = time.monotonic()
+        ok = False
+        try:
+            yield outcome
+            status = outcome["status"]
+            ok = status is None or not (status == 429 or status >= 500)
+        finally:
+            self.record(time.monotonic() - t0, ok=ok, n_bytes=outcome["n_bytes"])
+            self.release()
+
+    @property
+    def settled_limit(self):
+        "The typical limit over the most recent requests (the median)."
+        if not self._limit_history:
+            return self.limit
+        return sorted(self._limit_history)[len(self._limit_history) // 2]
+
+    @property
+    def throughput(self):
+        "Requests completed per second since first use"
+        if self._started is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        return self.n_completed / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        return {
+            "limit": self.limit,
+            "settled_limit": self.settled_limit,
+            "completed": self.n_completed,
+            "errors": self.n_errors,
+            "bytes": self.n_bytes,
+            "latency": self.latency,
+            "min_latency": self.min_latency,
+            "throughput": self.throughput,
+        }
+
+    def __repr__(self):
+        return (
+            f"AdaptiveLimiter (limit {self.limit}, settled at {self.settled_limit}, "
+            f"{self.n_completed} requests, {self.n_errors} errors)"
+        )
+
+
+class LimiterFactory:
+    """
+    Makes a new `AdaptiveLimiter` for each call (so concurrent event loops, e.g. in
+    other threads, never share one), carrying over only the limit the last one
+    settled on as the next one's initial limit.
+    """
+
+    def __init__(self, initial=10, **limiter_kwargs):
+        self.initial = initial
+        self.limiter_kwargs = limiter_kwargs
+        self._lock = threading.Lock()
+
+    def make(self):
+        with self._lock:
+            return AdaptiveLimiter(initial=self.initial, **self.limiter_kwargs)
+
+    def settle(self, limiter):
+        "Start the next limiter made at the limit this one settled on (if it was used)"
+        if limiter.n_completed:
+            with self._lock:
+                self.initial = limiter.settled_limit
+
+    @contextmanager
+    def use(self, limiter=None):
+        "Give the `limiter` if passed, else a new one (settled from on leaving)"
+        if limiter is not None:
+            yield limiter
+            return
+        limiter = self.make()
+        try:
+            yield limiter
+        finally:
+            self.settle(limiter)
+
+    def __repr__(self):
+        return f"LimiterFactory (initial {self.initial}, {self.limiter_kwargs})"
+
+
+async def drain(zs):
+    "Run a pipeline to completion (unlike awaiting it, tolerates an empty stream)"
+    async with zs.stream() as streamer:
+        async for _ in streamer:
+            pass
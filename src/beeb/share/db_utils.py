@@ -1,78 +1,309 @@
-import sqlite3
+import json
+import os
+import re
+import time
+from datetime import date
+from .sqlite_utils import SQLiteStore
 from ..data.store import _dir_path as store_path
 
-__all__ = ["CatalogueDB"]
+__all__ = ["CatalogueDB", "fts_query"]
 
 
-class CatalogueDB:
+def fts_query(text):
+    """
+    Make an FTS5 query from search text: each word must match (in any order), but
+    "quoted words" must match as a phrase, and a word ending in `*` is a prefix.
+    Everything else is quoted, so punctuation and FTS5 keywords are just text.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        prefix = word.endswith("*")
+        term = (phrase or word.rstrip("*").replace('"', "")).strip()
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError(f"No search terms in {text=}")
+    return " ".join(terms)
+
+
+class CatalogueDB(SQLiteStore):
+    """
+    The programme catalogue, migrated (see `migrations`) when created or first
+    written to, so read-only lookups leave the file as it was. Call
+    `rebuild_search_index` after a `VACUUM` (which may renumber the rowids).
+    """
+
     filename = "programme_catalogue.db"  # Default value
     directory = store_path
+    # Set before the first write: WAL with NORMAL sync is still durable across
+    # crashes of the process, and means one sync per transaction not per page
+    # (but WAL is kept off the packaged file, see `use_wal`)
+    write_pragmas = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+    packaged_path = store_path / filename
+    upsert_sql = """
+    INSERT INTO programmes VALUES (?,?,?,?)
+    ON CONFLICT(pid, station) DO UPDATE SET title=excluded.title, genre=excluded.genre
+    """
+    # Watermarks only move forward (ISO dates compare in date order as strings)
+    watermark_sql = """
+    INSERT INTO watermarks VALUES (?,?,?)
+    ON CONFLICT(station) DO UPDATE SET
+    last_date=max(last_date, excluded.last_date), updated=excluded.updated
+    """
+    # Schema version N is reached by running the first N of these (the table
+    # itself predates versioning, so is created in `create`)
+    migrations = [
+        """
+        CREATE INDEX IF NOT EXISTS programmes_station ON programmes(station);
+        CREATE INDEX IF NOT EXISTS programmes_title ON programmes(title);
+        CREATE INDEX IF NOT EXISTS programmes_genre ON programmes(genre);
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS programmes_fts USING fts5(
+            title, genre, station, content='programmes', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS programmes_fts_insert AFTER INSERT ON programmes
+        BEGIN
+            INSERT INTO programmes_fts(rowid, title, genre, station)
+            VALUES (new.rowid, new.title, new.genre, new.station);
+        END;
+        CREATE TRIGGER IF NOT EXISTS programmes_fts_delete AFTER DELETE ON programmes
+        BEGIN
+            INSERT INTO programmes_fts(programmes_fts, rowid, title, genre, station)
+            VALUES ('delete', old.rowid, old.title, old.genre, old.station);
+        END;
+        CREATE TRIGGER IF NOT EXISTS programmes_fts_update AFTER UPDATE ON programmes
+        BEGIN
+            INSERT INTO programmes_fts(programmes_fts, rowid, title, genre, station)
+            VALUES ('delete', old.rowid, old.title, old.genre, old.station);
+            INSERT INTO programmes_fts(rowid, title, genre, station)
+            VALUES (new.rowid, new.title, new.genre, new.station);
+        END;
+        INSERT INTO programmes_fts(programmes_fts) VALUES ('rebuild');
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS watermarks
+        (station varchar(10) primary key, last_date date, updated real);
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS episodes
+        (episode_pid varchar(20) primary key, programme_pid varchar(20),
+        title tinytext, genre tinytext, parent_type tinytext, updated real);
+        """,
+    ]
+    # Relevance weights of the full-text indexed columns (higher is weightier)
+    fts_weights = {"title": 10.0, "genre": 2.0, "station": 1.0}
 
     def __init__(self, dir=directory, filename=filename, create=True, no_touch=False):
-        self.directory = dir
-        self.filename = filename
+        super().__init__(dir, filename)
         if create:
             self.create(no_touch=no_touch)
 
-    @property
-    def path(self):
-        return self.directory / self.filename
-
-    def exists(self):
-        return self.path.exists()
-
     def create(self, no_touch=False):
         if no_touch and not self.path.exists():
-            raise FileNotFoundError(f"No CatalogueDB at {self.db.path}")
-        with self.connect() as conn:
-            c = conn.cursor()
-            c.execute(
+            raise FileNotFoundError(f"No CatalogueDB at {self.path}")
+        with self._lock, self.connect() as conn:
+            conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS programmes
                 (pid varchar(20), title tinytext, genre tinytext, station varchar(10),
                 Constraint pk_pid Primary key(pid, station))
                 """
             )
+        self.migrate()
+
+    def on_connect(self):
+        self._wal_checked = False
 
     def connect(self):
-        return sqlite3.connect(self.path)
+        return self.conn
+
+    @property
+    def user_version(self):
+        with self._lock:
+            return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        "Bring the schema up to date (if there's a table to migrate and it's writable)"
+        with self._lock:
+            conn = self.conn
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version >= len(self.migrations) or not self.has_table(conn):
+                return
+            if not os.access(self.path, os.W_OK):
+                return  # Read-only: lookups still work, just without the indexes
+            for v, script in enumerate(self.migrations[version:], start=version + 1):
+                conn.executescript(f"BEGIN; {script} PRAGMA user_version={v}; COMMIT;")
+
+    @staticmethod
+    def has_table(conn, name="programmes"):
+        query_sql = "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?"
+        return conn.execute(query_sql, (name,)).fetchone() is not None
+
+    def prepare_write(self, conn):
+        "Migrate the schema and set the `write_pragmas`, before the first write"
+        if self._wal_checked:
+            return
+        self._wal_checked = True
+        self.migrate()
+        for pragma, value in self.write_pragmas.items():
+            if pragma == "journal_mode" and not self.use_wal:
+                value = "DELETE"  # (Leaving WAL if it was set before)
+            conn.execute(f"PRAGMA {pragma}={value}")
+
+    @property
+    def use_wal(self):
+        "Whether to write in WAL mode (not to the packaged file, nor a read-only dir)"
+        packaged = self.path.resolve() == self.packaged_path.resolve()
+        return not packaged and os.access(self.directory, os.W_OK)
 
     def insert_entry(self, pid, title, genre, station):
         try:
-            with self.connect() as conn:
-                c = conn.cursor()
-                c.execute(
-                    "INSERT INTO programmes VALUES (?,?,?,?)", (pid, title, genre, station)
-                )
-                conn.commit()
+            self.insert_entries([(pid, title, genre, station)])
         except Exception as e:
             print(f"{pid=} {title=} {genre=} {station=}")
             raise e
 
+    def insert_entries(self, entries, watermarks=None, episodes=None):
+        """
+        Write many `(pid, title, genre, station)` rows in a single transaction,
+        updating the title and genre of any already stored (rather than failing).
+        Return the number of rows written. The `watermarks` dict of station names to
+        dates (see `set_watermarks`) and `episodes` dict of resolutions (see
+        `insert_episodes`) are written in the same transaction if given.
+        """
+        entries = list(entries)
+        with self._lock:
+            conn = self.connect()
+            self.prepare_write(conn)
+            with conn:  # Commits, or rolls back all of them on error
+                conn.executemany(self.upsert_sql, entries)
+                if watermarks:
+                    conn.executemany(self.watermark_sql, self.watermark_rows(watermarks))
+                if episodes:
+                    conn.executemany(self.episode_sql, self.episode_rows(episodes))
+        return len(entries)
+
+    episode_sql = "INSERT OR REPLACE INTO episodes VALUES (?,?,?,?,?,?)"
+
+    @staticmethod
+    def episode_rows(episodes):
+        now = time.time()
+        return [(pid, *resolution, now) for pid, resolution in episodes.items()]
+
+    def insert_episodes(self, episodes):
+        """
+        Store the resolutions of episodes to their programmes, given as a dict of
+        episode PIDs to `(programme_pid, title, genre, parent_type)` tuples (with
+        the programme PID, title and parent type `None` for one-off episodes).
+        """
+        with self._lock:
+            conn = self.connect()
+            self.prepare_write(conn)
+            with conn:
+                conn.executemany(self.episode_sql, self.episode_rows(episodes))
+
+    def get_episodes(self, episode_pids):
+        "A dict of the stored resolutions (see `insert_episodes`) of the episode PIDs"
+        query_sql = """
+        SELECT episode_pid, programme_pid, title, genre, parent_type FROM episodes
+        WHERE episode_pid IN (SELECT value FROM json_each(?))
+        """
+        with self._lock:
+            conn = self.connect()
+            if not self.has_table(conn, "episodes"):
+                return {}  # Not migrated (not yet written to since episodes)
+            rows = conn.execute(query_sql, (json.dumps(list(episode_pids)),))
+            return {pid: resolution for pid, *resolution in rows}
+
+    @staticmethod
+    def watermark_rows(watermarks):
+        now = time.time()
+        return [(s, d.isoformat(), now) for s, d in watermarks.items() if d is not None]
+
+    def set_watermarks(self, watermarks):
+        """
+        Record, per station, the last date whose listings have been folded into the
+        catalogue, given as a dict of station names to dates (an earlier date than
+        the one already recorded is ignored).
+        """
+        with self._lock:
+            conn = self.connect()
+            self.prepare_write(conn)
+            with conn:
+                conn.executemany(self.watermark_sql, self.watermark_rows(watermarks))
+
+    def get_watermark(self, station_name):
+        "The last date whose listings were folded in for the station (or `None`)"
+        with self._lock:
+            conn = self.connect()
+            if not self.has_table(conn, "watermarks"):
+                return None  # Not migrated (not yet written to since watermarks)
+            query_sql = "SELECT last_date FROM watermarks WHERE station == ?"
+            row = conn.execute(query_sql, (station_name,)).fetchone()
+        return date.fromisoformat(row[0]) if row else None
+
     def retrieve_pid(self, pid):
-        with self.connect() as conn:
+        with self._lock:
             query_sql = """
             SELECT * FROM programmes
             WHERE pid == ?
             """
-            c = conn.cursor()
-            c.execute(query_sql, (pid,))
+            c = self.connect().execute(query_sql, (pid,))
             return c.fetchone()
 
     def retrieve_station(self, station_name, fetch_all=True):
-        with self.connect() as conn:
+        with self._lock:
             query_sql = """
             SELECT * FROM programmes
             WHERE station == ?
             """
-            c = conn.cursor()
-            c.execute(query_sql, (station_name,))
+            c = self.connect().execute(query_sql, (station_name,))
             return c.fetchall() if fetch_all else c.fetchone()
 
     def has_station(self, station_name):
-        peek = self.retrieve_station(station_name, fetch_all=False)
-        has_station = peek is not None
-        return has_station
+        with self._lock:
+            query_sql = "SELECT 1 FROM programmes WHERE station == ? LIMIT 1"
+            peek = self.connect().execute(query_sql, (station_name,)).fetchone()
+        return peek is not None
+
+    def search(self, query, stations=None, fields=None, limit=None, raw=False):
+        """
+        Full-text search of the programmes' titles, genres and stations, returning
+        `(pid, title, genre, station)` rows, best matches first (BM25 ranked, with
+        the `fts_weights`). The `query` is search text (see `fts_query`) unless
+        `raw`, when it's passed to FTS5 as is. If given, only match in `fields`
+        (some of the `fts_weights` keys), and only return rows for `stations`.
+        """
+        match = query if raw else fts_query(query)
+        if fields:
+            match = f"{{{' '.join(fields)}}} : ({match})"
+        weights = ", ".join(map(str, self.fts_weights.values()))
+        query_sql = """
+        SELECT p.pid, p.title, p.genre, p.station
+        FROM programmes_fts JOIN programmes p ON p.rowid = programmes_fts.rowid
+        WHERE programmes_fts MATCH ?
+        """
+        params = [match]
+        if stations is not None:
+            stations = list(stations)
+            query_sql += f"AND p.station IN ({', '.join('?' * len(stations))})\n"
+            params.extend(stations)
+        query_sql += f"ORDER BY bm25(programmes_fts, {weights})"
+        if limit is not None:
+            query_sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            conn = self.connect()
+            if not self.has_table(conn, "programmes_fts"):
+                raise ValueError(
+                    f"No search index in {self}, as it's not been migrated: open it "
+                    "with `create=True` (or write to it) to add one"
+                )
+            return conn.execute(query_sql, params).fetchall()
+
+    def rebuild_search_index(self):
+        with self._lock, self.connect() as conn:
+            conn.execute("INSERT INTO programmes_fts(programmes_fts) VALUES ('rebuild')")
 
-    def __repr__(self):
-        return f"CatalogueDB '{self.filename}' at {self.directory}"
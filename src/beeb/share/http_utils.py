@@ -1,12 +1,232 @@
+import atexit
+import os
+import threading
 import httpx
 from h2.exceptions import ProtocolError
+from .cache_utils import get_cache
+from .rate_utils import get_rate_limiter
+from .coalesce_utils import SingleFlight, AsyncSingleFlight
+from .trace_utils import count, span
 
-__all__ = ["GET", "async_errors"]
+__all__ = [
+    "GET",
+    "async_GET",
+    "async_errors",
+    "ClientRegistry",
+    "clients",
+    "get_client",
+    "set_client",
+]
 
-def GET(url, raise_for_status=True):
-    response = httpx.get(url)
+
+class ClientRegistry:
+    """
+    Registry of long-lived `httpx.Client` objects, so that synchronous pulls
+    reuse warm (keep-alive) connections rather than paying a TCP+TLS handshake
+    on every request. Clients are keyed by name, so a custom client can be
+    injected with `register` (or `set_client`) and picked up by `GET`.
+
+    The connection pool is not shared across forked processes: a client made in
+    the parent is discarded and rebuilt on first use in a child. Within a process
+    the registry is thread-safe, so threads sharing it also share each client.
+
+    The async pipelines make their `httpx.AsyncClient` (one per event loop) with
+    `make_async_client`, so the same configuration applies to them. To send all
+    requests somewhere else (e.g. to the offline stand-in in `beeb.bench`), set
+    `transport_factory` and `async_transport_factory`: functions returning a new
+    transport for each client made.
+    """
+
+    http2 = False  # HTTP/1.1 by default, to match the behaviour of `httpx.get`
+    limits = httpx.Limits(
+        max_connections=100, max_keepalive_connections=20, keepalive_expiry=30
+    )
+    timeout = httpx.Timeout(10.0, connect=10.0)
+    transport_factory = None
+    async_transport_factory = None
+
+    def __init__(self, http2=http2, limits=limits, timeout=timeout):
+        self.http2 = http2
+        self.limits = limits
+        self.timeout = timeout
+        self._clients = {}
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+
+    def make_client(self, **client_kwargs):
+        "Create a new client with the registry's pool configuration."
+        client_kwargs.setdefault("http2", self.http2)
+        client_kwargs.setdefault("limits", self.limits)
+        client_kwargs.setdefault("timeout", self.timeout)
+        if self.transport_factory:
+            client_kwargs.setdefault("transport", self.transport_factory())
+        return httpx.Client(**client_kwargs)
+
+    def make_async_client(self, **client_kwargs):
+        "Create a new async client, for the lifetime of one event loop."
+        client_kwargs.setdefault("http2", self.http2)
+        client_kwargs.setdefault("limits", self.limits)
+        client_kwargs.setdefault("timeout", self.timeout)
+        if self.async_transport_factory:
+            client_kwargs.setdefault("transport", self.async_transport_factory())
+        return httpx.AsyncClient(**client_kwargs)
+
+    def configure(
+        self,
+        http2=None,
+        limits=None,
+        timeout=None,
+        transport_factory=None,
+        async_transport_factory=None,
+    ):
+        """
+        Change the pool configuration: any clients already made by the registry are
+        closed, and will be rebuilt with the new configuration on next use.
+        """
+        self._check_pid()
+        with self._lock:
+            if http2 is not None:
+                self.http2 = http2
+            if limits is not None:
+                self.limits = limits
+            if timeout is not None:
+                self.timeout = timeout
+            if transport_factory is not None:
+                self.transport_factory = transport_factory
+            if async_transport_factory is not None:
+                self.async_transport_factory = async_transport_factory
+            self.close()
+
+    def reset(self):
+        "Restore the default configuration (closing any clients made)"
+        self._check_pid()
+        with self._lock:
+            for attr in ["http2", "limits", "timeout"]:
+                setattr(self, attr, getattr(type(self), attr))
+            self.transport_factory = self.async_transport_factory = None
+            self.close()
+
+    def _check_pid(self):
+        if os.getpid() != self._pid:
+            # Forked: the parent's sockets must not be used, so forget (don't close),
+            # and the lock may have been held by a thread that wasn't forked
+            self._lock = threading.RLock()
+            self._clients = {}
+            self._pid = os.getpid()
+
+    def get(self, name="default"):
+        self._check_pid()
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None or client.is_closed:
+                client = self._clients[name] = self.make_client()
+            return client
+
+    def register(self, client, name="default"):
+        "Inject a client (e.g. with custom transport or headers) under `name`."
+        self._check_pid()
+        with self._lock:
+            self._clients[name] = client
+            return client
+
+    def close(self):
+        self._check_pid()
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+    def __repr__(self):
+        return f"ClientRegistry ({len(self._clients)} clients, {self.http2=})"
+
+
+clients = ClientRegistry()
+atexit.register(clients.close)
+
+
+def get_client(name="default"):
+    return clients.get(name)
+
+
+def set_client(client, name="default"):
+    return clients.register(client, name=name)
+
+
+get_flight = SingleFlight()
+async_get_flight = AsyncSingleFlight()
+
+
+def GET(url, raise_for_status=True, client=None, use_cache=True):
+    """
+    GET `url` with the shared client (unless `client` is given), consulting the
+    response cache if one is set (see `beeb.share.cache_utils.set_cache`), and
+    waiting on the per-host rate limiter, if one is set (see `set_rate_limiter`),
+    before any network request.
+    Concurrent calls (in other threads) for the same URL share a single request.
+    """
+    client = client if client else get_client()
+    key = (id(client), str(url), use_cache)
+    response = get_flight.do(key, _GET, url, client, use_cache)
     if raise_for_status:
         response.raise_for_status()
     return response
 
+
+def _GET(url, client, use_cache):
+    cache = get_cache() if use_cache else None
+    entry = cache.get(url) if cache is not None else None
+    if entry and entry.is_fresh:
+        count("cache_hits")
+        return entry.to_response()
+    rate_limiter = get_rate_limiter()
+    if rate_limiter:
+        rate_limiter.wait(url)
+    with span("http.get", url=str(url)):
+        response = client.get(str(url), headers=entry.validators if entry else None)
+    count("requests")
+    count("bytes", len(response.content))
+    if cache is not None:
+        response = cache.update(entry, response)
+    return response
+
+
+async def async_GET(session, url, raise_for_status=False, use_cache=True, limiter=None):
+    """
+    Async counterpart to `GET`, using the `httpx.AsyncClient` passed as `session`.
+    If an `AdaptiveLimiter` is passed as `limiter`, the network request (but not
+    a cache hit, nor the rate limit wait) takes one of its concurrency slots.
+    Concurrent awaits for the same URL share a single request.
+    """
+    key = (id(session), str(url), use_cache)
+    response = await async_get_flight.do(key, _async_GET, session, url, use_cache, limiter)
+    if raise_for_status:
+        response.raise_for_status()
+    return response
+
+
+async def _async_GET(session, url, use_cache, limiter):
+    cache = get_cache() if use_cache else None
+    entry = cache.get(url) if cache is not None else None
+    if entry and entry.is_fresh:
+        count("cache_hits")
+        return entry.to_response()
+    rate_limiter = get_rate_limiter()
+    if rate_limiter:
+        await rate_limiter.async_wait(url)
+    headers = entry.validators if entry else None
+    with span("http.get", url=str(url)):
+        if limiter is None:
+            response = await session.get(str(url), headers=headers)
+        else:
+            async with limiter.track() as outcome:
+                response = await session.get(str(url), headers=headers)
+                outcome.update(
+                    status=response.status_code, n_bytes=len(response.content)
+                )
+    count("requests")
+    count("bytes", len(response.content))
+    if cache is not None:
+        response = cache.update(entry, response)
+    return response
+
 async_errors = (httpx.RemoteProtocolError, ProtocolError)
@@ -1,11 +1,25 @@
+import atexit
+import os
+import sys
 import multiprocessing as mp
-from multiprocessing import Process, Pool
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+from multiprocessing import Process
 from more_itertools import chunked
 from tqdm import tqdm
-from functools import partial
 
 
-__all__ = ["batch_multiprocess", "batch_multiprocess_with_return"]
+__all__ = [
+    "batch_multiprocess",
+    "batch_multiprocess_with_return",
+    "WorkerPool",
+    "get_pool",
+    "set_pool",
+]
+
+# `Executor.shutdown` only takes `cancel_futures` from Python 3.9
+has_cancel_futures = sys.version_info >= (3, 9)
 
 
 def batch_multiprocess(function_list, n_cores=mp.cpu_count(), show_progress=True,
@@ -32,16 +46,143 @@ def batch_multiprocess_with_return(
     """
     Run a list of functions on `n_cores` (default: all CPU cores),
     with the option to show a progress bar using tqdm (default: shown).
+    Results are appended to `pool_results` (if given) in the order of
+    `function_list`. Runs on the shared `WorkerPool` unless a different
+    number of cores is requested.
     """
-    iterator = [*chunked(function_list, n_cores)]
-    pool_results = pool_results if pool_results else []
-    pool = Pool(processes=n_cores)
-    if show_progress:
-        iterator = tqdm(iterator, desc=tqdm_desc)
-    for func_batch in iterator:
-        procs = []
-        for f in func_batch:
-            pool.apply_async(func=f, callback=pool_results.append)
-    pool.close()
-    pool.join()
+    pool_results = pool_results if pool_results is not None else []
+    shared = get_pool()
+    pool = shared if n_cores == shared.n_workers else WorkerPool(n_workers=n_cores)
+    try:
+        pool_results.extend(
+            pool.run(function_list, show_progress=show_progress, tqdm_desc=tqdm_desc)
+        )
+    finally:
+        if pool is not shared:
+            pool.shutdown()
     return pool_results
+
+
+def warm_imports(module_names):
+    "Worker initialiser: import the slow-to-load parsing modules once per worker"
+    for name in module_names:
+        try:
+            import_module(name)
+        except ImportError:
+            pass
+
+
+def call(func):
+    return func()
+
+
+class WorkerPool:
+    """
+    Persistent process pool: the worker processes are started on first use and
+    reused by every later call (so each batch doesn't pay for process start-up
+    and re-importing bs4), until `shutdown`. Results are streamed back in input
+    order, so callers need not re-sort them, with a per-item progress bar.
+
+    Use as a context manager to shut the workers down on leaving the block, e.g.
+    to share one pool across the listings of a `ProgrammeGuide`. A pool made in a
+    parent process is not used by a forked child, which starts its own.
+    """
+
+    n_workers = mp.cpu_count()
+    warm_modules = ("bs4", "lxml", "html5lib")
+    chunks_per_worker = 4  # Smaller chunks balance load, larger ones cut overhead
+
+    def __init__(self, n_workers=n_workers, warm_modules=warm_modules):
+        self.n_workers = n_workers
+        self.warm_modules = warm_modules
+        self._executor = None
+        self._pid = os.getpid()
+
+    @property
+    def executor(self):
+        if os.getpid() != self._pid:
+            self._executor = None  # Forked: the parent's workers aren't ours
+            self._pid = os.getpid()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=warm_imports,
+                initargs=(self.warm_modules,),
+            )
+        return self._executor
+
+    def chunksize(self, n_items):
+        return max(1, n_items // (self.n_workers * self.chunks_per_worker))
+
+    def map(self, func, *iterables, chunksize=None, show_progress=False, tqdm_desc=None):
+        """
+        Apply `func` to each item (or with several iterables, to the items at each
+        position, like the builtin `map`) in the pool, yielding results in order.
+        """
+        iterables = [list(it) for it in iterables]
+        n_items = min(map(len, iterables))
+        chunksize = chunksize if chunksize else self.chunksize(n_items)
+        results = self.executor.map(func, *iterables, chunksize=chunksize)
+        pbar = tqdm(total=n_items, desc=tqdm_desc) if show_progress else None
+        try:
+            for result in results:
+                if pbar:
+                    pbar.update()
+                yield result
+        except BrokenProcessPool:
+            self.shutdown(wait=False)  # A worker died: start afresh on next use
+            raise
+        finally:
+            if pbar:
+                pbar.close()
+
+    def run(self, function_list, chunksize=None, show_progress=False, tqdm_desc=None):
+        "Call each (picklable, argument-free) function, returning a list of results"
+        return list(
+            self.map(
+                call,
+                function_list,
+                chunksize=chunksize,
+                show_progress=show_progress,
+                tqdm_desc=tqdm_desc,
+            )
+        )
+
+    def shutdown(self, wait=True):
+        "Stop the workers, cancelling any work not yet started unless `wait`"
+        if self._executor is not None and os.getpid() == self._pid:
+            if has_cancel_futures:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            else:
+                if not wait:
+                    # Cancel the work not yet started, as `cancel_futures` would
+                    pending = getattr(self._executor, "_pending_work_items", {})
+                    for work_item in list(pending.values()):
+                        work_item.future.cancel()
+                self._executor.shutdown(wait=wait)
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def __repr__(self):
+        state = "running" if self._executor else "idle"
+        return f"WorkerPool ({self.n_workers} workers, {state})"
+
+
+_pool = WorkerPool()
+atexit.register(lambda: _pool.shutdown())
+
+
+def get_pool():
+    return _pool
+
+
+def set_pool(pool):
+    "Replace the shared worker pool (the previous one is not shut down)"
+    global _pool
+    _pool = pool
+    return pool
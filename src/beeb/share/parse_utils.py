@@ -0,0 +1,239 @@
+import json
+import re
+from io import BytesIO
+from bs4 import BeautifulSoup as BS, SoupStrainer
+from bs4.builder import builder_registry
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = [
+    "html_parsers",
+    "available_parsers",
+    "get_html_parser",
+    "set_html_parser",
+    "parse_modes",
+    "get_parse_mode",
+    "set_parse_mode",
+    "class_strainer",
+    "make_soup",
+    "iter_elements_by_class",
+    "select_first",
+    "element_text",
+    "json_backends",
+    "get_json_backend",
+    "set_json_backend",
+    "loads_json",
+    "extract_key_paths",
+]
+
+# BeautifulSoup tree builders, fastest first: html5lib is the slowest (by several
+# times) but the most lenient, parsing exactly as a browser would
+html_parsers = ("lxml", "html5lib", "html.parser")
+
+
+def available_parsers():
+    "The HTML parsers in `html_parsers` which are installed"
+    return [p for p in html_parsers if builder_registry.lookup(p) is not None]
+
+
+_html_parser = available_parsers()[0]
+
+
+def get_html_parser():
+    return _html_parser
+
+
+def set_html_parser(parser):
+    """
+    Choose the parser used for all HTML (schedules and episode listings): one of
+    `html_parsers`, e.g. "html5lib" to fall back to the original (slower) parser.
+    Worker processes are told the parser with each page, so this takes effect
+    even for a worker pool that is already running.
+    """
+    global _html_parser
+    if parser not in html_parsers:
+        raise ValueError(f"{parser=} is not one of {html_parsers}")
+    if builder_registry.lookup(parser) is None:
+        raise ValueError(f"{parser=} is not installed")
+    _html_parser = parser
+    return parser
+
+
+# How much of a schedule page to parse:
+# - "fields": stream through it with lxml, extracting only the fields of each
+#   broadcast (no BeautifulSoup tree at all, nor a full lxml tree)
+# - "strained": build the BeautifulSoup tree of just the broadcasts
+# - "full": build the BeautifulSoup tree of the entire page
+parse_modes = ("fields", "strained", "full")
+_parse_mode = "fields" if etree is not None else "strained"
+
+
+def get_parse_mode():
+    return _parse_mode
+
+
+def set_parse_mode(mode):
+    """
+    Choose how schedule pages are parsed: one of `parse_modes` (the "fields" mode
+    needs lxml, and is unaffected by `set_html_parser`). Like the parser, the mode
+    is sent to worker processes with each page.
+    """
+    global _parse_mode
+    if mode not in parse_modes:
+        raise ValueError(f"{mode=} is not one of {parse_modes}")
+    if mode == "fields" and etree is None:
+        raise ValueError("The 'fields' parse mode needs lxml to be installed")
+    _parse_mode = mode
+    return mode
+
+
+def class_strainer(*class_names):
+    """
+    A `SoupStrainer` keeping only the elements (with all their contents) with any
+    of the given classes. Matched on the whole class attribute, as the strainer
+    sees it before it's split into a list (so `class_="broadcast"` would miss
+    `class="broadcast broadcast--grid"`).
+    """
+    names = "|".join(map(re.escape, class_names))
+    return SoupStrainer(class_=re.compile(rf"(?:^|\s)(?:{names})(?:\s|$)"))
+
+
+def make_soup(markup, parser=None, parse_only=None):
+    """
+    Parse HTML given as raw bytes (as fetched: BBC pages are UTF-8) or a decoded
+    string, with `parser` or else the configured default (see `set_html_parser`),
+    building only the parts kept by the `parse_only` strainer if given (which
+    html5lib doesn't support, so it then parses the whole page).
+    """
+    parser = parser if parser else _html_parser
+    kwargs = {"features": parser}
+    if parse_only is not None and parser != "html5lib":
+        kwargs["parse_only"] = parse_only
+    if isinstance(markup, bytes):
+        kwargs["from_encoding"] = "utf-8"
+    return BS(markup, **kwargs)
+
+
+def has_class(el, class_name):
+    return class_name in el.get("class", "").split()
+
+
+def iter_elements_by_class(markup, class_name):
+    """
+    Stream through HTML (bytes or string) with lxml, yielding each element with
+    the class `class_name` once it's complete. Everything else is discarded as
+    it's passed, so the full document tree is never held in memory (nor is each
+    yielded element once the caller moves on to the next).
+    """
+    if isinstance(markup, str):
+        markup = markup.encode("utf-8")
+    source = BytesIO(markup)
+    depth = 0  # depth within a matching element (0 when outside one)
+    for event, el in etree.iterparse(
+        source, events=("start", "end"), html=True, encoding="utf-8"
+    ):
+        if event == "start":
+            if depth or has_class(el, class_name):
+                depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                yield el
+                el.clear(keep_tail=False)
+        else:
+            el.clear(keep_tail=False)
+
+
+def select_first(el, ancestor_classes=(), tag=None, class_name=None, attr=None):
+    """
+    The first descendant of the lxml element `el` with the given `tag`, class and
+    attribute (each optional), whose ancestors (within `el`) include elements
+    with the `ancestor_classes` in that order, outermost first. For instance,
+    `.programme__body .programme__synopsis span` is given as:
+    `select_first(el, ["programme__body", "programme__synopsis"], tag="span")`.
+    """
+    for d in el.iterdescendants():
+        if not isinstance(d.tag, str):
+            continue  # Skip comments and processing instructions
+        if tag and d.tag != tag:
+            continue
+        if class_name and not has_class(d, class_name):
+            continue
+        if attr and d.get(attr) is None:
+            continue
+        if ancestors_match(d, ancestor_classes, el):
+            return d
+    return None
+
+
+def ancestors_match(d, ancestor_classes, root):
+    remaining = list(ancestor_classes)
+    node = d.getparent()
+    while remaining and node is not None:
+        if has_class(node, remaining[-1]):
+            remaining.pop()
+        if node is root:
+            break
+        node = node.getparent()
+    return not remaining
+
+
+def element_text(el):
+    "All the text within an lxml element (like BeautifulSoup's `Tag.text`)"
+    return "".join(el.itertext()) if el is not None else ""
+
+
+# JSON decoders, fastest first (orjson is optional, the standard library's is not)
+json_backends = ("orjson", "json")
+_json_backend = "orjson" if orjson is not None else "json"
+
+
+def get_json_backend():
+    return _json_backend
+
+
+def set_json_backend(backend):
+    "Choose the JSON decoder: one of `json_backends`"
+    global _json_backend
+    if backend not in json_backends:
+        raise ValueError(f"{backend=} is not one of {json_backends}")
+    if backend == "orjson" and orjson is None:
+        raise ValueError(f"{backend=} is not installed")
+    _json_backend = backend
+    return backend
+
+
+def loads_json(data):
+    "Decode JSON given as raw bytes (as fetched, no need to decode them) or a string"
+    if _json_backend == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def extract_key_paths(doc, key_paths):
+    """
+    A copy of the nested dict `doc` with just the values at the given key paths
+    (each a list of keys), nested under the same keys. Key paths that aren't in
+    `doc` are left out, so looking them up in the copy raises a `KeyError` too.
+    """
+    lean = {}
+    for kp in key_paths:
+        try:
+            value = doc
+            for k in kp:
+                value = value[k]
+        except (KeyError, TypeError):
+            continue
+        node = lean
+        for k in kp[:-1]:
+            node = node.setdefault(k, {})
+        node[kp[-1]] = value
+    return lean
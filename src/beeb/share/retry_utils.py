@@ -0,0 +1,117 @@
+import asyncio
+import random
+import httpx
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from .http_utils import async_errors
+from .trace_utils import count
+
+__all__ = ["RetryPolicy", "retryable_errors"]
+
+# Transport errors (connection resets, timeouts, dropped HTTP/2 streams: see #6)
+retryable_errors = (httpx.TransportError, *async_errors)
+
+
+class RetryPolicy:
+    """
+    Per-request retries with jittered exponential backoff, for async batches.
+
+    Each URL is retried up to `n_retries` times after a transport error or a
+    retryable HTTP status (429 or 5xx), sleeping a random time up to
+    `base_delay * 2 ** attempt` (capped at `max_delay`) before each retry. If the
+    response says when to retry with a `Retry-After` header (as a 429 or 503 may),
+    it waits at least that long instead (up to `max_retry_after` seconds).
+
+    Retries draw on a shared budget, so a batch against a failing server can't
+    multiply its traffic: the budget starts at `min_budget` and each request
+    adds `budget_ratio` to it (i.e. by default at most ~10% extra requests).
+
+    URLs which still fail are recorded in `failures` (a dict of URL to the final
+    exception or response), so the rest of the batch can still be used.
+    """
+
+    retry_statuses = {429, 500, 502, 503, 504}
+    max_retry_after = 60.0
+
+    def __init__(
+        self, n_retries=3, base_delay=0.5, max_delay=10.0, min_budget=10, budget_ratio=0.1
+    ):
+        self.n_retries = n_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_budget = min_budget
+        self.budget_ratio = budget_ratio
+        self.budget = float(min_budget)
+        self.n_retried = 0
+        self.failures = {}
+
+    def delay(self, attempt):
+        "Full jitter: uniformly random up to the exponential backoff ceiling"
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def retry_after(self, response):
+        "Seconds to wait as the response's `Retry-After` header says, if it does"
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(value)  # Else given as an HTTP date
+            except (TypeError, ValueError):
+                return None
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            seconds = (when - datetime.now(timezone.utc)).total_seconds()
+        return min(max(seconds, 0.0), self.max_retry_after)
+
+    def is_retryable(self, response):
+        return response.status_code in self.retry_statuses
+
+    def spend(self):
+        "Take a retry from the budget, returning False if it is exhausted"
+        if self.budget < 1:
+            return False
+        self.budget -= 1
+        self.n_retried += 1
+        return True
+
+    async def call(self, fetch_func, *args, url):
+        """
+        Await `fetch_func(*args)` (which must return an `httpx.Response`) until it
+        succeeds or retries run out, returning the response or `None` on failure.
+        """
+        self.budget += self.budget_ratio
+        for attempt in range(self.n_retries + 1):
+            try:
+                response = await fetch_func(*args)
+            except retryable_errors as e:
+                outcome = e
+            else:
+                if response.is_success:
+                    self.failures.pop(str(url), None)
+                    return response
+                outcome = response
+                if not self.is_retryable(response):
+                    break  # e.g. 404 Not Found: retrying won't help
+            if attempt == self.n_retries or not self.spend():
+                break
+            count("retries")
+            delay = self.delay(attempt)
+            if isinstance(outcome, httpx.Response):
+                delay = max(delay, self.retry_after(outcome) or 0.0)
+            await asyncio.sleep(delay)
+        count("failures")
+        self.failures[str(url)] = outcome
+        return None
+
+    @property
+    def failed_urls(self):
+        return list(self.failures)
+
+    def __repr__(self):
+        return (
+            f"RetryPolicy ({self.n_retried} retries, {len(self.failures)} failed, "
+            f"{int(self.budget)} left in budget)"
+        )
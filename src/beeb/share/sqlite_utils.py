@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import threading
+from ..data.store import _dir_path as store_path
+
+__all__ = ["SQLiteStore", "swap_store"]
+
+
+class SQLiteStore:
+    "A SQLite file with one connection, shared by threads and reopened after a fork"
+
+    filename = None  # Set by each subclass
+    directory = store_path
+
+    def __init__(self, dir=directory, filename=None):
+        self.directory = dir
+        if filename is not None:
+            self.filename = filename
+        self._lock = threading.RLock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def path(self):
+        return self.directory / self.filename
+
+    def exists(self):
+        return self.path.exists()
+
+    @property
+    def conn(self):
+        "The connection (use it with the lock held, if shared between threads)"
+        with self._lock:
+            if self._conn is None or self._pid != os.getpid():
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._pid = os.getpid()
+                self.on_connect()
+            return self._conn
+
+    def on_connect(self):
+        "Reset any state kept per connection (called as each is opened)"
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"{type(self).__name__} '{self.filename}' at {self.directory}"
+
+
+def swap_store(current, store, default_cls):
+    """
+    The store to use in place of `current` (which is closed if replaced): `store`,
+    or a new `default_cls` (in `beeb.data.store`) if `store` is `True`.
+    """
+    if store is True:
+        store = default_cls()
+    if current is not None and current is not store:
+        current.close()
+    return store
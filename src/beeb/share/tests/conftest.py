@@ -0,0 +1,9 @@
+import pytest
+
+from beeb.bench import StandInServer, use_stand_in
+
+@pytest.fixture(scope="module")
+def server():
+    "Route the module's requests to a stand-in for bbc.co.uk (see `beeb.bench`)"
+    with StandInServer() as stand_in, use_stand_in(stand_in):
+        yield stand_in
@@ -0,0 +1,29 @@
+"""
+Record live bbc.co.uk pages into the test data directory, where the parser
+equivalence tests in `test_parse_utils.py` pick them up, e.g.
+
+    python src/beeb/share/tests/record_pages.py schedule p00fzl7j 2021-03-28
+    python src/beeb/share/tests/record_pages.py episodes b006qp6p 1
+"""
+import sys
+from pathlib import Path
+from beeb.share.http_utils import GET
+
+DATA_DIR = Path(__file__).parent / "data"
+
+urls = {
+    "schedule": "https://www.bbc.co.uk/schedules/{}/{}",
+    "episodes": "https://www.bbc.co.uk/programmes/{}/episodes/player?page={}",
+}
+
+
+def record(kind, key, arg):
+    "Fetch the page and save it as `{kind}-{key}-{arg}.html`, returning the path"
+    url = urls[kind].format(key, arg.replace("-", "/") if kind == "schedule" else arg)
+    path = DATA_DIR / f"{kind}-{key}-{arg}.html"
+    path.write_bytes(GET(url, raise_for_status=True).content)
+    return path
+
+
+if __name__ == "__main__":
+    print(record(*sys.argv[1:4]))
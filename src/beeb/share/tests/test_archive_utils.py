@@ -0,0 +1,39 @@
+import pytest
+from datetime import date, timedelta
+
+from beeb.bench import StandInServer, fixtures, use_stand_in
+from beeb.nav import ChannelListings
+from beeb.nav.sched.schedule import parse_schedule_page
+from beeb.share.archive_utils import ScheduleArchive, get_archive, set_archive
+
+@pytest.fixture
+def archive(tmp_path):
+    prev = get_archive()
+    archive = set_archive(ScheduleArchive(dir=tmp_path))
+    yield archive
+    set_archive(prev)
+
+def test_roundtrip(archive):
+    ymd = (2021, 3, 14)
+    day = date(*ymd)
+    records = parse_schedule_page(fixtures.schedule_html("p00fzl7j", ymd), ymd)
+    assert archive.put("p00fzl7j", {day: records, day + timedelta(1): ()}) == 2
+    assert archive.get("p00fzl7j", [day, day + timedelta(1), day - timedelta(1)]) == {
+        day: records,
+        day + timedelta(1): (),
+    }
+    assert archive.put("p00fzl7j", {date.today(): records}) == 0  # too recent
+
+def test_listings_from_archive(archive):
+    "Past days are fetched once, then loaded from the archive; recent ones refetched"
+    with StandInServer() as server, use_stand_in(server):
+        assert get_archive() is None  # Stand-in pages aren't archived unless asked
+        set_archive(archive)
+        first = ChannelListings.from_channel_name("r4", n_days=5)
+        assert len(archive) == 3
+        server.reset_stats()
+        second = ChannelListings.from_channel_name("r4", n_days=5)
+        assert server.stats["schedule"]["requests"] == 2  # today and yesterday
+    assert [s.broadcast_records for s in second.schedules] == [
+        s.broadcast_records for s in first.schedules
+    ]
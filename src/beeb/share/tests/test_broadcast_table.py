@@ -0,0 +1,61 @@
+import re
+import pytest
+from datetime import datetime, timezone
+
+np = pytest.importorskip("numpy")  # The `table` extra
+
+from beeb.bench import fixtures
+from beeb.nav.sched.broadcasts import Broadcast
+from beeb.nav.sched.schedule import parse_schedule_page
+from beeb.nav.sched.table import BroadcastTable
+
+@pytest.fixture(scope="module")
+def records():
+    "A week of records in March (GMT) and a week in July (BST, UTC+1)"
+    days = [(2021, 3, d) for d in range(1, 8)] + [(2021, 7, d) for d in range(1, 8)]
+    return [
+        r
+        for ymd in days
+        for r in parse_schedule_page(fixtures.schedule_html("p00fzl7j", ymd), ymd)
+    ]
+
+@pytest.fixture(scope="module")
+def broadcasts(records):
+    return [Broadcast.from_record(r) for r in records]
+
+@pytest.fixture(scope="module")
+def table(records):
+    return BroadcastTable.from_records(records, channel_id="p00fzl7j")
+
+def same(table, broadcasts):
+    return [b.fields for b in table] == [b.fields for b in broadcasts]
+
+def test_roundtrip(table, records, broadcasts):
+    assert len(table) == len(records)
+    assert [table.record(i) for i in range(len(table))] == records
+    assert same(table, broadcasts)
+    assert same(BroadcastTable.from_broadcasts(broadcasts), broadcasts)
+    assert len(table.title.values) < len(table)  # titles are stored once each
+
+def test_filters(table, broadcasts):
+    start = datetime(2021, 7, 3, tzinfo=timezone.utc)
+    end = datetime(2021, 7, 5, 12, tzinfo=timezone.utc)
+    assert same(table[table.between(start, end)], [b for b in broadcasts if start <= b.time < end])
+    assert same(
+        table[table.on_weekdays("Mon", 5)],
+        [b for b in broadcasts if b.time.weekday() in (0, 5)],
+    )
+    titles = {broadcasts[0].title, broadcasts[-1].title}
+    assert same(table[table.title_in(titles)], [b for b in broadcasts if b.title in titles])
+    rc = re.compile("the", re.IGNORECASE)
+    assert same(
+        table.filter(pattern="the", fields=("title", "synopsis"), case_insensitive=True),
+        [b for b in broadcasts if rc.match(b.title) or rc.match(b.synopsis)],
+    )
+
+def test_concat(table):
+    both = BroadcastTable.concat([table, table[:5]])
+    assert len(both) == len(table) + 5
+    assert both.title[len(table)] == table.title[0]
+    assert np.array_equal(both.time[-5:], table.time[:5])
+    assert len(BroadcastTable.concat([])) == 0
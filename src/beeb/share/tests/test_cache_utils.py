@@ -0,0 +1,75 @@
+import pytest
+import httpx
+
+from beeb.share.cache_utils import ResponseCache
+from beeb.share.http_utils import GET
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(dir=tmp_path)
+
+@pytest.fixture
+def json_url():
+    return "https://www.bbc.co.uk/programmes/m000t476.json"
+
+def make_client(requests_seen, status=200):
+    def handler(request):
+        requests_seen.append(request)
+        if "If-None-Match" in request.headers:
+            return httpx.Response(304)
+        return httpx.Response(status, content=b"{}", headers={"ETag": '"abc"'})
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+def test_ttl_rules(cache, json_url):
+    assert cache.is_cacheable(json_url)
+    assert cache.is_cacheable("https://www.bbc.co.uk/schedules/p00fzl7j/2021/03/17")
+    assert not cache.is_cacheable("https://open.live.bbc.co.uk/mediaselector/6/")
+
+def test_cache_hit(cache, json_url, monkeypatch):
+    monkeypatch.setattr("beeb.share.http_utils.get_cache", lambda: cache)
+    seen = []
+    client = make_client(seen)
+    GET(json_url, client=client)
+    r = GET(json_url, client=client)
+    assert len(seen) == 1
+    assert r.content == b"{}"
+    assert len(cache) == 1
+
+def test_cache_revalidate(cache, json_url, monkeypatch):
+    monkeypatch.setattr("beeb.share.http_utils.get_cache", lambda: cache)
+    seen = []
+    client = make_client(seen)
+    GET(json_url, client=client)
+    with cache.conn as conn:
+        conn.execute("UPDATE responses SET stored = 0") # make stale
+    r = GET(json_url, client=client)
+    assert len(seen) == 2
+    assert seen[-1].headers["If-None-Match"] == '"abc"'
+    assert r.status_code == 200 and r.content == b"{}"
+    assert cache.get(json_url).is_fresh
+
+def test_cache_evict(tmp_path, json_url):
+    cache = ResponseCache(dir=tmp_path, max_bytes=2)
+    for pid in ["a", "b", "c"]:
+        url = f"https://www.bbc.co.uk/programmes/{pid}.json"
+        response = httpx.Response(200, content=b"{}", request=httpx.Request("GET", url))
+        cache.put(url, response)
+    assert len(cache) == 1
+
+def test_cache_size(tmp_path):
+    "The running total of the size follows writes, replacements and evictions"
+    def put(cache, pid, content):
+        url = f"https://www.bbc.co.uk/programmes/{pid}.json"
+        request = httpx.Request("GET", url)
+        cache.put(url, httpx.Response(200, content=content, request=request))
+
+    cache = ResponseCache(dir=tmp_path, max_bytes=10)
+    put(cache, "a", b"1234")
+    put(cache, "b", b"12")
+    put(cache, "a", b"123456")  # Replaces the 4 bytes
+    assert cache.size == 8
+    put(cache, "c", b"12345")  # Evicts "b" then "a"
+    assert cache.size == 5 and len(cache) == 1
+    assert ResponseCache(dir=tmp_path).size == 5  # Summed from the table afresh
+    cache.clear()
+    assert cache.size == 0
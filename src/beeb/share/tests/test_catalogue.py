@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+from beeb.nav import ChannelListings, ProgrammeCatalogue
+from beeb.share.db_utils import CatalogueDB
+
+def test_catalogue_refresh(server, tmp_path):
+    "Only the days since the watermark are fetched, and then just today (it may change)"
+    today = date.today()
+    catalogue = ProgrammeCatalogue("r4", with_genre=True, n_days=0)
+    catalogue.db = CatalogueDB(dir=tmp_path)
+    catalogue.db.set_watermarks({"r4": today - timedelta(days=2)})
+    server.reset_stats()
+    assert catalogue.refresh() == len(catalogue) > 0
+    assert server.stats["schedule"]["requests"] == 2  # yesterday and today
+    assert catalogue.db.get_watermark("r4") == today - timedelta(days=1)
+    assert len(catalogue.db.retrieve_station("r4")) == len(catalogue)
+    server.reset_stats()
+    assert catalogue.refresh() == 0 and server.stats["schedule"]["requests"] == 1
+    assert catalogue.db.get_watermark("r4") == today - timedelta(days=1)
+
+def test_episode_resolutions(server, tmp_path):
+    "Episodes resolved (and stored) by one build aren't fetched again by the next"
+    db = CatalogueDB(dir=tmp_path)
+    listings = ChannelListings.from_channel_name("r4", n_days=2)
+    catalogues = []
+    for _ in range(2):
+        catalogue = ProgrammeCatalogue("r4", with_genre=True, n_days=0)
+        catalogue.db = db
+        server.reset_stats()
+        catalogue.fold_in(listings)
+        catalogue.store_db()
+        catalogues.append(catalogue)
+    first, second = catalogues
+    assert first.new_resolutions and not second.new_resolutions
+    assert "episode" not in server.stats
+    assert second == first
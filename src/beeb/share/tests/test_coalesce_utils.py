@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from beeb.share.coalesce_utils import SingleFlight, AsyncSingleFlight
+
+def test_singleflight_threads():
+    flight = SingleFlight()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.05)
+        return "result"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", slow_call)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.in_flight == 0
+
+def test_singleflight_error():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do("k", lambda: int("x"))
+    assert flight.do("k", lambda: 1) == 1
+
+def test_async_singleflight():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def slow_call(x):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    async def run():
+        return await asyncio.gather(
+            *[flight.do("k", slow_call, 2) for _ in range(5)],
+            flight.do("other", slow_call, 3),
+        )
+
+    assert asyncio.run(run()) == [4] * 5 + [6]
+    assert calls == [2, 3]
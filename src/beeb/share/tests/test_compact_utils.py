@@ -0,0 +1,27 @@
+import pytest
+
+from beeb.bench import StandInServer, use_stand_in
+from beeb.nav import ChannelListings
+from beeb.nav.sched.broadcasts import Broadcast
+from beeb.share.compact_utils import get_compact, set_compact
+
+@pytest.fixture
+def compact():
+    prev = get_compact()
+    yield set_compact(True)
+    set_compact(prev)
+
+def test_slots():
+    b = Broadcast(None, "m000abcd", "Title", "", "")
+    assert not hasattr(b, "__dict__") and not hasattr(b, "frozen_data")
+
+def test_compact_listings(compact, monkeypatch):
+    "Raw pages are dropped once boiled, and repeated titles share one string"
+    monkeypatch.setattr(ChannelListings, "pipelined", False)
+    with StandInServer() as server, use_stand_in(server):
+        listings = ChannelListings.from_channel_name("r4", n_days=3)
+    assert not any(hasattr(s, "frozen_soup") for s in listings.schedules)
+    titles = {}
+    for b in listings.all_broadcasts:
+        assert titles.setdefault(b.title, b.title) is b.title
+    assert len(titles) < len(listings.all_broadcasts)
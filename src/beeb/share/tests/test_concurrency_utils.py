@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+
+from beeb.share.concurrency_utils import AdaptiveLimiter, LimiterFactory
+
+@pytest.fixture
+def limiter():
+    return AdaptiveLimiter(initial=4, max_limit=16)
+
+def test_additive_increase(limiter):
+    for _ in range(100):
+        limiter.record(0.1, ok=True)
+    assert limiter.limit > 4
+
+def test_multiplicative_decrease(limiter):
+    limiter.record(0.1, ok=True)
+    for _ in range(4):
+        limiter.record(0.1, ok=False)
+    assert limiter.limit == 2
+
+def test_limit_respected(limiter):
+    peak = 0
+
+    async def request(status):
+        nonlocal peak
+        async with limiter.track() as outcome:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.001)
+            outcome.update(status=status)
+
+    async def run():
+        await asyncio.gather(*[request(200) for _ in range(50)])
+        await asyncio.gather(*[request(503) for _ in range(10)])
+
+    asyncio.run(run())
+    assert peak <= limiter.max_limit
+    assert limiter.in_flight == 0
+    assert limiter.n_completed == 60
+    assert limiter.n_errors == 10
+    assert limiter.report()["settled_limit"] >= limiter.min_limit
+
+def test_limiter_factory():
+    "Loops in other threads get limiters of their own, each starting where one settled"
+    from concurrent.futures import ThreadPoolExecutor
+    factory = LimiterFactory(initial=4, max_limit=16)
+
+    async def run():
+        with factory.use() as limiter:
+            for _ in range(50):
+                limiter.record(0.1, ok=True)
+                await asyncio.sleep(0)
+            return limiter
+
+    with ThreadPoolExecutor(2) as executor:
+        a, b = executor.map(lambda _: asyncio.run(run()), range(2))
+    assert a is not b and a.n_completed == b.n_completed == 50
+    assert factory.initial in (a.settled_limit, b.settled_limit)  # The last to end
+    assert factory.make().limit == factory.initial > 4
+    with factory.use(a) as limiter:
+        assert limiter is a
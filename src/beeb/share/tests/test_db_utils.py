@@ -43,3 +43,89 @@ def test_pid_retrieve(db, demo_pid):
 
 # Don't test insertion to avoid accidentally mutating shipped DB, save that for
 # integration/functional tests that consider creation/deletion of DB and failure cases
+
+def test_bulk_upsert(tmp_path):
+    "Written to a temporary DB: a repeated key updates the row rather than failing"
+    tmp_db = CatalogueDB(dir=tmp_path)
+    entries = [(f"b{i:07d}", f"Title {i}", "Comedy", "r4") for i in range(100)]
+    assert tmp_db.insert_entries(entries) == 100
+    tmp_db.insert_entries([("b0000000", "Renamed", "Drama", "r4")])
+    tmp_db.insert_entry("b0000001", "Renamed too", None, "r4")
+    assert len(tmp_db.retrieve_station("r4")) == 100
+    assert tmp_db.retrieve_pid("b0000000") == ("b0000000", "Renamed", "Drama", "r4")
+    assert tmp_db.retrieve_pid("b0000001")[1] == "Renamed too"
+
+def make_legacy_db(tmp_path):
+    "An unversioned DB, as written before the schema was versioned"
+    import sqlite3
+    legacy = sqlite3.connect(tmp_path / CatalogueDB.filename)
+    legacy.execute(
+        "CREATE TABLE programmes (pid varchar(20), title tinytext, genre tinytext, "
+        "station varchar(10), Constraint pk_pid Primary key(pid, station))"
+    )
+    legacy.commit()
+    legacy.close()
+
+def test_migration(tmp_path):
+    "An unversioned DB is migrated to have the indexes, and is in WAL mode once written"
+    make_legacy_db(tmp_path)
+    with CatalogueDB(dir=tmp_path, create=False) as tmp_db:
+        tmp_db.insert_entry("b0000001", "Title", None, "r4")  # First write migrates
+        assert tmp_db.user_version == len(CatalogueDB.migrations)
+        plan = tmp_db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM programmes WHERE station = 'r4'"
+        ).fetchall()
+        assert "programmes_station" in str(plan)
+        tmp_db.insert_entry("b0000000", "Title", None, "r4")
+        assert tmp_db.conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert tmp_db.has_station("r4")
+
+def test_packaged_not_wal(tmp_path, monkeypatch):
+    "Writes to the packaged DB leave it in rollback journal mode, with no WAL files"
+    monkeypatch.setattr(CatalogueDB, "packaged_path", tmp_path / CatalogueDB.filename)
+    with CatalogueDB(dir=tmp_path) as tmp_db:
+        tmp_db.conn.execute("PRAGMA journal_mode=WAL")  # As a past write may have set
+        tmp_db.insert_entry("b0000000", "Title", None, "r4")
+        assert tmp_db.conn.execute("PRAGMA journal_mode").fetchone() == ("delete",)
+    assert [p.name for p in tmp_path.iterdir()] == [CatalogueDB.filename]
+
+def test_lookups_leave_unmigrated(tmp_path):
+    "Read-only lookups don't change the file, and handle the tables it lacks"
+    make_legacy_db(tmp_path)
+    path = tmp_path / CatalogueDB.filename
+    before = path.read_bytes()
+    with CatalogueDB(dir=tmp_path, create=False) as tmp_db:
+        assert not tmp_db.has_station("r4")
+        assert tmp_db.get_watermark("r4") is None
+        assert tmp_db.get_episodes(["m0000001"]) == {}
+        with pytest.raises(ValueError, match="create=True"):
+            tmp_db.search("today")
+        assert tmp_db.user_version == 0
+    assert path.read_bytes() == before
+    with CatalogueDB(dir=tmp_path) as tmp_db:  # Migrated on creating
+        assert tmp_db.user_version == len(CatalogueDB.migrations)
+        assert tmp_db.search("today") == []
+
+def test_search(tmp_path):
+    "The full-text index follows inserts and upserts, with prefix and phrase queries"
+    tmp_db = CatalogueDB(dir=tmp_path)
+    tmp_db.insert_entries(
+        [
+            ("b1", "Desert Island Discs", "Life Stories", "r4"),
+            ("b2", "Island Discs of the Desert", "Music", "r3"),
+            ("b3", "Gardeners' Question Time", "Gardens", "r4"),
+        ]
+    )
+    assert [r[0] for r in tmp_db.search('"desert island"')] == ["b1"]
+    assert {r[0] for r in tmp_db.search("desert island")} == {"b1", "b2"}
+    assert [r[0] for r in tmp_db.search("garden*", fields=["title"])] == ["b3"]
+    assert [r[0] for r in tmp_db.search("disc*", stations=["r3"])] == ["b2"]
+    tmp_db.insert_entry("b3", "Gardening Time", "Gardens", "r4")
+    assert tmp_db.search("question") == []
+    with pytest.raises(ValueError):
+        tmp_db.search(' "" ')
+
+def test_search_programmes(db, demo_station, demo_pid):
+    from beeb.nav.cat.catalogue import ProgrammeCatalogue
+    cat = ProgrammeCatalogue.regenerate_from_db(demo_station, db=db)
+    assert cat.search_programmes("today", pid_only=True)[0] == demo_pid
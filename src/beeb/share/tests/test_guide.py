@@ -0,0 +1,38 @@
+import pytest
+from functools import partial
+
+from beeb.nav import ProgrammeCatalogue, ProgrammeGuide
+from beeb.share.db_utils import CatalogueDB
+
+def test_concurrent_guide(server, monkeypatch):
+    "Pulling every station on one loop gives the same guide as one after another"
+    guides = []
+    for concurrent in (True, False):
+        monkeypatch.setattr(ProgrammeGuide, "concurrent", concurrent)
+        guides.append(
+            ProgrammeGuide.generate_by_names(
+                ["r1", "r4"], lazy=False, n_days=2, store=False
+            )
+        )
+    together, in_turn = guides
+    assert list(together) == list(in_turn) == ["r1", "r4"]
+    assert all(together[k] == in_turn[k] and together[k] for k in in_turn)
+    assert all(pc.complete_until == in_turn[k].complete_until for k, pc in together.items())
+
+def test_failed_station_stores_rest(server, monkeypatch, tmp_path):
+    "If one station's pull fails, the others are stored before its error is raised"
+    from beeb.nav.cat import guide
+    async_build = ProgrammeCatalogue.async_build
+
+    async def failing_build(self, **kwargs):
+        if self.station_name == "r1":
+            raise RuntimeError("r1 failed")
+        await async_build(self, **kwargs)
+
+    monkeypatch.setattr(ProgrammeCatalogue, "async_build", failing_build)
+    monkeypatch.setattr(guide, "CatalogueDB", partial(CatalogueDB, dir=tmp_path))
+    with pytest.raises(RuntimeError, match="r1 failed"):
+        ProgrammeGuide.generate_by_names(["r1", "r4"], lazy=False, n_days=2)
+    db = CatalogueDB(dir=tmp_path, create=False)
+    assert db.has_station("r4") and db.get_watermark("r4")
+    assert not db.has_station("r1") and db.get_watermark("r1") is None
@@ -23,3 +23,36 @@ def test_GET_fail(nonexisting_url):
         pass
     else:
         raise ValueError("Should have errored on nonexisting URL")
+
+def test_client_reused():
+    from beeb.share.http_utils import get_client
+    assert get_client() is get_client()
+
+def test_injected_client():
+    import httpx
+    from beeb.share.http_utils import ClientRegistry
+    registry = ClientRegistry()
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text="ok"))
+    client = registry.register(httpx.Client(transport=transport))
+    assert registry.get() is client
+    response = GET("https://www.bbc.co.uk/", client=registry.get())
+    assert response.text == "ok"
+    registry.close()
+    assert client.is_closed
+
+def test_registry_threadsafe(monkeypatch):
+    "Threads getting a client at once all share the one made, none leaks"
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from beeb.share.http_utils import ClientRegistry
+    registry = ClientRegistry()
+    made = []
+    def slow_make_client(**kwargs):
+        time.sleep(0.01)  # Widen the window between checking and setting
+        made.append(ClientRegistry.make_client(registry, **kwargs))
+        return made[-1]
+    monkeypatch.setattr(registry, "make_client", slow_make_client)
+    with ThreadPoolExecutor(8) as executor:
+        got = list(executor.map(lambda _: registry.get(), range(8)))
+    assert len(made) == 1 and all(c is made[0] for c in got)
+    registry.close()
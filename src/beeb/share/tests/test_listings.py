@@ -0,0 +1,12 @@
+from beeb.nav import ChannelListings
+
+def test_episode_fetch_plan(server):
+    listings = ChannelListings.from_channel_name("r4", n_days=3)
+    broadcasts = listings.all_broadcasts
+    plan = listings.episode_fetch_plan()
+    assert len(plan) == len({b.pid for b in broadcasts}) < len(broadcasts)
+    assert sum(map(len, plan.values())) == len(broadcasts)
+    per_title = listings.episode_fetch_plan(one_per_title=True)
+    assert len(per_title) == len({b.title for b in broadcasts}) < len(plan)
+    skip = {b.pid for b in broadcasts[:5]}
+    assert not skip & {b.pid for bs in listings.episode_fetch_plan(skip).values() for b in bs}
@@ -0,0 +1,63 @@
+import pytest
+from xml.etree import ElementTree as ET
+
+from beeb.api.xml_helpers import MpdManifest, MpdXml, Representation, expand_template
+from beeb.bench import fixtures
+from beeb.stream.urlsets import StreamUrlSet
+
+URL = "https://vod-dash-uk-live.akamaized.net/p0abc/pc_hd_abr_v2.mpd"
+
+@pytest.fixture
+def mpd():
+    mpd = MpdXml(URL, defer_pull=True)
+    mpd.handle(ET.fromstring(fixtures.mpd_xml("p0abc", duration_s=120)))
+    return mpd
+
+def test_manifest(mpd):
+    m = mpd.manifest
+    assert [r.bandwidth for r in m.representations] == [96000, 320000]
+    assert m.url_prefix == URL.rsplit("/", 1)[0] + "/dash/"
+    assert m.n_segments() == 32  # ceil(120s * 48kHz / 184320 frames)
+    urls = m.segment_urls()
+    assert len(urls) == 32 and urls[-1] == m.last_m4s_link == mpd.last_m4s_link
+    assert m.init_url().endswith("audio=320000.dash")
+    with pytest.raises(AttributeError):
+        m.best.rep_id = "x"  # immutable
+
+def test_urlset_from_manifest(mpd):
+    "The URLs downloaded are exactly those the manifest gives"
+    m = mpd.manifest
+    urlset = StreamUrlSet.from_manifest(m)
+    assert urlset.size == 33
+    assert list(urlset) == [m.init_url(), *m.segment_urls()]
+    assert list(urlset)[-1] == m.last_m4s_link
+
+def test_urlset_from_manifest_template():
+    "Number widths, start numbers and the initialisation template are all followed"
+    rep = Representation(
+        rep_id="audio=96000",
+        bandwidth=96000,
+        sample_rate=48000,
+        timescale=48000,
+        segment_frames=96000,
+        start_number=5,
+        initialization="$RepresentationID$/init.mp4",
+        media="$RepresentationID$/seg-$Number%04d$.m4s",
+    )
+    m = MpdManifest("https://cdn/dash/", 10, (rep,))
+    urls = list(StreamUrlSet.from_manifest(m))
+    assert urls == [m.init_url(), *m.segment_urls()]
+    assert urls[:2] == [
+        "https://cdn/dash/audio=96000/init.mp4",
+        "https://cdn/dash/audio=96000/seg-0005.m4s",
+    ]
+    assert len(urls) == 6 and urls[-1].endswith("seg-0009.m4s")
+
+def test_segment_order():
+    from beeb.stream.preproc import segment_number
+    names = ["a-10.m4s", "a-9.m4s", "a-1.m4s"]
+    assert sorted(names, key=segment_number) == ["a-1.m4s", "a-9.m4s", "a-10.m4s"]
+
+def test_expand_template():
+    assert expand_template("$RepresentationID$-$Number%03d$.m4s", "a", number=7) == "a-007.m4s"
+    assert expand_template("$RepresentationID$/$$$Number$", "a") == "a/$$Number$"
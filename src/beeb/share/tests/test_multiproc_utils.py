@@ -2,6 +2,7 @@ import pytest
 
 from beeb.share.multiproc_utils import batch_multiprocess
 from beeb.share.multiproc_utils import batch_multiprocess_with_return
+from beeb.share.multiproc_utils import WorkerPool
 
 def function_to_return():
     x = 1 + 1
@@ -21,3 +22,38 @@ def test_multiproc_with_return(func_list):
     values = []
     values = batch_multiprocess_with_return(func_list, pool_results=values, show_progress=False)
     assert sum(values) == 6
+
+def square(x):
+    return x * x
+
+def test_worker_pool_ordered():
+    "Results stream back in input order (including 'empty' results), reusing workers"
+    with WorkerPool(n_workers=2) as pool:
+        assert list(pool.map(square, range(20), chunksize=3)) == [x * x for x in range(20)]
+        executor = pool.executor
+        assert pool.run([list, function_to_return]) == [[], 2]
+        assert pool.executor is executor
+    assert pool._executor is None
+
+def test_worker_pool_empty():
+    assert WorkerPool(n_workers=2).run([]) == []
+
+def test_shutdown_without_cancel_futures(monkeypatch):
+    "Before Python 3.9 (no `cancel_futures`) pending work is cancelled by hand"
+    from concurrent.futures import Future
+    from types import SimpleNamespace
+    import beeb.share.multiproc_utils as multiproc_utils
+
+    class Executor:
+        "Executor with the Python 3.8 `shutdown` signature"
+        def __init__(self):
+            self._pending_work_items = {0: SimpleNamespace(future=Future())}
+        def shutdown(self, wait=True):
+            self.waited = wait
+
+    monkeypatch.setattr(multiproc_utils, "has_cancel_futures", False)
+    pool = WorkerPool(n_workers=1)
+    pool._executor = executor = Executor()
+    pool.shutdown(wait=False)
+    assert executor._pending_work_items[0].future.cancelled()
+    assert executor.waited is False and pool._executor is None
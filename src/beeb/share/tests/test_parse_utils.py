@@ -0,0 +1,133 @@
+import pytest
+from pathlib import Path
+
+from beeb.api.html_helpers import Episode, EpisodeListingsHtml
+from beeb.bench import fixtures
+from beeb.nav.sched.broadcasts import Broadcast
+from beeb.nav.sched.schedule import parse_schedule_page
+from beeb.share.parse_utils import available_parsers, make_soup, set_html_parser
+from beeb.share.parse_utils import get_html_parser, parse_modes
+from beeb.share.parse_utils import element_text, iter_elements_by_class, select_first
+
+YMD = (2021, 3, 14)
+
+# Pages in the markup of bbc.co.uk (see `record_pages.py` to record live ones), named
+# `schedule-{channel_id}-{yyyy-mm-dd}.html` and `episodes-{programme_pid}-{page}.html`
+DATA_DIR = Path(__file__).parent / "data"
+schedule_pages = sorted(DATA_DIR.glob("schedule-*.html"))
+episodes_pages = sorted(DATA_DIR.glob("episodes-*.html"))
+
+def page_ymd(path):
+    return tuple(map(int, path.stem.split("-")[-3:]))
+
+@pytest.fixture(params=[p for p in available_parsers() if p != "html5lib"])
+def parser(request):
+    return request.param
+
+@pytest.fixture
+def schedule_page():
+    return fixtures.schedule_html("p00fzl7j", YMD).encode()
+
+@pytest.fixture
+def episodes_page():
+    return fixtures.episodes_player_html("b006qj9z", 1).encode()
+
+def broadcast_fields(page, parser):
+    soup = make_soup(page, parser=parser)
+    return [Broadcast.from_soup(b).fields for b in soup.select(".broadcast")]
+
+def episode_fields(page, parser):
+    soup = make_soup(page, parser=parser)
+    return [vars(Episode.from_soup_node(e)) for e in soup.select("div[data-pid]")]
+
+def test_broadcasts_equivalent(schedule_page, parser):
+    "Each backend parses the schedule broadcasts exactly as html5lib does"
+    expected = broadcast_fields(schedule_page, "html5lib")
+    assert expected and broadcast_fields(schedule_page, parser) == expected
+
+def test_episodes_equivalent(episodes_page, parser):
+    "Each backend parses the episode listings exactly as html5lib does"
+    expected = episode_fields(episodes_page, "html5lib")
+    assert expected and episode_fields(episodes_page, parser) == expected
+
+@pytest.mark.parametrize("path", schedule_pages, ids=lambda p: p.name)
+def test_data_broadcasts_equivalent(path, parser):
+    "Each backend parses the broadcasts of the data pages exactly as html5lib does"
+    page = path.read_bytes()
+    expected = broadcast_fields(page, "html5lib")
+    assert expected and broadcast_fields(page, parser) == expected
+
+@pytest.mark.parametrize("mode", parse_modes)
+@pytest.mark.parametrize("path", schedule_pages, ids=lambda p: p.name)
+def test_data_parse_modes_equivalent(path, mode):
+    "Each parse mode gives the same records from the data pages as html5lib does"
+    page, ymd = path.read_bytes(), page_ymd(path)
+    expected = parse_schedule_page(page, ymd, parser="html5lib", mode="full")
+    assert expected and parse_schedule_page(page, ymd, mode=mode) == expected
+
+@pytest.mark.parametrize("path", episodes_pages, ids=lambda p: p.name)
+def test_data_episodes_equivalent(path, parser):
+    "Each backend parses the episode listings data pages exactly as html5lib does"
+    page = path.read_bytes()
+    expected = episode_fields(page, "html5lib")
+    assert expected and episode_fields(page, parser) == expected
+    soup = EpisodeListingsHtml.reader_func(page)
+    assert [vars(Episode.from_soup_node(e)) for e in soup.select("div[data-pid]")] == expected
+
+def test_set_html_parser():
+    default = get_html_parser()
+    assert default == available_parsers()[0]
+    with pytest.raises(ValueError):
+        set_html_parser("selectolax")
+    try:
+        assert set_html_parser("html5lib") == get_html_parser() == "html5lib"
+    finally:
+        set_html_parser(default)
+
+@pytest.mark.parametrize("mode", parse_modes)
+def test_parse_modes_equivalent(schedule_page, mode):
+    "Each parse mode gives the same records as a full html5lib parse"
+    expected = parse_schedule_page(schedule_page, YMD, parser="html5lib", mode="full")
+    assert len(expected) == 40  # the next day's broadcasts are filtered out
+    assert parse_schedule_page(schedule_page, YMD, mode=mode) == expected
+
+def test_strained_episode_listings(episodes_page):
+    soup = EpisodeListingsHtml.reader_func(episodes_page)
+    expected = episode_fields(episodes_page, "html5lib")
+    assert [vars(Episode.from_soup_node(e)) for e in soup.select("div[data-pid]")] == expected
+    assert soup.select_one(".pagination__page--last").a.text == "3"
+
+def test_select_first():
+    html = b"""<div class="a"><p class="b"><span>x</span></p><i class="b"><span
+    data-k="1">y<!-- z --></span></i></div>"""
+    el = next(iter_elements_by_class(html, "a"))
+    assert element_text(select_first(el, ["b"], tag="span")) == "x"
+    assert element_text(select_first(el, ["a", "b"], attr="data-k")) == "y"
+    assert select_first(el, ["c"], tag="span") is None
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_lean_episode_json(backend):
+    "Lean episode metadata gives the same programme info, for each JSON backend"
+    from beeb.api.json_helpers import EpisodeMetadataPidJson as EpJson
+    from beeb.share.parse_utils import get_json_backend, set_json_backend
+    default = get_json_backend()
+    pytest.importorskip(backend)
+    set_json_backend(backend)
+    try:
+        for title_idx in range(7):  # brand, series and one-off parents
+            pid = fixtures.episode_pid(title_idx, YMD)
+            raw = fixtures.episode_json(pid).encode()
+            full, lean = (
+                EpJson.from_json(raw, pid=pid, load_string=True, lean=lean)
+                for lean in (False, True)
+            )
+            assert len(str(lean)) < len(str(full)) / 2
+            try:
+                expected = EpJson.get_programme_pid_title_genre(pid, prefab=full)
+            except KeyError:
+                with pytest.raises(KeyError):
+                    EpJson.get_programme_pid_title_genre(pid, prefab=lean)
+            else:
+                assert EpJson.get_programme_pid_title_genre(pid, prefab=lean) == expected
+    finally:
+        set_json_backend(default)
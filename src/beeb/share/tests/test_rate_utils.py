@@ -0,0 +1,38 @@
+import pytest
+
+from beeb.share.rate_utils import TokenBucket, FileTokenBucket, HostRateLimiter
+from beeb.share.rate_utils import get_rate_limiter, set_rate_limiter
+
+@pytest.fixture
+def url():
+    return "https://www.bbc.co.uk/programmes/m000t476.json"
+
+def test_bucket_burst():
+    bucket = TokenBucket(rate=10, burst=5)
+    delays = [bucket.take() for _ in range(6)]
+    assert delays[:5] == [0.0] * 5
+    assert delays[5] == pytest.approx(0.1, abs=0.01)
+
+def test_file_bucket_shared(tmp_path):
+    path = tmp_path / "host.bucket"
+    a, b = FileTokenBucket(path, rate=10, burst=2), FileTokenBucket(path, rate=10, burst=2)
+    assert a.take() == 0.0
+    assert b.take() == 0.0
+    assert a.take() > 0 # The burst was shared between the two buckets
+
+def test_host_limits(url):
+    limiter = HostRateLimiter(rate=None, host_rates={"www.bbc.co.uk": (10, 1)})
+    assert limiter.delay(url) == 0.0
+    assert limiter.delay(url) > 0
+    assert limiter.delay("https://example.com/") == 0.0 # unlimited host
+
+def test_opt_in():
+    "No limits unless set, and then the default ones"
+    assert get_rate_limiter() is None
+    try:
+        limiter = set_rate_limiter()
+        assert get_rate_limiter() is limiter
+        rate, burst = HostRateLimiter.host_rates["www.bbc.co.uk"]
+        assert limiter.bucket("www.bbc.co.uk").rate == rate
+    finally:
+        set_rate_limiter(None)
@@ -0,0 +1,58 @@
+import asyncio
+import httpx
+import pytest
+
+from beeb.share.retry_utils import RetryPolicy
+
+@pytest.fixture
+def policy():
+    return RetryPolicy(n_retries=3, base_delay=0)
+
+def make_fetch(responses):
+    "Return an async fetch function which pops each outcome off `responses` in turn"
+    async def fetch(url):
+        outcome = responses.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, request=httpx.Request("GET", url))
+    return fetch
+
+def test_retry_succeeds(policy):
+    fetch = make_fetch([httpx.ConnectError("reset"), 503, 200])
+    response = asyncio.run(policy.call(fetch, "u", url="u"))
+    assert response.status_code == 200
+    assert policy.n_retried == 2
+    assert not policy.failures
+
+def test_retry_exhausted(policy):
+    fetch = make_fetch([503] * 4)
+    assert asyncio.run(policy.call(fetch, "u", url="u")) is None
+    assert policy.failed_urls == ["u"]
+
+def test_no_retry_on_not_found(policy):
+    fetch = make_fetch([404, 200])
+    assert asyncio.run(policy.call(fetch, "u", url="u")) is None
+    assert policy.n_retried == 0
+
+def test_retry_budget():
+    policy = RetryPolicy(n_retries=3, base_delay=0, min_budget=1, budget_ratio=0)
+    fetch = make_fetch([503] * 8)
+    asyncio.run(policy.call(fetch, "a", url="a"))
+    asyncio.run(policy.call(fetch, "b", url="b"))
+    assert policy.n_retried == 1
+    assert len(policy.failures) == 2
+
+def test_retry_after(policy, monkeypatch):
+    "A 429 with a Retry-After header waits as long as it says (not the backoff)"
+    slept = []
+    async def sleep(delay):
+        slept.append(delay)
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    async def fetch(url):
+        status, headers = responses.pop(0)
+        return httpx.Response(status, headers=headers, request=httpx.Request("GET", url))
+    responses = [(429, {"Retry-After": "2"}), (429, {}), (200, {})]
+    assert asyncio.run(policy.call(fetch, "u", url="u")).status_code == 200
+    assert slept == [2.0, 0.0]
+    date = "Wed, 21 Oct 2015 07:28:00 GMT"  # In the past: retry straight away
+    assert policy.retry_after(httpx.Response(503, headers={"Retry-After": date})) == 0
@@ -0,0 +1,23 @@
+from beeb.share.archive_utils import ScheduleArchive
+from beeb.share.cache_utils import ResponseCache
+from beeb.share.sqlite_utils import SQLiteStore, swap_store
+
+def test_reconnect_after_fork(tmp_path):
+    "A connection made in another process (the parent of a fork) isn't reused"
+    store = SQLiteStore(dir=tmp_path, filename="store.db")
+    conn = store.conn
+    assert store.conn is conn
+    store._pid = -1  # As if made before forking
+    assert store.conn is not conn
+    store.close()
+    assert store._conn is None
+
+def test_swap_store(tmp_path):
+    cache = ResponseCache(dir=tmp_path)
+    assert len(cache) == 0 and cache._conn is not None
+    assert swap_store(cache, cache, ResponseCache) is cache
+    assert cache._conn is not None  # Not closed, as not replaced
+    archive = swap_store(None, ScheduleArchive(dir=tmp_path), ScheduleArchive)
+    assert swap_store(cache, None, ResponseCache) is None
+    assert cache._conn is None
+    assert repr(archive) == f"ScheduleArchive 'schedule_archive.db' at {tmp_path}"
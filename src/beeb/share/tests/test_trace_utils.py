@@ -0,0 +1,87 @@
+import asyncio
+import json
+import pytest
+
+from beeb.share.trace_utils import Tracer, get_tracer, set_tracer, span, count, traced
+
+@pytest.fixture
+def tracer():
+    prev = get_tracer()
+    yield set_tracer(Tracer(enabled=True))
+    set_tracer(prev)
+
+def test_disabled_is_noop():
+    t = Tracer()
+    with t.span("x"):
+        pass
+    t.count("requests")
+    assert t.spans == [] and t.counters == {}
+
+def test_spans_and_counters(tracer):
+    seen = []
+    tracer.add_hook(seen.append)
+    with span("fetch", url="u"):
+        count("requests")
+        count("bytes", 10)
+    with pytest.raises(KeyError):
+        with span("parse"):
+            raise KeyError
+    assert [s.name for s in seen] == ["fetch", "parse"]
+    assert seen[1].error == "KeyError"
+    assert tracer.counters == {"requests": 1, "bytes": 10}
+    assert tracer.summary()["fetch"]["count"] == 1
+
+def test_async_and_decorated(tracer):
+    @traced("decorated")
+    def f():
+        return 1
+
+    async def main():
+        with span("outer"):
+            await asyncio.sleep(0)
+            return f()
+
+    assert asyncio.run(main()) == 1
+    assert sorted(tracer.totals) == ["decorated", "outer"]
+
+def test_export(tracer, tmp_path):
+    with span("store_db", n_entries=3):
+        count("cache_hits")
+    assert json.loads(tracer.to_json())["spans"][0]["attrs"] == {"n_entries": 3}
+    path = tracer.to_chrome_trace(tmp_path / "trace.json")
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [e["ph"] for e in events] == ["X", "C"]
+    assert events[0]["args"] == {"n_entries": 3}
+
+def test_max_spans(tracer):
+    tracer.max_spans = 2
+    for _ in range(5):
+        with tracer.span("s"):
+            pass
+    assert len(tracer.spans) == 2 and tracer.n_dropped == 3
+    assert tracer.summary()["s"]["count"] == 5
+
+def test_concurrent_tasks_on_own_tracks(tracer):
+    "Overlapping spans of concurrent tasks are exported on separate tracks"
+    async def fetch():
+        with span("fetch"):
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(fetch(), fetch())
+
+    asyncio.run(main())
+    events = json.loads(tracer.to_chrome_trace())["traceEvents"]
+    fetches = [e for e in events if e["ph"] == "X"]
+    assert len(fetches) == 2 and fetches[0]["tid"] != fetches[1]["tid"]
+    assert sum(e["ph"] == "M" for e in events) == 2  # Each track is named
+
+def test_failing_hook(tracer, capsys):
+    "An error in a hook is reported, not raised into the traced code"
+    def hook(s):
+        raise ValueError("broken hook")
+    tracer.add_hook(hook)
+    with span("fetch"):
+        pass
+    assert tracer.summary()["fetch"]["count"] == 1
+    assert "broken hook" in capsys.readouterr().err
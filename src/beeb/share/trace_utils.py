@@ -0,0 +1,285 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+__all__ = [
+    "Span",
+    "Tracer",
+    "get_tracer",
+    "set_tracer",
+    "span",
+    "count",
+    "traced",
+]
+
+_null_span = nullcontext()  # Reusable: entering a nullcontext has no side effects
+
+
+def current_task_id():
+    "Identify the running asyncio task (if any), as concurrent spans are per task"
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return None  # No running event loop
+    return id(task) if task else None
+
+
+class Span:
+    "A timed stage (e.g. one request, or boiling all the schedules of a listing)"
+
+    __slots__ = ("name", "attrs", "start", "end", "pid", "tid", "task", "error")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = self.end = None
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.task = current_task_id()
+        self.error = None
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def to_dict(self, epoch=0.0):
+        d = {"name": self.name, "start_s": self.start - epoch, "dur_s": self.duration}
+        if self.attrs:
+            d["attrs"] = self.attrs
+        if self.error:
+            d["error"] = self.error
+        return d
+
+    def __repr__(self):
+        dur = f"{self.duration * 1e3:.2f}ms" if self.end else "open"
+        return f"Span {self.name!r} ({dur})"
+
+
+class SpanContext:
+    def __init__(self, tracer, span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self):
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end = time.perf_counter()
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        self.tracer.finish(self.span)
+        return False
+
+    # Spans are just as usable around awaits
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        return self.__exit__(*exc_info)
+
+
+class Tracer:
+    """
+    Collects timed spans and counters from the fetch, parse, store and transcode
+    stages. While disabled (the default) `span` hands back a shared no-op context
+    and `count` returns at once, so the instrumentation costs next to nothing.
+
+    Counters kept by beeb itself: `requests` and `bytes` (network responses),
+    `cache_hits`, `retries` and `failures` (URLs given up on). Time spent per
+    stage (e.g. parse time) is the span total for that name in `summary`.
+
+    Each finished span is passed to every hook added with `add_hook` (e.g. to
+    log slow requests or feed a metrics client). Export the record with
+    `to_json` or `to_chrome_trace` (open the latter in `chrome://tracing` or
+    Perfetto). Only `max_spans` spans are kept, but `summary` covers them all.
+    """
+
+    enabled = False
+    max_spans = 100_000
+
+    def __init__(self, enabled=enabled, max_spans=max_spans):
+        self.enabled = enabled
+        self.max_spans = max_spans
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.counters = {}
+            self.totals = {}  # span name: [count, total seconds]
+            self.epoch = time.perf_counter()
+            self.n_dropped = 0
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self
+
+    def add_hook(self, hook):
+        "Call `hook(span)` as each span finishes"
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _null_span
+        return SpanContext(self, Span(name, attrs))
+
+    def finish(self, span):
+        with self._lock:
+            total = self.totals.setdefault(span.name, [0, 0.0])
+            total[0] += 1
+            total[1] += span.duration
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.n_dropped += 1
+        for hook in self.hooks:
+            try:
+                hook(span)
+            except Exception as e:
+                # Tracing must never break what's traced (e.g. a fetch in a pull)
+                print(f"Tracing hook {hook!r} failed on {span!r}: {e!r}", file=sys.stderr)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        "Number of spans, total and mean seconds, per span name"
+        with self._lock:
+            return {
+                name: {"count": n, "total_s": total, "mean_s": total / n}
+                for name, (n, total) in sorted(self.totals.items())
+            }
+
+    def to_dict(self):
+        return {
+            "counters": dict(self.counters),
+            "summary": self.summary(),
+            "spans": [s.to_dict(self.epoch) for s in self.spans],
+            "dropped_spans": self.n_dropped,
+        }
+
+    def to_json(self, path=None):
+        return self.dump(self.to_dict(), path)
+
+    def to_chrome_trace(self, path=None):
+        """
+        Trace Event Format: a complete ('X') event per span, counters at the end.
+        Spans of concurrent asyncio tasks overlap without nesting, so each task's
+        spans go on a track of their own (named after the task's thread), as the
+        viewer nests the events of a track by their times.
+        """
+        to_us = lambda t: round((t - self.epoch) * 1e6, 3)
+        task_tracks = {}  # (thread, task): track number, from 1 in order of first span
+        events = []
+        for s in self.spans:
+            tid = s.tid
+            if s.task is not None:
+                key = (s.pid, s.tid, s.task)
+                if key not in task_tracks:
+                    task_tracks[key] = len(task_tracks) + 1
+                    events.append(
+                        {
+                            "name": "thread_name",
+                            "ph": "M",
+                            "pid": s.pid,
+                            "tid": task_tracks[key],
+                            "args": {"name": f"task {len(task_tracks)} ({s.tid})"},
+                        }
+                    )
+                tid = task_tracks[key]
+            events.append(
+                {
+                    "name": s.name,
+                    "cat": s.name.split(".")[0],
+                    "ph": "X",
+                    "ts": to_us(s.start),
+                    "dur": round(s.duration * 1e6, 3),
+                    "pid": s.pid,
+                    "tid": tid,
+                    "args": {**s.attrs, **({"error": s.error} if s.error else {})},
+                }
+            )
+        if self.counters:
+            end = max((s.end for s in self.spans), default=time.perf_counter())
+            events.append(
+                {
+                    "name": "counters",
+                    "ph": "C",
+                    "ts": to_us(end),
+                    "pid": os.getpid(),
+                    "args": dict(self.counters),
+                }
+            )
+        return self.dump({"traceEvents": events, "displayTimeUnit": "ms"}, path)
+
+    @staticmethod
+    def dump(data, path=None):
+        "Return the data as a JSON string, or write it to `path` if given"
+        if path is None:
+            return json.dumps(data, default=str)
+        with open(path, "w") as f:
+            json.dump(data, f, default=str)
+        return path
+
+    def __repr__(self):
+        state = "enabled" if self.enabled else "disabled"
+        return f"Tracer ({state}, {len(self.spans)} spans, {self.counters})"
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    return _tracer
+
+
+def set_tracer(tracer):
+    "Replace the process-wide tracer (e.g. with a fresh, enabled `Tracer()`)"
+    global _tracer
+    _tracer = tracer
+    return tracer
+
+
+def span(name, **attrs):
+    "Time a block as a span on the process-wide tracer (no-op while disabled)"
+    return _tracer.span(name, **attrs)
+
+
+def count(name, n=1):
+    "Add `n` to a counter on the process-wide tracer (no-op while disabled)"
+    _tracer.count(name, n)
+
+
+def traced(name):
+    "Decorator to time every call of a function as a span called `name`"
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -4,17 +4,31 @@ from aiostream import stream
 import aiofiles
 from functools import partial
 from pathlib import Path
+from ..share.concurrency_utils import LimiterFactory, drain
+from ..share.http_utils import async_GET, clients
+from ..share.retry_utils import RetryPolicy
 
-__all__ = ["fetch_urlset"]
+__all__ = ["fetch_urlset", "segment_limits"]
 
-async def fetch(session, url, raise_for_status=False):
-    response = await session.get(str(url))
-    if raise_for_status:
-        response.raise_for_status()
-    return response
+# Each download gets its own limiter, starting at the limit the last settled on
+segment_limits = LimiterFactory(initial=10, max_limit=48)
+
+async def fetch(session, url, raise_for_status=False, limiter=None):
+    # Segments are never cached, but share the per-host rate limit
+    return await async_GET(
+        session, url, raise_for_status=raise_for_status, use_cache=False, limiter=limiter
+    )
+
+
+async def fetch_with_retry(session, url, limiter=None, retry=None):
+    "Retry `fetch` per URL, returning `None` once retries are exhausted"
+    retry = retry if retry else RetryPolicy()
+    return await retry.call(fetch, session, url, False, limiter, url=url)
 
 
 async def process(data, download_dir, pbar=None, verbose=False):
+    if data is None:
+        return  # Failed after retries (recorded by the RetryPolicy)
     if not download_dir.exists():
         download_dir.mkdir(parents=True)
     filename = Path(str(data.url)).name
@@ -27,17 +41,37 @@ async def process(data, download_dir, pbar=None, verbose=False):
         pbar.update()
 
 
-async def async_fetch_urlset(urls, download_dir, pbar=None, verbose=False):
-    async with httpx.AsyncClient(http2=True) as session:
-        ws = stream.repeat(session)
-        xs = stream.zip(ws, stream.iterate(urls))
-        ys = stream.starmap(xs, fetch, ordered=False, task_limit=10)
-        process_download = partial(
-            process, download_dir=download_dir, pbar=pbar, verbose=verbose
-        )
-        zs = stream.map(ys, process_download)
-        return await zs
+async def async_fetch_urlset(
+    urls, download_dir, pbar=None, verbose=False, limiter=None, retry=None
+):
+    """
+    Download the stream segments, retrying failed requests individually.
+    Return a dict of the URLs that finally failed (to the last error or response).
+    """
+    retry = retry if retry else RetryPolicy()
+    with segment_limits.use(limiter) as limiter:
+        limits = httpx.Limits(max_keepalive_connections=limiter.max_limit)
+        async with clients.make_async_client(http2=True, limits=limits) as session:
+            ws = stream.repeat(session)
+            xs = stream.zip(ws, stream.iterate(urls))
+            retry_fetch = partial(fetch_with_retry, limiter=limiter, retry=retry)
+            ys = stream.starmap(
+                xs, retry_fetch, ordered=False, task_limit=limiter.max_limit
+            )
+            process_download = partial(
+                process, download_dir=download_dir, pbar=pbar, verbose=verbose
+            )
+            zs = stream.map(ys, process_download)
+            await drain(zs)
+        if verbose:
+            print(f"Segment fetches: {limiter}, {retry}")
+    return retry.failures
 
 
-def fetch_urlset(urlset, download_dir, pbar=None, verbose=False):
-    return asyncio.run(async_fetch_urlset(urlset, download_dir, pbar, verbose))
+def fetch_urlset(
+    urlset, download_dir, pbar=None, verbose=False, limiter=None, n_retries=3
+):
+    retry = RetryPolicy(n_retries=n_retries)
+    return asyncio.run(
+        async_fetch_urlset(urlset, download_dir, pbar, verbose, limiter, retry)
+    )
@@ -1,6 +1,9 @@
 import ffmpeg
+import re
 from glob import glob
+from ..share.trace_utils import traced
 
+@traced("stream.transcode")
 def mp4_to_wav(input_mp4, sr="16k", output_wav=None):
     """
     Convert an MP4 file to a WAV file at sampling rate `sr` (default 16 kHz).
@@ -14,6 +17,12 @@ def mp4_to_wav(input_mp4, sr="16k", output_wav=None):
     ).run(quiet=True)
     return output_wav
 
+def segment_number(filename):
+    "The number at the end of a segment's filename, so `-10.m4s` sorts after `-9.m4s`"
+    match = re.search(r"(\d+)\.m4s$", filename)
+    return int(match.group(1)) if match else -1
+
+@traced("stream.gather")
 def gather_m4s_to_mp4(dash_file, m4s_files, output_mp4):
     """
     Concatenate `.dash` and `.m4s` files using the system `cat` facility.
@@ -38,7 +47,7 @@ def gather_pulled_downloads(input_dir, output_dir, filename_stem):
     else:
         dash_file = dash_glob[0]
     m4s_globstr = f"{input_dir.absolute() / '*.m4s'}"
-    m4s_files = sorted(glob(m4s_globstr))
+    m4s_files = sorted(glob(m4s_globstr), key=segment_number)
     output_mp4 = output_dir.absolute() / f"{filename_stem}.mp4"
     gather_m4s_to_mp4(dash_file, m4s_files, output_mp4)
     return output_mp4
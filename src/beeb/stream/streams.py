@@ -3,6 +3,7 @@ from .preproc import gather_pulled_downloads, mp4_to_wav
 from .urlsets import StreamUrlSet
 from ..api import get_programme_pid_by_name
 from ..share.time import parse_abs_from_rel_date
+from ..share.trace_utils import span
 from pathlib import Path
 from tqdm import tqdm
 
@@ -56,10 +57,15 @@ class Stream(Episode):
             if verbose:
                 print(f"Pulling {self.stream_urls}")
             pbar = tqdm(total=self.stream_urls.size)
-            self.stream_urls.fetch_urlset(
-                download_dir=self.download_dir, pbar=pbar, verbose=verbose
-            )
+            with span("stream.fetch", n_segments=self.stream_urls.size):
+                failures = self.stream_urls.fetch_urlset(
+                    download_dir=self.download_dir, pbar=pbar, verbose=verbose
+                )
             pbar.close()
+            if failures:
+                # A missing segment would leave a gap in the gathered stream
+                msg = f"Failed to fetch {len(failures)} stream parts: {[*failures]}"
+                raise ValueError(msg)
             if verbose:
                 print("Done")
 
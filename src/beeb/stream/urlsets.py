@@ -1,7 +1,6 @@
 from .async_utils import fetch_urlset
-from ..api import final_m4s_link_from_programme_pid, get_programme_pid_by_name
+from ..api import get_programme_pid_by_name, manifest_from_programme_pid
 from ..api.url_helpers import EpisodeStreamPartURL
-from pathlib import Path
 
 __all__ = ["StreamUrlSet"]
 
@@ -10,14 +9,20 @@ class StreamUrlSet(EpisodeStreamPartURL):
         self,
         size,
         url_prefix,
-        filename_prefix,
-        filename_sep,
-        url_suffix,
+        filename_prefix=None,
+        filename_sep=None,
+        url_suffix=None,
         zero_based=False,
         zfill=True,
+        urls=None,
     ):
+        """
+        The URLs are made from their parts as iterated over, unless listed in full
+        as `urls` (initialisation URL first), as from a manifest.
+        """
         super().__init__(url_prefix, filename_prefix, filename_sep, url_suffix)
         self.size = size  # class is an iterator not a list so record size
+        self.urls = urls
         self.zfill = len(str(size)) if zfill else 0
         self.zero_based = zero_based
         self.reset_pos()
@@ -46,7 +51,7 @@ class StreamUrlSet(EpisodeStreamPartURL):
         return f"{self.size} URLs"
 
     def __iter__(self):
-        return next(self)
+        return iter(self.urls) if self.urls is not None else next(self)
 
     def __next__(self):
         while not self.is_initialised:
@@ -58,24 +63,18 @@ class StreamUrlSet(EpisodeStreamPartURL):
             yield self.make_part_url(p)
 
     @classmethod
-    def from_last_m4s_url(cls, last_url):
-        last_filename = Path(Path(last_url).name)
-        url_prefix = last_url[: -len(last_filename.name)]
-        url_suffix = last_filename.suffix
-        fname_prefix, fname_sep, last_file_num = last_filename.stem.rpartition("-")
-        if not last_file_num.isnumeric():
-            raise ValueError(f"{last_file_num} was non-numeric")
-        if fname_prefix == fname_sep == "":
-            # rpartition gives two empty strings and the original if separator not found
-            raise ValueError("Failed to parse filename (did not contain '-' separator)")
-        last_file_num = int(last_file_num)
-        n_urls = last_file_num + 1
-        return cls(n_urls, url_prefix, fname_prefix, fname_sep, url_suffix)
+    def from_manifest(cls, manifest, rep=None):
+        """
+        Build from a parsed `MpdManifest`, for its highest bitrate representation
+        unless another is given as `rep`, with the URLs exactly as the manifest
+        gives them (the initialisation URL, then each numbered segment's).
+        """
+        urls = [manifest.init_url(rep), *manifest.segment_urls(rep)]
+        return cls(len(urls), manifest.url_prefix, urls=urls)
 
     @classmethod
     def from_programme_pid(cls, programme_pid, ymd):
-        last_link_url = final_m4s_link_from_programme_pid(programme_pid, ymd=ymd)
-        return cls.from_last_m4s_url(last_link_url)
+        return cls.from_manifest(manifest_from_programme_pid(programme_pid, ymd=ymd))
 
     @classmethod
     def from_programme_name(cls, programme_name, station_name, date):